@@ -0,0 +1,92 @@
+"""Memory benchmark for :class:`songsearch.catalogue.SongCatalogue`.
+
+Fills a temporary database with synthetic songs and reports the memory per
+song of the row tuples returned by ``DatabaseManager`` (and of the per-song
+dicts ``fuzzy_search`` would build from them) against the columnar catalogue,
+measured with :mod:`tracemalloc`.
+
+    python scripts/bench_catalogue.py --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from songsearch.catalogue import SongCatalogue  # noqa: E402
+from songsearch.db import DatabaseManager  # noqa: E402
+from songsearch.search import _to_result  # noqa: E402
+
+WORDS = "love night heart fire dance baby light dream rain blue girl time".split()
+
+
+def fill(db_path: str, n: int, seed: int) -> None:
+    rng = random.Random(seed)
+    artists = [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}" for i in range(n // 20 + 1)]
+    rows = (
+        (
+            f"track{i:07d}",
+            rng.choice(artists),
+            " ".join(rng.choice(WORDS) for _ in range(3)).title(),
+            f"/music/library/{i % 997:03d}/track{i:07d}.mp3",
+            rng.randint(60, 600),
+            rng.randint(1_000_000, 12_000_000),
+        )
+        for i in range(n)
+    )
+    with sqlite3.connect(db_path) as c:
+        c.executemany(
+            "INSERT INTO songs (name, artist, title, path, duration, size) VALUES (?,?,?,?,?,?)",
+            rows,
+        )
+
+
+def measure(label: str, build, n: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:>20}: {current / n:7.1f} B/song (peak {peak / n:7.1f}) "
+        f"total {current / 2**20:8.1f} MiB, load {elapsed:.2f}s"
+    )
+    return obj
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "songs.db"))
+        fill(db.db_path, args.rows, args.seed)
+        n = args.rows
+        print(f"rows={n}")
+
+        rows = measure("tuples", lambda: list(db.iter_catalogue_rows()), n)
+        del rows
+        dicts = measure(
+            "result dicts", lambda: [_to_result(r, 0.0) for r in db.iter_catalogue_rows()], n
+        )
+        del dicts
+        cat = measure("SongCatalogue", lambda: SongCatalogue.from_db(db), n)
+        print(f"{'self-reported':>20}: {cat.bytes_per_song():7.1f} B/song")
+        for column, size in cat.memory_usage().items():
+            print(f"{column:>20}: {size / n:7.1f} B/song")
+
+
+if __name__ == "__main__":
+    main()
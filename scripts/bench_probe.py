@@ -0,0 +1,122 @@
+"""Benchmark the fast metadata probe against mutagen.
+
+Reads every audio file below FOLDER twice, once with ``mutagen.File(easy=True)``
+(the previous path) and once with :func:`songsearch.probe.probe`, and reports
+files per second and bytes read per file for each, plus how many files the
+probe handled itself rather than leaving to mutagen.
+
+    python scripts/bench_probe.py /music --limit 5000
+    python scripts/bench_probe.py --generate 5000
+
+Without FOLDER a synthetic library (:mod:`songsearch.synthetic`, MP3, FLAC,
+Ogg and M4A in equal parts) is generated in a temporary folder.
+
+Both passes run on a warm page cache, so files/s reflects parsing cost; the
+bytes read per file is what a cold disk or network share would transfer.
+"""
+from __future__ import annotations
+
+import argparse
+import builtins
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mutagen import File  # noqa: E402
+
+from songsearch.probe import probe  # noqa: E402
+from songsearch.synthetic import generate_library  # noqa: E402
+from songsearch.walker import walk_audio_files  # noqa: E402
+
+
+class CountingFile(io.FileIO):
+    """Binary file counting the bytes read, shared across instances."""
+
+    total = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        CountingFile.total += len(data)
+        return data
+
+    def readinto(self, b):
+        n = super().readinto(b)
+        CountingFile.total += n or 0
+        return n
+
+
+def count_reads(fn, path):
+    real_open = builtins.open
+
+    def counting_open(file, mode="r", *args, **kw):
+        if mode in ("rb", "rb+", "r+b") and isinstance(file, (str, bytes, os.PathLike)):
+            return CountingFile(file, mode.replace("b", ""))
+        return real_open(file, mode, *args, **kw)
+
+    builtins.open = counting_open
+    try:
+        return fn(path)
+    finally:
+        builtins.open = real_open
+
+
+def run(label, fn, paths):
+    CountingFile.total = 0
+    start = time.perf_counter()
+    results = [count_reads(fn, p) for p in paths]
+    elapsed = time.perf_counter() - start
+    n = len(paths)
+    print(
+        f"{label:>8}: {n / elapsed:8,.0f} files/s  "
+        f"{CountingFile.total / n / 1024:8.1f} KiB read/file  ({elapsed:.2f}s)"
+    )
+    return results
+
+
+def bench(folder: str, limit: int) -> None:
+    paths = sorted(f.path for f in walk_audio_files(folder))
+    if limit:
+        paths = paths[:limit]
+    if not paths:
+        sys.exit(f"no audio files below {folder}")
+    print(f"files={len(paths)}")
+
+    def mutagen(path):
+        try:
+            return File(path, easy=True)
+        except Exception:
+            return None
+
+    run("mutagen", mutagen, paths)
+    probed = run("probe", probe, paths)
+    handled = Counter(
+        os.path.splitext(p)[1].lower() for p, r in zip(paths, probed) if r is not None
+    )
+    total = Counter(os.path.splitext(p)[1].lower() for p in paths)
+    for ext in sorted(total):
+        print(f"{ext:>8}: probe handled {handled[ext]}/{total[ext]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", nargs="?", help="library to read (default: a generated one)")
+    parser.add_argument("--limit", type=int, default=0, help="at most this many files")
+    parser.add_argument("--generate", type=int, default=2000, help="size of the generated library")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.folder is None:
+        with tempfile.TemporaryDirectory(prefix="songsearch-probe-") as tmp:
+            generate_library(tmp, args.generate, args.seed)
+            bench(tmp, args.limit)
+    else:
+        bench(args.folder, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Cold-start benchmark for the memory-mapped search index.
+
+For each library size a temporary database is filled with synthetic songs and
+the index is built once.  The script then measures, as a fresh application
+would experience it, the time to open the index, validate it against the
+database and answer the first query, next to the plain ``LIKE`` path.
+
+    python scripts/bench_search_index.py --sizes 10000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from songsearch.db import DatabaseManager  # noqa: E402
+from songsearch.search import fuzzy_search  # noqa: E402
+from songsearch.search.index import SearchIndex  # noqa: E402
+
+WORDS = "love night heart fire dance baby light dream rain blue girl time".split()
+
+
+def fill(db_path: str, n: int, seed: int) -> None:
+    rng = random.Random(seed)
+    rows = (
+        (
+            f"track{i}",
+            rng.choice(WORDS).title(),
+            " ".join(rng.choice(WORDS) for _ in range(3)).title(),
+            f"/music/{i}.mp3",
+        )
+        for i in range(n)
+    )
+    with sqlite3.connect(db_path) as c:
+        c.executemany("INSERT INTO songs (name, artist, title, path) VALUES (?,?,?,?)", rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--query", default="blue moon")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, "songs.db"))
+            fill(db.db_path, n, args.seed)
+            idx_path = os.path.join(tmp, "search.idx")
+            start = time.perf_counter()
+            SearchIndex(idx_path).refresh(db)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = SearchIndex(idx_path)
+            state = index.refresh(db)
+            opened = time.perf_counter() - start
+            fuzzy_search(db, args.query, "song", 70, index=index)
+            first = time.perf_counter() - start
+            index.close()
+
+            start = time.perf_counter()
+            fuzzy_search(db, args.query, "song", 70)
+            like = time.perf_counter() - start
+        print(
+            f"{n:>9} songs: build {build:6.2f}s | open+validate {opened * 1000:6.1f} ms ({state}) "
+            f"| first search {first * 1000:7.1f} ms | LIKE search {like * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
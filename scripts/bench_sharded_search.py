@@ -0,0 +1,80 @@
+"""Scaling benchmark for :class:`songsearch.search.sharded.ShardedSearchEngine`.
+
+Builds a synthetic catalogue and reports per-query latency for 1, 2, 4 and 8
+workers next to a single-process rapidfuzz scan over the same keys.
+
+    python scripts/bench_sharded_search.py --rows 1000000 --queries 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rapidfuzz import fuzz, process  # noqa: E402
+
+from songsearch.search.sharded import ShardedSearchEngine  # noqa: E402
+
+WORDS = (
+    "love night heart fire dance baby light dream rain blue girl time "
+    "world sun home road river star gold black summer wild song city moon"
+).split()
+
+
+def make_rows(n: int, seed: int):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        artist = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"
+        rows.append((i + 1, f"track{i}", artist, title, f"/music/{i}.mp3"))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--threshold", type=int, default=70)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.seed)
+    rng = random.Random(args.seed + 1)
+    queries = [f"{rng.choice(WORDS)} {rng.choice(WORDS)}" for _ in range(args.queries)]
+    print(f"rows={args.rows} queries={args.queries} cpus={os.cpu_count()}")
+
+    keys = [r[3] for r in rows]
+    start = time.perf_counter()
+    for q in queries:
+        process.extract(q, keys, scorer=fuzz.WRatio, score_cutoff=args.threshold, limit=50)
+    base = (time.perf_counter() - start) / len(queries)
+    print(f"{'in-process':>12}: {base * 1000:8.1f} ms/query")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        # Score every key, like the in-process baseline above.
+        with ShardedSearchEngine(rows, workers=workers, prefilter=False) as engine:
+            setup = time.perf_counter() - start
+            engine.search(queries[0], "song", args.threshold)  # warm the shards
+            start = time.perf_counter()
+            for q in queries:
+                engine.search(q, "song", args.threshold)
+            single = (time.perf_counter() - start) / len(queries)
+            start = time.perf_counter()
+            engine.search_batch(queries, "song", args.threshold)
+            batch = (time.perf_counter() - start) / len(queries)
+        print(
+            f"{workers:>4} workers: {single * 1000:8.1f} ms/query "
+            f"(batched {batch * 1000:.1f} ms/query, speedup {base / single:.2f}x, "
+            f"setup {setup:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Import-time and startup-time benchmark for the GUI.
+
+Runs fresh interpreters so every measurement starts with a cold module cache:
+
+* ``python -X importtime -c "import songsearch.app"`` – total import time of
+  the main window module, the slowest modules below it, and whether modules
+  that should be deferred (QtMultimedia, mutagen, rapidfuzz, sqlite3) were
+  loaded anyway;
+* a startup run that creates the ``QApplication`` and ``MainWindow``, shows it
+  and measures the time until the window is on screen and until the deferred
+  search panel is ready.
+
+Each measurement is repeated and the fastest run is reported.  ``--json``
+writes the numbers to a file and ``--budget-ms`` makes the script exit with
+status 1 when the window takes longer than that to appear, so it can guard
+against regressions in CI.
+
+    python scripts/bench_startup.py --repeat 5 --json startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFERRED_MODULES = ("PyQt5.QtMultimedia", "mutagen", "rapidfuzz", "sqlite3")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+_STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from songsearch.app import MainWindow
+window = MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+shown_loaded = [m for m in %r if m in sys.modules]
+while not window.search_tab.is_built:
+    app.processEvents()
+ready = time.perf_counter()
+print(json.dumps({
+    "window_shown_ms": (shown - start) * 1000,
+    "search_ready_ms": (ready - start) * 1000,
+    "loaded_when_shown": shown_loaded,
+    "loaded_when_ready": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_profile(module: str) -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """Return (total ms, [(module, cumulative ms)], deferred modules loaded)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=_env(),
+        check=True,
+    )
+    modules: List[Tuple[str, float]] = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        name = match.group(4)
+        modules.append((name, cumulative_ms))
+        if len(match.group(3)) == 1:
+            total += cumulative_ms  # top-level import
+    loaded = sorted({m for m in DEFERRED_MODULES for name, _ in modules if name == m})
+    return total, modules, loaded
+
+
+def startup_profile() -> Dict[str, object]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SNIPPET % (DEFERRED_MODULES, DEFERRED_MODULES)],
+        capture_output=True,
+        text=True,
+        env=_env(),
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="songsearch.app")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    parser.add_argument("--no-gui", action="store_true", help="only measure imports")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--budget-ms", type=float, help="fail if the window takes longer")
+    args = parser.parse_args()
+
+    runs = [import_profile(args.module) for _ in range(args.repeat)]
+    total, modules, loaded = min(runs, key=lambda r: r[0])
+    print(f"import {args.module}: {total:.1f} ms (best of {args.repeat})")
+    for name, ms in sorted(modules, key=lambda m: -m[1])[: args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    print(f"deferred modules loaded at import: {', '.join(loaded) or 'none'}")
+    results: Dict[str, object] = {"import_ms": total, "import_loaded": loaded}
+
+    if not args.no_gui:
+        startups = [startup_profile() for _ in range(args.repeat)]
+        best = min(startups, key=lambda r: r["window_shown_ms"])
+        print(f"window shown:  {best['window_shown_ms']:.1f} ms")
+        print(f"search ready:  {best['search_ready_ms']:.1f} ms")
+        for stage in ("shown", "ready"):
+            loaded = ", ".join(best[f"loaded_when_{stage}"]) or "none"
+            print(f"deferred modules loaded when {stage}: {loaded}")
+        results.update(best)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.budget_ms is not None and results.get("window_shown_ms", total) > args.budget_ms:
+        print(f"over budget ({args.budget_ms:.0f} ms)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Benchmark suite for the scan, search, plan and move hot paths.
+
+``run`` measures each hot path on libraries made up by
+:mod:`songsearch.synthetic` from a fixed seed and writes the results as
+JSON; ``compare`` checks a run against a stored baseline and exits with 1
+when a benchmark got slower than the tolerance:
+
+    python scripts/bench_suite.py run --output data/bench/baseline.json
+    python scripts/bench_suite.py run --output current.json
+    python scripts/bench_suite.py compare data/bench/baseline.json current.json
+
+Benchmarks (name: unit):
+
+* ``add_song``: songs/s through :meth:`DatabaseManager.add_song`;
+* ``search_song_like@N`` and ``fuzzy_search@N``: median ms per query on a
+  table of N songs (``--sizes``, 10k, 100k and 1M by default);
+* ``read_tags``: files/s on tagged MP3, FLAC, Ogg and M4A files;
+* ``plan_moves``: files/s, with the MusicBrainz enrichment stubbed out;
+* ``build_destination``: paths/s;
+* ``move``: files/s renamed by :class:`MoveExecutor` within one filesystem.
+
+Every benchmark is repeated ``--repeat`` times and the best run is kept,
+which is the least noisy estimate on a shared machine.  ``--quick`` shrinks
+every dataset for a smoke run.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from songsearch.db import DatabaseManager  # noqa: E402
+from songsearch.organizer import plan as plan_module  # noqa: E402
+from songsearch.organizer.destination import build_destination  # noqa: E402
+from songsearch.organizer.mover import MoveExecutor, MoveJournal  # noqa: E402
+from songsearch.search import fuzzy_search  # noqa: E402
+from songsearch.synthetic import TagGenerator, generate_library, populate_songs  # noqa: E402
+from songsearch.tags import read_tags  # noqa: E402
+
+SCHEMA = 1
+HIGHER, LOWER = "higher", "lower"  # which direction is better
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_TOLERANCE = 0.2
+
+def _result(value: float, unit: str, better: str, **extra) -> Dict[str, object]:
+    return {"value": round(value, 3), "unit": unit, "better": better, **extra}
+
+
+def _rate(fn: Callable[[], int], repeat: int, unit: str) -> Dict[str, object]:
+    """Best items/s of *repeat* calls of *fn*, which returns the items done."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = fn()
+        best = max(best, n / (time.perf_counter() - start))
+    return _result(best, unit, HIGHER)
+
+
+def _latency(fn: Callable[[str], object], queries: List[str], repeat: int) -> Dict[str, object]:
+    """Best median ms per query of *repeat* passes over *queries*."""
+    best = float("inf")
+    for _ in range(repeat):
+        times = []
+        for q in queries:
+            start = time.perf_counter()
+            fn(q)
+            times.append(time.perf_counter() - start)
+        best = min(best, statistics.median(times))
+    return _result(best * 1000, "ms", LOWER, queries=len(queries))
+
+
+def _queries(seed: int, n: int) -> List[str]:
+    """Words of titles from another stream of the same generator."""
+    rng = random.Random(seed)
+    titles = [t["title"].split() for t in itertools.islice(TagGenerator(seed + 1), n)]
+    return [" ".join(rng.sample(words, min(len(words), rng.randint(1, 2)))) for words in titles]
+
+
+def _metas(seed: int, n: int) -> List[Dict[str, str]]:
+    metas = []
+    for tags in itertools.islice(TagGenerator(seed), n):
+        year, _, month = tags.get("date", "").partition("-")
+        metas.append({**tags, "year": year, "month": month})
+    return metas
+
+
+def bench_add_song(tmp: str, n: int, repeat: int) -> Dict[str, object]:
+    def run() -> int:
+        path = os.path.join(tmp, "add_song.db")
+        if os.path.exists(path):
+            os.remove(path)
+        db = DatabaseManager(path)
+        for i in range(n):
+            db.add_song(name=f"t{i}", artist="A", title=f"Song {i}", path=f"/m/{i}.mp3")
+        return n
+
+    return _rate(run, repeat, "songs/s")
+
+
+def bench_search(tmp: str, size: int, seed: int, queries: int, repeat: int) -> Dict[str, dict]:
+    db = DatabaseManager(os.path.join(tmp, f"search{size}.db"))
+    populate_songs(db, size, seed)
+    qs = _queries(seed, queries)
+    results = {
+        f"search_song_like@{size}": _latency(db.search_song_like, qs, repeat),
+        f"fuzzy_search@{size}": _latency(lambda q: fuzzy_search(db, q, "song", 70), qs, repeat),
+    }
+    os.remove(db.db_path)
+    return results
+
+
+def bench_files(tmp: str, n: int, seed: int, repeat: int) -> Dict[str, dict]:
+    """``read_tags``, ``plan_moves`` and ``move`` on *n* generated audio files."""
+    lib = os.path.join(tmp, "lib")
+    paths = generate_library(lib, n, seed)
+    results = {"read_tags": _rate(lambda: len([read_tags(p) for p in paths]), repeat, "files/s")}
+
+    real_enrich = plan_module.enrich_with_musicbrainz
+    plan_module.enrich_with_musicbrainz = lambda path: {}
+    try:
+        dest = os.path.join(tmp, "organized")
+        results["plan_moves"] = _rate(
+            lambda: len(plan_module.plan_moves(paths, dest)), repeat, "files/s"
+        )
+    finally:
+        plan_module.enrich_with_musicbrainz = real_enrich
+
+    # Move the library back and forth between two folders of one filesystem.
+    best = 0.0
+    here, there = paths, [os.path.join(tmp, "moved", os.path.relpath(p, lib)) for p in paths]
+    for _ in range(repeat):
+        journal = MoveJournal(os.path.join(tmp, "moves.journal"))
+        if journal.exists():
+            os.remove(journal.path)
+        summary = MoveExecutor(journal).run(zip(here, there))
+        if summary.failed:
+            raise RuntimeError(f"move benchmark failed: {summary.failures[0].error}")
+        best = max(best, summary.moved / summary.elapsed)
+        here, there = there, here
+    results["move"] = _result(best, "files/s", HIGHER)
+    return results
+
+
+def bench_build_destination(n: int, seed: int, repeat: int) -> Dict[str, object]:
+    metas = _metas(seed, n)
+
+    def run() -> int:
+        for meta in metas:
+            build_destination("/music", meta, ".mp3")
+        return n
+
+    return _rate(run, repeat, "paths/s")
+
+
+def run_suite(
+    sizes: List[int],
+    seed: int = 1234,
+    repeat: int = 3,
+    files: int = 2000,
+    songs: int = 2000,
+    queries: int = 20,
+    only: Optional[List[str]] = None,
+) -> Dict[str, object]:
+    """Run the benchmarks (those whose name starts with one of *only*)."""
+
+    def wanted(name: str) -> bool:
+        return not only or any(name.startswith(o) for o in only)
+
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="songsearch-bench-") as tmp:
+        if wanted("add_song"):
+            results["add_song"] = bench_add_song(tmp, songs, repeat)
+        if wanted("search_song_like") or wanted("fuzzy_search"):
+            for size in sizes:
+                results.update(bench_search(tmp, size, seed, queries, repeat))
+        if any(wanted(n) for n in ("read_tags", "plan_moves", "move")):
+            results.update(bench_files(tmp, files, seed, repeat))
+        if wanted("build_destination"):
+            results["build_destination"] = bench_build_destination(files * 10, seed, repeat)
+    results = {name: r for name, r in results.items() if wanted(name)}
+    return {
+        "schema": SCHEMA,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "params": {"seed": seed, "repeat": repeat, "files": files, "songs": songs, "sizes": sizes},
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """One row per benchmark of *baseline*; ``regression`` marks the slower ones.
+
+    ``change`` is the relative change in the benchmark's "better" direction,
+    so negative values are slowdowns whichever the unit.
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            rows.append({"name": name, "baseline": base["value"], "current": None,
+                         "change": None, "regression": False})
+            continue
+        if base["better"] == HIGHER:
+            change = cur["value"] / base["value"] - 1 if base["value"] else 0.0
+        else:
+            change = base["value"] / cur["value"] - 1 if cur["value"] else 0.0
+        rows.append({
+            "name": name,
+            "unit": base["unit"],
+            "baseline": base["value"],
+            "current": cur["value"],
+            "change": change,
+            "regression": change < -tolerance,
+        })
+    return rows
+
+
+def _load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("schema") != SCHEMA:
+        sys.exit(f"{path}: unsupported benchmark file (schema {data.get('schema')})")
+    return data
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run the benchmarks and write JSON")
+    p.add_argument("--output", "-o", help="JSON file to write (default: stdout)")
+    p.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--seed", type=int, default=1234)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--files", type=int, default=2000, help="audio files for tags/plan/move")
+    p.add_argument("--songs", type=int, default=2000, help="add_song calls")
+    p.add_argument("--only", nargs="+", help="run benchmarks starting with these names")
+    p.add_argument("--quick", action="store_true", help="small datasets for a smoke run")
+
+    p = sub.add_parser("compare", help="flag regressions against a baseline")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                   help="allowed slowdown as a fraction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        if args.quick:
+            args.sizes, args.files, args.songs = [1000], 100, 100
+        report = run_suite(args.sizes, args.seed, args.repeat, args.files, args.songs,
+                           only=args.only)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        for name, r in report["results"].items():
+            print(f"{name:>28}: {r['value']:>12,.3f} {r['unit']}", file=sys.stderr)
+        return 0
+
+    rows = compare(_load(args.baseline), _load(args.current), args.tolerance)
+    for row in rows:
+        if row["current"] is None:
+            print(f"{row['name']:>28}: missing from {args.current}")
+            continue
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:>28}: {row['baseline']:>12,.3f} -> {row['current']:>12,.3f} "
+            f"{row['unit']:<8} {row['change']:+7.1%} {flag}"
+        )
+    regressions = sum(r["regression"] for r in rows)
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Generate a synthetic music library for load tests.
+
+``files`` writes N tiny tagged MP3/FLAC/OGG/M4A files below a folder;
+``songs`` inserts N rows straight into the songs table of a database, for
+search-only benchmarks at million-row scale:
+
+    python scripts/gen_library.py files /tmp/library -n 20000 --layout genre
+    python scripts/gen_library.py songs --db /tmp/big.db -n 1000000
+
+The same ``--seed`` always gives the same library.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from songsearch.db import DatabaseManager  # noqa: E402
+from songsearch.synthetic import (  # noqa: E402
+    DEFAULT_LAYOUT,
+    FORMATS,
+    LAYOUTS,
+    TagGenerator,
+    generate_library,
+    populate_songs,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("files", help="write audio files")
+    p.add_argument("folder")
+    p.add_argument("--formats", nargs="+", default=[f[1:] for f in FORMATS], help="mp3 flac ogg m4a")
+    p.add_argument(
+        "--layout",
+        default=DEFAULT_LAYOUT,
+        help=f"{', '.join(LAYOUTS)} or a template such as '{{genre}}/{{title}}{{ext}}'",
+    )
+    p.add_argument("--artists", type=int, default=500, help="size of the artist pool")
+
+    p = sub.add_parser("songs", help="insert rows into the songs table")
+    p.add_argument("--db", required=True, help="database to fill (created if missing)")
+    p.add_argument("--root", default="/music", help="folder the made-up paths live in")
+
+    for p in sub.choices.values():
+        p.add_argument("-n", type=int, default=1000, help="number of songs")
+        p.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "files":
+        tags = TagGenerator(args.seed, artists=args.artists)
+        n = len(generate_library(args.folder, args.n, args.seed, args.formats, args.layout, tags))
+    else:
+        n = populate_songs(DatabaseManager(args.db), args.n, args.seed, args.root)
+    print(f"{n} songs in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
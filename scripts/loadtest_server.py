@@ -0,0 +1,144 @@
+"""Load test for the local HTTP search service (:mod:`songsearch.server`).
+
+Sends ``/search`` requests from several concurrent clients (threads, one
+keep-alive connection each) and reports throughput and the p50/p99 latency
+seen by the clients, next to the server-side numbers from ``/metrics``.
+
+Queries are drawn from song titles in the database, with a few characters
+dropped so they exercise fuzzy matching.  Either point the script at a
+running server, or let it start one in-process on a temporary database:
+
+    python -m songsearch serve &
+    python scripts/loadtest_server.py --url http://127.0.0.1:8765 --clients 8
+
+    python scripts/loadtest_server.py --rows 100000 --clients 8 --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_search_index import fill  # noqa: E402
+
+from songsearch.db import DatabaseManager  # noqa: E402
+from songsearch.search.index import SearchIndex  # noqa: E402
+from songsearch.server import SearchServer, SearchService, percentile  # noqa: E402
+
+
+def sample_queries(db_path: str, n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    with sqlite3.connect(db_path) as c:
+        titles = [r[0] for r in c.execute("SELECT title FROM songs WHERE title IS NOT NULL LIMIT 50000")]
+    if not titles:
+        sys.exit("the database has no titles to query")
+    queries = []
+    for _ in range(n):
+        title = rng.choice(titles)
+        if len(title) > 6:
+            cut = rng.randrange(len(title))
+            title = title[:cut] + title[cut + 1 :]
+        queries.append(title)
+    return queries
+
+
+def client(url: str, queries: List[str], batch: int, latencies: List[float], errors: List[int]) -> None:
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    try:
+        for i in range(0, len(queries), batch):
+            body = json.dumps({"queries": queries[i : i + batch]}).encode("utf-8")
+            start = time.perf_counter()
+            conn.request("POST", "/search", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status != 200:
+                errors.append(response.status)
+    finally:
+        conn.close()
+
+
+def run(url: str, queries: List[str], clients: int, batch: int) -> None:
+    per_client = [queries[i::clients] for i in range(clients)]
+    latencies: List[float] = []
+    errors: List[int] = []
+    threads = [
+        threading.Thread(target=client, args=(url, qs, batch, latencies, errors))
+        for qs in per_client
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"clients={clients} requests={len(latencies)} queries/request={batch} errors={len(errors)}")
+    print(f"throughput: {len(latencies) / elapsed:8.1f} req/s  {len(queries) / elapsed:8.1f} queries/s")
+    print(
+        f"client latency: p50 {percentile(latencies, 50):7.1f} ms  "
+        f"p99 {percentile(latencies, 99):7.1f} ms  max {latencies[-1]:7.1f} ms"
+    )
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    conn.request("GET", "/metrics")
+    metrics = json.loads(conn.getresponse().read()).get("POST /search", {})
+    conn.close()
+    if metrics:
+        print(
+            f"server latency: p50 {metrics['p50_ms']:7.1f} ms  "
+            f"p99 {metrics['p99_ms']:7.1f} ms  (over its last {metrics['count']} requests)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="server to test; default: start one in-process")
+    parser.add_argument("--db", help="database for query sampling (and the in-process server)")
+    parser.add_argument("--rows", type=int, default=50_000, help="synthetic songs when no --db")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--batch", type=int, default=1, help="queries per request")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "songs.db")
+            DatabaseManager(db_path)
+            fill(db_path, args.rows, args.seed)
+        queries = sample_queries(db_path, args.clients * args.requests * args.batch, args.seed)
+
+        if args.url:
+            run(args.url, queries, args.clients, args.batch)
+            return
+
+        service = SearchService(DatabaseManager(db_path), SearchIndex(os.path.join(tmp, "search.idx")))
+        server = SearchServer(("127.0.0.1", 0), service)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            host, port = server.server_address[:2]
+            run(f"http://{host}:{port}", queries, args.clients, args.batch)
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,25 @@
 """SongSearch package."""
 
-from .tags import read_tags
-from .musicbrainz import detect_fpcalc, enrich_with_musicbrainz
+import importlib
+from typing import Any
+
+# Exported helpers are imported on first access: ``tags`` loads mutagen and
+# ``musicbrainz`` its optional clients, neither of which the GUI needs to show
+# its main window.
+_LAZY_EXPORTS = {
+    "read_tags": ".tags",
+    "detect_fpcalc": ".musicbrainz",
+    "enrich_with_musicbrainz": ".musicbrainz",
+}
 
 __all__ = ["read_tags", "detect_fpcalc", "enrich_with_musicbrainz"]
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _LAZY_EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
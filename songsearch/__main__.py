@@ -3,32 +3,40 @@
 from __future__ import annotations
 
 import sys
-from typing import Optional
+from typing import Optional, Sequence
 
 from . import config
 
-try:  # pragma: no cover - import side effects are environment dependent
-    from PyQt5.QtWidgets import QApplication  # type: ignore
-    _IMPORT_ERROR: Optional[Exception] = None
-except Exception as exc:  # noqa: BLE001 - we want to catch anything import might raise
-    QApplication = None  # type: ignore[assignment]
-    _IMPORT_ERROR = exc
+COMMANDS = ("index", "search", "plan", "apply", "dupes", "plans", "watch", "serve")
 
 
-def main() -> None:
+def main(argv: Optional[Sequence[str]] = None) -> None:
     """Launch the application.
 
+    When the first argument is one of :data:`COMMANDS` the headless command
+    line interface in :mod:`songsearch.cli` is run instead of the GUI; it
+    does not need PyQt5.
+
     If PyQt5 (or its native dependencies such as ``libGL``) is not available,
-    a friendly message is printed instead of raising an ``ImportError`` at
-    import time.  This makes the module usable in headless environments and
+    a friendly message is printed instead of raising an ``ImportError``.
+    Qt is only imported once the GUI is chosen.  This makes the module usable in headless environments and
     provides clearer feedback to the user.
     """
     config.init_paths()
 
-    if QApplication is None:  # pragma: no cover - only triggered when Qt missing
+    args = list(sys.argv[1:] if argv is None else argv)
+    if args and args[0] in COMMANDS:
+        from . import cli
+
+        sys.exit(cli.main(args))
+
+    # Imported only for the GUI so that the commands above never load Qt.
+    try:
+        from PyQt5.QtWidgets import QApplication  # type: ignore
+    except Exception as exc:  # noqa: BLE001 - we want to catch anything import might raise
         print(
             "PyQt5 is required to run the GUI but could not be imported:\n"
-            f"{_IMPORT_ERROR}",
+            f"{exc}",
             file=sys.stderr,
         )
         sys.exit(1)
@@ -1,10 +1,16 @@
+from __future__ import annotations
+
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from PyQt5.QtCore import QFile
 from PyQt5.QtWidgets import QAction, QMainWindow, QTabWidget
 
-from .ui.search_panel import SearchPanel
-from .ui.organizer_panel import OrganizerPanel
+from .ui.lazy_tab import LazyTab
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .ui.organizer_panel import OrganizerPanel
+    from .ui.search_panel import SearchPanel
 
 
 class MainWindow(QMainWindow):
@@ -13,11 +19,14 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("SongSearch")
         self.resize(1100, 700)
 
+        # Panels (and the modules behind them: QtMultimedia, mutagen, rapidfuzz,
+        # the database) are only loaded once their tab is shown or used, so
+        # the window appears before any of that work is done.
         self.tabs = QTabWidget()
-        self.search_panel = SearchPanel(self)
-        self.organizer_panel = OrganizerPanel(self)
-        self.tabs.addTab(self.search_panel, "Buscar")
-        self.tabs.addTab(self.organizer_panel, "Organizar")
+        self.search_tab = LazyTab(_create_search_panel)
+        self.organizer_tab = LazyTab(_create_organizer_panel)
+        self.tabs.addTab(self.search_tab, "Buscar")
+        self.tabs.addTab(self.organizer_tab, "Organizar")
         self.setCentralWidget(self.tabs)
 
         qss_path = Path(__file__).parent / "ui" / "styles.qss"
@@ -28,6 +37,14 @@ class MainWindow(QMainWindow):
 
         self._build_menus()
 
+    @property
+    def search_panel(self) -> SearchPanel:
+        return self.search_tab.widget()
+
+    @property
+    def organizer_panel(self) -> OrganizerPanel:
+        return self.organizer_tab.widget()
+
     def _build_menus(self) -> None:
         menubar = self.menuBar()
         org_menu = menubar.addMenu("Organizar")
@@ -37,6 +54,18 @@ class MainWindow(QMainWindow):
         org_menu.addAction(act_select)
         org_menu.addAction(act_dest)
         org_menu.addAction(act_run)
-        act_select.triggered.connect(self.organizer_panel.select_files)
-        act_dest.triggered.connect(self.organizer_panel.select_destination)
-        act_run.triggered.connect(self.organizer_panel.organize_files)
+        act_select.triggered.connect(lambda: self.organizer_panel.select_files())
+        act_dest.triggered.connect(lambda: self.organizer_panel.select_destination())
+        act_run.triggered.connect(lambda: self.organizer_panel.organize_files())
+
+
+def _create_search_panel() -> SearchPanel:
+    from .ui.search_panel import SearchPanel
+
+    return SearchPanel()
+
+
+def _create_organizer_panel() -> OrganizerPanel:
+    from .ui.organizer_panel import OrganizerPanel
+
+    return OrganizerPanel()
@@ -0,0 +1,285 @@
+"""Compact columnar in-memory song catalogue.
+
+Holding a large library as one tuple (or dict) per song costs several hundred
+bytes per row in object headers alone.  :class:`SongCatalogue` stores each
+field as a column instead:
+
+* ``id``, ``duration`` and ``size`` live in :class:`array.array` columns;
+* ``name``, ``title`` and ``path`` are mostly unique and are kept as UTF-8
+  blobs with an offset table (:class:`~songsearch.search.packed.PackedStrings`);
+* ``artist`` repeats heavily and is dictionary encoded: every distinct value
+  is stored once and rows hold a small integer code.
+
+Rows are materialized on demand as :class:`SongRow` views, which only hold a
+reference to the catalogue and a row number.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from rapidfuzz import fuzz, process
+
+from .db import DatabaseManager
+from .search import DEFAULT_LIMIT, _to_result
+from .search.index import _KEY_SEP, normalize
+from .search.packed import PackedStrings, PackedStringsBuilder
+
+# Integer columns use this value to represent SQL ``NULL``.
+_MISSING = -1
+
+
+class _DictColumn:
+    """Dictionary-encoded string column; code 0 is ``None``."""
+
+    __slots__ = ("codes", "values", "_lookup")
+
+    def __init__(self) -> None:
+        self.codes = array("I")
+        self.values: List[Optional[str]] = [None]
+        self._lookup: Dict[str, int] = {}
+
+    def append(self, value: Optional[str]) -> None:
+        if not value:
+            self.codes.append(0)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        self.codes.append(code)
+
+    def freeze(self) -> None:
+        """Drop the build-time lookup table."""
+        self._lookup = {}
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        return self.values[self.codes[i]]
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.codes.buffer_info()[1] * self.codes.itemsize
+            + sys.getsizeof(self.values)
+            + sum(sys.getsizeof(v) for v in self.values if v is not None)
+        )
+
+
+class SongRow:
+    """Lightweight view of one catalogue row.
+
+    Indexing a row with ``0..4`` yields ``id, name, artist, title, path`` so
+    views can be used wherever :mod:`songsearch.search` expects a row tuple.
+    """
+
+    __slots__ = ("_cat", "_i")
+
+    def __init__(self, catalogue: "SongCatalogue", i: int) -> None:
+        self._cat = catalogue
+        self._i = i
+
+    @property
+    def id(self) -> int:
+        return self._cat._ids[self._i]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._cat._name[self._i] or None
+
+    @property
+    def artist(self) -> Optional[str]:
+        return self._cat._artist[self._i]
+
+    @property
+    def title(self) -> Optional[str]:
+        return self._cat._title[self._i] or None
+
+    @property
+    def path(self) -> Optional[str]:
+        return self._cat._path[self._i] or None
+
+    @property
+    def duration(self) -> Optional[int]:
+        value = self._cat._duration[self._i]
+        return None if value == _MISSING else value
+
+    @property
+    def size(self) -> Optional[int]:
+        value = self._cat._size[self._i]
+        return None if value == _MISSING else value
+
+    _FIELDS = ("id", "name", "artist", "title", "path")
+
+    def __getitem__(self, key: int) -> Any:
+        return getattr(self, self._FIELDS[key])
+
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+
+    def as_tuple(self) -> Tuple:
+        return tuple(getattr(self, f) for f in self._FIELDS)
+
+    def __repr__(self) -> str:
+        return f"SongRow(id={self.id!r}, artist={self.artist!r}, title={self.title!r})"
+
+
+class SongCatalogue(Sequence[SongRow]):
+    """Columnar, read-only collection of songs.
+
+    Text columns treat empty strings as ``None`` and integer columns store
+    ``NULL`` as ``-1``.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[Any]] = ()) -> None:
+        """Build the catalogue from ``(id, name, artist, title, path, duration, size)`` rows."""
+        self._ids = array("q")
+        self._duration = array("q")
+        self._size = array("q")
+        name, title, path = PackedStringsBuilder(), PackedStringsBuilder(), PackedStringsBuilder()
+        self._artist = _DictColumn()
+        for song_id, n, a, t, p, duration, size in rows:
+            self._ids.append(song_id)
+            name.append(n)
+            self._artist.append(a)
+            title.append(t)
+            path.append(p)
+            self._duration.append(_MISSING if duration is None else int(duration))
+            self._size.append(_MISSING if size is None else int(size))
+        self._artist.freeze()
+        self._name: PackedStrings = name.build()
+        self._title: PackedStrings = title.build()
+        self._path: PackedStrings = path.build()
+
+    @classmethod
+    def from_db(cls, db: DatabaseManager) -> "SongCatalogue":
+        """Load every song from *db* in a single streaming read."""
+        return cls(db.iter_catalogue_rows())
+
+    # ------------------------------------------------------------ sequence --
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [SongRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SongCatalogue index out of range")
+        return SongRow(self, index)
+
+    def __iter__(self) -> Iterator[SongRow]:
+        return (SongRow(self, i) for i in range(len(self)))
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Return the approximate number of bytes held by each column."""
+
+        def arr(a: array) -> int:
+            return a.buffer_info()[1] * a.itemsize
+
+        usage = {
+            "id": arr(self._ids),
+            "duration": arr(self._duration),
+            "size": arr(self._size),
+            "name": self._name.nbytes,
+            "title": self._title.nbytes,
+            "path": self._path.nbytes,
+            "artist": self._artist.nbytes,
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def bytes_per_song(self) -> float:
+        return self.memory_usage()["total"] / max(1, len(self))
+
+    # -------------------------------------------------------------- search --
+    def search(
+        self, query: str, mode: str, threshold: int, limit: int = DEFAULT_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """Fuzzy match *query* against the songs whose key contains it.
+
+        Candidates are filtered like :class:`~songsearch.search.index.SearchIndex`
+        does, so the matches equal those of :func:`songsearch.search.fuzzy_search`
+        with an index.  Keys are decoded on the fly for each search rather
+        than cached, so the catalogue's memory footprint does not grow with
+        use.
+        """
+        rows: List[int] = []
+        choices: List[str] = []
+        for i, key in self._candidate_keys(normalize(query), mode):
+            rows.append(i)
+            choices.append(key)
+        matches = process.extract(
+            query,
+            choices,
+            scorer=fuzz.WRatio,
+            score_cutoff=threshold,
+            limit=limit,
+        )
+        return [_to_result(self[rows[idx]], score) for _text, score, idx in matches]
+
+    def _candidate_keys(self, needle: str, mode: str) -> Iterator[Tuple[int, str]]:
+        """Yield ``(row, key)`` for the rows whose normalized key contains *needle*.
+
+        Keys are the same as :func:`songsearch.search._choice_key`; an empty
+        *needle* matches every row.
+        """
+        if mode == "artist":
+            values = self._artist.values
+            hits = [not needle or needle in normalize(v) for v in values]
+            return (
+                (i, values[code] or "") for i, code in enumerate(self._artist.codes) if hits[code]
+            )
+        return (
+            (i, title or name)
+            for i, (title, name) in enumerate(zip(self._title, self._name))
+            if not needle or needle in normalize(title) + _KEY_SEP + normalize(name)
+        )
+
+    # ---------------------------------------------------------- duplicates --
+    def duplicates(self, duration_tolerance: int = 2) -> List[List[SongRow]]:
+        """Group songs that look like copies of the same recording.
+
+        Songs are grouped by normalized artist and title (the filename when
+        there is no title) and, inside a group, split wherever consecutive
+        durations differ by more than *duration_tolerance* seconds.  Songs
+        without a duration only match other songs without one.
+        """
+        artists = [_normalize(v) for v in self._artist.values]
+        groups: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        rows = zip(self._artist.codes, self._title, self._name)
+        for i, (code, title, name) in enumerate(rows):
+            title = title or name
+            if title:
+                groups[(artists[code], _normalize(title))].append(i)
+
+        found: List[List[SongRow]] = []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            members.sort(key=lambda i: self._duration[i])
+            cluster = [members[0]]
+            for i in members[1:]:
+                prev = self._duration[cluster[-1]]
+                cur = self._duration[i]
+                same = cur == prev if _MISSING in (cur, prev) else cur - prev <= duration_tolerance
+                if same:
+                    cluster.append(i)
+                    continue
+                if len(cluster) > 1:
+                    found.append([SongRow(self, j) for j in cluster])
+                cluster = [i]
+            if len(cluster) > 1:
+                found.append([SongRow(self, j) for j in cluster])
+        return found
+
+
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(text: Optional[str]) -> str:
+    return _SPACES.sub(" ", (text or "").casefold()).strip()
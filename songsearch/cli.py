@@ -0,0 +1,570 @@
+"""Headless command line interface.
+
+``python -m songsearch <command> ...`` runs one of the commands below without
+importing Qt, so it can be used from cron jobs and on servers:
+
+``index``   scan folders and add the songs to the database
+``search``  fuzzy-search queries given as arguments or one per line on stdin
+``plan``    build a move plan for files or folders
+``apply``   execute a plan produced by ``plan``
+``dupes``   list groups of probable duplicate songs
+``plans``   list, show, export or import plans saved in the database
+``watch``   keep the database in sync with folders as they change
+``serve``   run the local HTTP search service (see :mod:`songsearch.server`)
+
+Every command writes one JSON object per line (NDJSON) on stdout and flushes
+after each batch, so results can be consumed while the command is running.
+Logging goes to stderr.  ``--workers`` and ``--batch-size`` trade memory and
+CPU for throughput; ``index --workers 0`` (the default) adapts the number of
+parallel reads to each device.
+
+``--metrics FILE`` times every stage of the command (see
+:mod:`songsearch.metrics`), logs a summary every ``--metrics-interval``
+seconds and writes the final numbers to FILE in the Prometheus text format
+(``-`` for stderr).  ``--profile cpu,sample,memory`` profiles the command
+and writes the reports to ``data/profiles`` (see :mod:`songsearch.profiling`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import metrics, profiling
+from .catalogue import SongCatalogue
+from .concurrency import device_of
+from .config import (
+    DB_PATH,
+    DEFAULT_DEST_TEMPLATE,
+    DEFAULT_FUZZY_THRESHOLD,
+    FILE_EXTS,
+    INDEX_PATH,
+    MOVE_JOURNAL_PATH,
+)
+from .db import DatabaseManager
+from .indexer import DEFAULT_BATCH_SIZE, LibraryIndexer, ScanProgress, iter_audio_files
+from .logger import logger
+from .organizer.collisions import STRATEGIES, CollisionIndex
+from .organizer.destination import TemplateError, compile_template
+from .organizer.estimate import estimate_moves
+from .organizer.mover import MoveExecutor, MoveJournal, MoveResult
+from .organizer.plan import export_plan_csv, import_plan_csv, plan_moves
+from .search import DEFAULT_LIMIT, fuzzy_search
+from .search.index import SearchIndex
+from .server import DEFAULT_HOST, DEFAULT_PORT, serve
+
+# ---------------------------------------------------------------- helpers --
+def _emit(out: IO[str], obj: Dict[str, Any]) -> None:
+    out.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _stdin_lines(stdin: IO[str]) -> Iterator[str]:
+    for line in stdin:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _inputs(values: Sequence[str], stdin: IO[str]) -> Iterable[str]:
+    """Return *values*, or the lines of *stdin* when empty or ``-``."""
+    if not values or list(values) == ["-"]:
+        return _stdin_lines(stdin)
+    return values
+
+
+def _index_path(db_path: str) -> str:
+    # Keep one index file per database so switching --db does not force a
+    # rebuild of the shared one.
+    if os.path.abspath(db_path) == os.path.abspath(DB_PATH):
+        return INDEX_PATH
+    return os.path.splitext(db_path)[0] + ".idx"
+
+
+def _map(workers: int) -> Tuple[Callable[..., Iterator[Any]], Optional[ThreadPoolExecutor]]:
+    if workers > 1:
+        executor = ThreadPoolExecutor(workers)
+        return executor.map, executor
+    return map, None
+
+
+# --------------------------------------------------------------- commands --
+def cmd_index(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    db = DatabaseManager(args.db)
+    exts = args.ext or FILE_EXTS
+    lock = threading.Lock()
+
+    def index_root(root: str) -> int:
+        def progress(p: ScanProgress) -> None:
+            with lock:
+                _emit(
+                    out,
+                    {
+                        "event": "progress",
+                        "root": root,
+                        "files_done": p.files_done,
+                        "files_total": p.files_total,
+                        "bytes_done": p.bytes_done,
+                        "files_per_sec": round(p.files_per_sec, 1),
+                        "bytes_per_sec": round(p.bytes_per_sec, 1),
+                        "eta": None if p.eta is None else round(p.eta, 1),
+                    },
+                )
+                out.flush()
+
+        return LibraryIndexer(
+            db, root, exts, batch_size=args.batch_size, workers=args.workers
+        ).run(progress)
+
+    # Roots on different devices are scanned concurrently, roots sharing a
+    # device one after the other.
+    by_device: Dict[int, List[str]] = {}
+    for root in _inputs(args.roots, stdin):
+        by_device.setdefault(device_of(root), []).append(root)
+    groups = list(by_device.values())
+    with ThreadPoolExecutor(max(1, len(groups)), thread_name_prefix="index") as pool:
+        total = sum(pool.map(lambda roots: sum(map(index_root, roots)), groups))
+    SearchIndex(_index_path(args.db)).refresh(db)
+    _emit(out, {"event": "done", "files": total})
+    return 0
+
+
+def cmd_search(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    db = DatabaseManager(args.db)
+    queries = _inputs(args.queries, stdin)
+    if args.workers > 1:
+        # Multi-process engine: load the library once, then score every
+        # batch of queries on all cores.
+        from .search.sharded import ShardedSearchEngine
+
+        # Same candidates and cap as the single-process path below.
+        limit = min(args.limit, DEFAULT_LIMIT)
+        with ShardedSearchEngine.from_db(db, workers=args.workers, limit=limit) as engine:
+            for batch in _batched(queries, args.batch_size):
+                results = engine.search_batch([q.lower() for q in batch], args.mode, args.threshold)
+                for q, matches in zip(batch, results):
+                    _emit(out, {"query": q, "matches": matches})
+                out.flush()
+        return 0
+
+    index = SearchIndex(_index_path(args.db))
+    try:
+        index.refresh(db)
+        for batch in _batched(queries, args.batch_size):
+            for q in batch:
+                matches = fuzzy_search(db, q.lower(), args.mode, args.threshold, index=index)
+                _emit(out, {"query": q, "matches": matches[: args.limit]})
+            out.flush()
+    finally:
+        index.close()
+    return 0
+
+
+def _plan_sources(values: Sequence[str], stdin: IO[str]) -> Iterator[str]:
+    for value in _inputs(values, stdin):
+        if os.path.isdir(value):
+            yield from iter_audio_files(value)
+        else:
+            yield value
+
+
+def cmd_plan(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    try:
+        compile_template(args.template)
+    except TemplateError as exc:
+        logger.error(str(exc))
+        return 2
+    db = plan_id = None
+    if args.save is not None:
+        db = DatabaseManager(args.db)
+        plan_id = db.create_plan(args.dest, args.save, args.template)
+        logger.info(f"Saving plan {plan_id}")
+    collisions = CollisionIndex(args.on_collision)
+    # keep-best may drop an entry in favour of a later one, so entries are
+    # only written once the whole plan has been resolved.
+    held: List[Dict[str, str]] = []
+
+    def flush(entries: List[Dict[str, str]]) -> None:
+        for entry in entries:
+            _emit(out, entry)
+        if db is not None:
+            db.save_plan_entries(plan_id, entries)
+        out.flush()
+
+    mapper, executor = _map(args.workers)
+    try:
+        batches = _batched(_plan_sources(args.paths, stdin), args.batch_size)
+        # plan_moves is called on slices of the batch so the workers share it.
+        for batch in batches:
+            step = max(1, -(-len(batch) // args.workers))
+            chunks = [batch[i : i + step] for i in range(0, len(batch), step)]
+            plans = mapper(lambda chunk: plan_moves(chunk, args.dest, args.template), chunks)
+            entries = [entry for plan in plans for entry in plan]
+            collisions.resolve(entries)
+            if args.on_collision == "keep-best":
+                held.extend(entries)
+            else:
+                flush(entries)
+        flush(held)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    report = collisions.report
+    if report.collisions:
+        logger.info(
+            f"{report.collisions} destination collisions: {report.renamed} renamed, "
+            f"{report.skipped} skipped, {report.replaced} replaced"
+        )
+    return 0
+
+
+def _apply_entry(entry: Dict[str, Any], dry_run: bool) -> Optional[Dict[str, Any]]:
+    """Return the result for an entry that is not moved, or ``None``."""
+    src = entry.get("original_path") or ""
+    dest = entry.get("proposed_path") or ""
+    result = {"original_path": src, "proposed_path": dest}
+    if entry.get("status") != "ok" or not src or not dest:
+        return {**result, "status": "skipped", "reason": entry.get("reason") or "not planned"}
+    if os.path.exists(dest):
+        return {**result, "status": "skipped", "reason": "destination exists"}
+    if dry_run:
+        return {**result, "status": "pending", "reason": "dry run"}
+    return None
+
+
+def _move_result(r: MoveResult) -> Dict[str, Any]:
+    if r.status == "failed":
+        logger.error(f"Move error: {r.src} -> {r.error}")
+        return {"original_path": r.src, "proposed_path": r.dest, "status": "error", "reason": r.error}
+    if r.status == "undone":
+        # Report the restored file in terms of the original plan entry.
+        return {"original_path": r.dest, "proposed_path": r.src, "status": "rolled_back", "reason": ""}
+    return {"original_path": r.src, "proposed_path": r.dest, "status": "moved", "reason": r.method}
+
+
+def cmd_apply(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    db = DatabaseManager(args.db)
+    executor = MoveExecutor(
+        MoveJournal(args.journal, sync_every=args.batch_size),
+        db,
+        copy_workers=args.workers,
+        batch_size=args.batch_size,
+    )
+
+    def on_result(r: MoveResult) -> None:
+        _emit(out, _move_result(r))
+        out.flush()
+
+    if args.resume or args.rollback:
+        summary = executor.resume(on_result) if args.resume else executor.rollback(on_result)
+        return 1 if summary.failed else 0
+
+    if args.plan == "-":
+        lines: Iterable[str] = _stdin_lines(stdin)
+        fh = None
+    else:
+        fh = open(args.plan, encoding="utf-8")
+        lines = _stdin_lines(fh)
+    # The whole plan goes to the executor at once so it can be journaled and
+    # grouped by device; entries that will not be moved are reported first.
+    moves: List[Tuple[str, str]] = []
+    not_planned = 0
+    try:
+        for batch in _batched((json.loads(line) for line in lines), args.batch_size):
+            for entry in batch:
+                skipped = _apply_entry(entry, args.dry_run and not args.estimate)
+                if skipped is None:
+                    moves.append((entry["original_path"], entry["proposed_path"]))
+                elif args.estimate:
+                    not_planned += 1
+                else:
+                    _emit(out, skipped)
+            out.flush()
+    finally:
+        if fh is not None:
+            fh.close()
+    if args.estimate:
+        # Only the cost of the plan is reported; nothing is moved.
+        estimate = estimate_moves(moves, db, sample_bytes=args.sample_mb * 1024 * 1024)
+        _emit(out, {"event": "estimate", "not_planned": not_planned, **estimate.as_dict()})
+        return 0 if estimate.fits else 1
+    if not moves:
+        return 0
+    try:
+        summary = executor.run(moves, on_result)
+    except RuntimeError as exc:
+        logger.error(str(exc))
+        return 1
+    return 1 if summary.failed else 0
+
+
+def cmd_dupes(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    catalogue = SongCatalogue.from_db(DatabaseManager(args.db))
+    for group in catalogue.duplicates(duration_tolerance=args.tolerance):
+        _emit(
+            out,
+            {
+                "songs": [
+                    {
+                        "id": row.id,
+                        "name": row.name,
+                        "artist": row.artist,
+                        "title": row.title,
+                        "path": row.path,
+                        "duration": row.duration,
+                        "size": row.size,
+                    }
+                    for row in group
+                ]
+            },
+        )
+    return 0
+
+
+def cmd_plans(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    db = DatabaseManager(args.db)
+    if args.action == "list":
+        for plan_id, name, dest_dir, created_at, entries in db.list_plans():
+            _emit(
+                out,
+                {
+                    "id": plan_id,
+                    "name": name,
+                    "dest_dir": dest_dir,
+                    "created_at": created_at,
+                    "entries": entries,
+                },
+            )
+        return 0
+    if args.action == "import":
+        plan_id = db.create_plan(args.dest, args.name)
+        count = db.save_plan_entries(plan_id, import_plan_csv(args.csv))
+        _emit(out, {"id": plan_id, "entries": count})
+        return 0
+
+    if db.get_plan(args.plan_id) is None:
+        logger.error(f"No plan with id {args.plan_id}")
+        return 1
+    entries = db.iter_plan_entries(args.plan_id, args.status, args.checked)
+    if args.action == "export":
+        ok, errors = export_plan_csv(entries, args.csv)
+        _emit(out, {"id": args.plan_id, "ok": ok, "errors": errors})
+        return 0
+    # show: entries as NDJSON, ready to be piped into ``apply``
+    for batch in _batched(entries, args.batch_size):
+        for entry in batch:
+            _emit(out, entry)
+        out.flush()
+    return 0
+
+
+def cmd_watch(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    from .watcher import LibraryWatcher
+
+    db = DatabaseManager(args.db)
+    index = SearchIndex(_index_path(args.db))
+
+    def on_batch(upserted: int, deleted: int) -> None:
+        index.refresh(db)
+        _emit(out, {"event": "batch", "upserted": upserted, "deleted": deleted})
+        out.flush()
+
+    watcher = LibraryWatcher(
+        db,
+        list(_inputs(args.roots, stdin)),
+        args.ext or FILE_EXTS,
+        backend=args.backend,
+        debounce=args.debounce,
+        poll_interval=args.poll_interval,
+        batch_size=args.batch_size,
+        on_batch=on_batch,
+    )
+    _emit(out, {"event": "watching", "backend": watcher.backend, "roots": watcher.roots})
+    out.flush()
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        index.close()
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace, out: IO[str], stdin: IO[str]) -> int:
+    serve(DatabaseManager(args.db), SearchIndex(_index_path(args.db)), args.host, args.port)
+    return 0
+
+
+# Profile names of the commands that run a scan, search, plan or move.
+_OPERATIONS = {"index": "scan", "search": "search", "plan": "plan", "apply": "organize"}
+
+
+# ----------------------------------------------------------------- parser --
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m songsearch", description=__doc__.splitlines()[0]
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    common.add_argument(
+        "--metrics", metavar="FILE", help="time each stage; write Prometheus text to FILE ('-': stderr)"
+    )
+    common.add_argument(
+        "--metrics-interval", type=float, default=60.0, help="seconds between metric log summaries"
+    )
+    common.add_argument(
+        "--profile",
+        metavar="MODES",
+        help="profile the command: cpu, sample and/or memory, comma-separated (or all)",
+    )
+    common.add_argument(
+        "--profile-top", type=int, default=None, help="functions listed per profile summary"
+    )
+
+    def tuning(p: argparse.ArgumentParser, workers: int = 1) -> None:
+        p.add_argument("--workers", type=int, default=workers, help="parallel workers")
+        p.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="items per batch"
+        )
+
+    p = sub.add_parser("index", parents=[common], help="scan folders into the database")
+    p.add_argument("roots", nargs="*", help="folders to scan ('-' or none: read from stdin)")
+    p.add_argument("--ext", action="append", help="extension to include (repeatable)")
+    tuning(p, workers=0)
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("search", parents=[common], help="fuzzy-search songs")
+    p.add_argument("queries", nargs="*", help="queries ('-' or none: one per line on stdin)")
+    p.add_argument("--mode", choices=("song", "artist"), default="song")
+    p.add_argument("--threshold", type=int, default=DEFAULT_FUZZY_THRESHOLD)
+    p.add_argument("--limit", type=int, default=50)
+    tuning(p)
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("plan", parents=[common], help="plan where files should be moved")
+    p.add_argument("paths", nargs="*", help="files or folders ('-' or none: read from stdin)")
+    p.add_argument("--dest", required=True, help="destination base folder")
+    p.add_argument(
+        "--save", nargs="?", const="", metavar="NAME", help="also save the plan in the database"
+    )
+    p.add_argument(
+        "--template",
+        default=DEFAULT_DEST_TEMPLATE,
+        help="destination template, e.g. '{albumartist|artist}/{album}/[{disc}-]{track} {title}{ext}'",
+    )
+    p.add_argument(
+        "--on-collision",
+        choices=STRATEGIES,
+        default="suffix",
+        help="what to do when destinations collide (default: %(default)s)",
+    )
+    tuning(p)
+    p.set_defaults(func=cmd_plan)
+
+    p = sub.add_parser("apply", parents=[common], help="move files according to a plan")
+    p.add_argument("plan", nargs="?", default="-", help="NDJSON plan file (default: stdin)")
+    p.add_argument("--dry-run", action="store_true", help="report without moving")
+    p.add_argument(
+        "--estimate",
+        action="store_true",
+        help="only print renames/copies, bytes, free space and ETA (exit 1 if it does not fit)",
+    )
+    p.add_argument(
+        "--sample-mb", type=int, default=8, help="MB copied to measure throughput (0: skip)"
+    )
+    p.add_argument(
+        "--journal", default=MOVE_JOURNAL_PATH, help="move journal (default: %(default)s)"
+    )
+    undo = p.add_mutually_exclusive_group()
+    undo.add_argument("--resume", action="store_true", help="finish an interrupted apply")
+    undo.add_argument("--rollback", action="store_true", help="undo the last apply")
+    tuning(p, workers=4)
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("dupes", parents=[common], help="list probable duplicates")
+    p.add_argument("--tolerance", type=int, default=2, help="duration tolerance in seconds")
+    p.set_defaults(func=cmd_dupes)
+
+    p = sub.add_parser("plans", parents=[common], help="manage plans saved in the database")
+    actions = p.add_subparsers(dest="action", required=True)
+    actions.add_parser("list", help="list saved plans")
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("plan_id", type=int)
+    filters.add_argument("--status", help="only entries with this status (e.g. ok)")
+    filters.add_argument("--checked", action="store_true", help="only checked entries")
+    a = actions.add_parser("show", parents=[filters], help="print the entries of a plan")
+    a.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="items per batch")
+    a = actions.add_parser("export", parents=[filters], help="write a plan to a CSV file")
+    a.add_argument("csv")
+    a = actions.add_parser("import", help="save a plan read from a CSV file")
+    a.add_argument("csv")
+    a.add_argument("--dest", required=True, help="destination base folder of the plan")
+    a.add_argument("--name", default="")
+    p.set_defaults(func=cmd_plans)
+
+    p = sub.add_parser("watch", parents=[common], help="keep the database in sync with folders")
+    p.add_argument("roots", nargs="*", help="folders to watch ('-' or none: read from stdin)")
+    p.add_argument("--ext", action="append", help="extension to include (repeatable)")
+    p.add_argument("--backend", choices=("auto", "inotify", "poll"), default="auto")
+    p.add_argument(
+        "--debounce", type=float, default=2.0, help="seconds of quiet before applying changes"
+    )
+    p.add_argument(
+        "--poll-interval", type=float, default=30.0, help="seconds between polls (poll backend)"
+    )
+    tuning(p)
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("serve", parents=[common], help="run the local HTTP search service")
+    p.add_argument("--host", default=DEFAULT_HOST)
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(
+    argv: Optional[Sequence[str]] = None,
+    stdout: Optional[IO[str]] = None,
+    stdin: Optional[IO[str]] = None,
+) -> int:
+    args = build_parser().parse_args(argv)
+    # Only index adapts its parallelism (--workers 0).
+    args.workers = max(0 if args.func is cmd_index else 1, getattr(args, "workers", 1))
+    args.batch_size = max(1, getattr(args, "batch_size", DEFAULT_BATCH_SIZE))
+    if args.profile:
+        profiling.configure(args.profile, args.profile_top)
+
+    def run() -> int:
+        with profiling.profile(_OPERATIONS.get(args.command, args.command)):
+            return args.func(args, stdout or sys.stdout, stdin or sys.stdin)
+
+    if not args.metrics:
+        return run()
+
+    metrics.enable()
+    summary = metrics.LogSummary(args.metrics_interval).start()
+    try:
+        return run()
+    finally:
+        summary.stop()
+        text = metrics.prometheus_text()
+        if args.metrics == "-":
+            sys.stderr.write(text)
+        else:
+            with open(args.metrics, "w", encoding="utf-8") as f:
+                f.write(text)
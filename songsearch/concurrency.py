@@ -0,0 +1,204 @@
+"""Adaptive I/O concurrency for scanning local disks and network shares.
+
+A fixed number of parallel readers either underuses a fast local drive or
+makes an overloaded NAS thrash.  :class:`AdaptiveLimiter` bounds the number
+of operations in flight and adjusts the bound AIMD style, the way TCP
+adjusts its congestion window:
+
+* operations are measured in rounds of about twice ``limit`` completions;
+* when the mean latency of a round rises above ``tolerance`` times the
+  baseline (the lowest round latency seen, reset when even the minimum
+  concurrency cannot reach it) requests are queueing on the device and the
+  limit is multiplied by ``backoff``; failed operations back off too;
+* otherwise the limit climbs one step at a time while each step buys about
+  its share of throughput.  A step that does not is undone and the limit
+  keeps descending while throughput holds, so it settles just above the
+  point where the device is saturated;
+* a settled limit is probed upwards again after a few rounds, in case the
+  device got faster.
+
+:func:`limiter_for` keeps one limiter per (device, stage): roots on the
+same device share the budget of each stage, roots on different devices are
+throttled independently, and directory listing and tag reading keep
+separate limits because their latencies are not comparable.  :func:`adaptive_map` runs a function over items
+through a limiter, like :meth:`ThreadPoolExecutor.map`.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+R = TypeVar("R")
+
+DEFAULT_INITIAL = 4
+DEFAULT_MAXIMUM = 32
+# Rounds without a throughput gain before the limit is probed upwards again.
+_PROBE_AFTER = 4
+
+
+class AdaptiveLimiter:
+    """AIMD bound on the operations in flight against one device."""
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL,
+        minimum: int = 1,
+        maximum: int = DEFAULT_MAXIMUM,
+        tolerance: float = 2.0,
+        backoff: float = 0.5,
+        min_round: int = 8,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.min_round = max(1, min_round)
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.baseline: Optional[float] = None  # seconds per operation
+        self._throughput: Optional[float] = None  # of the previous round, ops/s
+        self._step = 0.0  # change of limit before the current round
+        self._holds = 0
+        self._new_round(time.monotonic())
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _new_round(self, now: float) -> None:
+        self._round_start = now
+        self._round_ops = 0
+        self._round_latency = 0.0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the :attr:`limit` slots while the block runs."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self._completed(time.perf_counter() - start, ok)
+
+    def _completed(self, latency: float, ok: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if not ok:
+                self._decrease()
+                self._new_round(time.monotonic())
+            else:
+                self._round_ops += 1
+                self._round_latency += latency
+                if self._round_ops >= max(2 * self.limit, self.min_round):
+                    self._adjust()
+            self._cond.notify_all()
+
+    def _adjust(self) -> None:
+        now = time.monotonic()
+        latency = self._round_latency / self._round_ops
+        elapsed = now - self._round_start
+        throughput = self._round_ops / elapsed if elapsed > 0 else float("inf")
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        elif self._limit <= self.minimum and latency > self.tolerance * self.baseline:
+            # Slow even at the minimum: the device got slower, not busier.
+            self.baseline = latency
+
+        previous, step = self._throughput, self._step
+        if latency > self.tolerance * self.baseline:
+            self._decrease()
+        elif previous is None:
+            self._move(1)
+        elif step > 0:
+            # Keep climbing while each step buys about its share of throughput,
+            # otherwise the step only added queueing: undo it and look below.
+            if throughput > previous * (1 + 0.5 * step / (self._limit - step)):
+                self._move(1)
+            else:
+                self._move(-step)
+        elif step < 0:
+            # Keep descending while throughput holds; go back up once it drops.
+            if throughput < previous * (1 + 0.5 * step / (self._limit - step)):
+                self._move(-step)
+                self._step = 0.0
+            else:
+                self._move(-1)
+        else:
+            self._holds += 1
+            if self._holds >= _PROBE_AFTER:
+                self._move(1)
+        self._throughput = throughput
+        self._new_round(now)
+
+    def _move(self, step: float) -> None:
+        before = self._limit
+        self._limit = min(self.maximum, max(self.minimum, self._limit + step))
+        self._step = self._limit - before
+        self._holds = 0
+
+    def _decrease(self) -> None:
+        self._limit = max(self.minimum, self._limit * self.backoff)
+        self._step = 0.0
+        self._holds = 0
+
+
+_limiters: Dict[Tuple[int, str], AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def device_of(path: str) -> int:
+    """Return the device id of *path* (or of its nearest existing ancestor)."""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return -1
+            path = parent
+
+
+def limiter_for(path: str, stage: str) -> AdaptiveLimiter:
+    """Return the shared limiter of *stage* (e.g. ``"scan"``) on *path*'s device.
+
+    Stages do not share a limiter: a listing is much faster than a tag read,
+    so one baseline latency for both would make reads look like queueing.
+    """
+    key = (device_of(os.path.abspath(path)), stage)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveLimiter()
+        return limiter
+
+
+def adaptive_map(
+    fn: Callable[..., R], limiter: AdaptiveLimiter, pool: ThreadPoolExecutor, *items: Iterable
+) -> Iterator[R]:
+    """Map *fn* over *items* on *pool*, at most ``limiter.limit`` at a time.
+
+    Results are yielded in order.  *pool* needs ``limiter.maximum`` threads
+    for the limit to be reachable.
+    """
+
+    def call(*args):
+        with limiter.slot():
+            return fn(*args)
+
+    return pool.map(call, *items)
+
+
+def limited_pool(limiter: AdaptiveLimiter, name: str) -> ThreadPoolExecutor:
+    """A thread pool large enough for *limiter*'s maximum."""
+    return ThreadPoolExecutor(limiter.maximum, thread_name_prefix=name)
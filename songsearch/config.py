@@ -4,6 +4,9 @@ APP_NAME = "SongSearch"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
 DB_PATH = os.path.join(DATA_DIR, "songsearch.db")
+INDEX_PATH = os.path.join(DATA_DIR, "search.idx")
+MOVE_JOURNAL_PATH = os.path.join(DATA_DIR, "moves.journal")
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
 
 # Extensiones soportadas
 FILE_EXTS = {".mp3", ".flac", ".wav", ".aiff", ".ogg", ".aac", ".m4a", ".mp4"}
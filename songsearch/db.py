@@ -1,9 +1,14 @@
+import os
 import sqlite3
-from typing import List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from . import metrics
 from .config import DB_PATH
 from .logger import logger
 
-SCHEMA = """
+# Schema version 1: the tables as they were before databases were versioned.
+# Databases of that era went through this script on every open, so it still
+# only uses ``IF NOT EXISTS``; see :data:`MIGRATIONS` for what came after.
+BASELINE_SCHEMA = """
 CREATE TABLE IF NOT EXISTS songs (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   name TEXT,
@@ -24,13 +29,170 @@ CREATE TABLE IF NOT EXISTS songs (
   proposed_path TEXT,
   final_path TEXT,
   move_status TEXT,
-  inserted_at TEXT DEFAULT (datetime('now'))
+  inserted_at TEXT DEFAULT (datetime('now')),
+  content_hash TEXT
 );
 CREATE INDEX IF NOT EXISTS idx_songs_name ON songs(name);
 CREATE INDEX IF NOT EXISTS idx_songs_artist ON songs(artist);
 CREATE INDEX IF NOT EXISTS idx_songs_title ON songs(title);
+
+-- Write generation: bumped by triggers whenever a song is inserted, deleted
+-- or has one of its searchable columns changed.  ``song_changes`` keeps the
+-- generation of the latest change per song so derived structures (such as
+-- the on-disk search index) can be refreshed incrementally.
+CREATE TABLE IF NOT EXISTS db_meta (
+  key TEXT PRIMARY KEY,
+  value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO db_meta (key, value) VALUES ('generation', 0);
+INSERT OR IGNORE INTO db_meta (key, value)
+  VALUES ('instance', abs(random()) % 9007199254740991);
+CREATE TABLE IF NOT EXISTS song_changes (
+  song_id INTEGER PRIMARY KEY,
+  generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_song_changes_generation ON song_changes(generation);
+CREATE TRIGGER IF NOT EXISTS songs_after_insert AFTER INSERT ON songs BEGIN
+  UPDATE db_meta SET value = value + 1 WHERE key = 'generation';
+  INSERT OR REPLACE INTO song_changes (song_id, generation)
+    SELECT NEW.id, value FROM db_meta WHERE key = 'generation';
+END;
+CREATE TRIGGER IF NOT EXISTS songs_after_update
+AFTER UPDATE OF name, artist, title, path ON songs BEGIN
+  UPDATE db_meta SET value = value + 1 WHERE key = 'generation';
+  INSERT OR REPLACE INTO song_changes (song_id, generation)
+    SELECT NEW.id, value FROM db_meta WHERE key = 'generation';
+END;
+CREATE TRIGGER IF NOT EXISTS songs_after_delete AFTER DELETE ON songs BEGIN
+  UPDATE db_meta SET value = value + 1 WHERE key = 'generation';
+  INSERT OR REPLACE INTO song_changes (song_id, generation)
+    SELECT OLD.id, value FROM db_meta WHERE key = 'generation';
+END;
+
+-- Saved organizer plans.  Entries are keyed by source path so re-planning
+-- or editing a plan upserts rows instead of duplicating them; rowid order is
+-- the order in which files were planned.
+CREATE TABLE IF NOT EXISTS plans (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT,
+  dest_dir TEXT NOT NULL,
+  created_at TEXT DEFAULT (datetime('now')),
+  template TEXT
+);
+CREATE TABLE IF NOT EXISTS plan_entries (
+  plan_id INTEGER NOT NULL,
+  original_path TEXT NOT NULL,
+  proposed_path TEXT,
+  status TEXT,
+  reason TEXT,
+  title TEXT,
+  artist TEXT,
+  album TEXT,
+  year TEXT,
+  month TEXT,
+  genre TEXT,
+  albumartist TEXT,
+  track TEXT,
+  disc TEXT,
+  checked INTEGER NOT NULL DEFAULT 1,
+  UNIQUE (plan_id, original_path)
+);
+CREATE INDEX IF NOT EXISTS idx_plan_entries_status ON plan_entries(plan_id, status);
 """
 
+# SQLite's default limit on host parameters per statement is 999.
+_MAX_PARAMS = 900
+
+# Columns of ``plan_entries`` besides ``plan_id``, in the order of the keys
+# produced by :func:`songsearch.organizer.plan.plan_moves` plus ``checked``.
+PLAN_COLUMNS = (
+    "original_path",
+    "proposed_path",
+    "status",
+    "reason",
+    "title",
+    "artist",
+    "album",
+    "year",
+    "month",
+    "genre",
+    "albumartist",
+    "track",
+    "disc",
+    "checked",
+)
+_PLAN_BATCH = 5000
+
+# Columns that unversioned databases may lack: they were added to the tables
+# after the first releases, and ``CREATE TABLE IF NOT EXISTS`` leaves existing
+# tables alone.  New columns go into a migration instead.
+_LEGACY_COLUMNS = {
+    "songs": (("content_hash", "TEXT"),),
+    "plans": (("template", "TEXT"),),
+    "plan_entries": (("albumartist", "TEXT"), ("track", "TEXT"), ("disc", "TEXT")),
+}
+
+
+def _run_script(c: sqlite3.Connection, script: str) -> None:
+    """Execute the statements of *script* one by one.
+
+    Unlike ``executescript`` this does not commit first, so the statements
+    run inside the caller's transaction.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            c.execute(statement)
+            statement = ""
+
+
+def _baseline(c: sqlite3.Connection) -> None:
+    _run_script(c, BASELINE_SCHEMA)
+    for table, columns in _LEGACY_COLUMNS.items():
+        existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns:
+            if name not in existing:
+                c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_songs_content_hash ON songs(content_hash)")
+
+
+# Indexes shaped after the queries in this module.
+_QUERY_INDEXES = """
+-- Substring LIKE searches cannot seek in any index, but scanning an index
+-- that holds every column they read and return touches far fewer pages than
+-- scanning the table.  Title leads so equality and prefix lookups still seek.
+DROP INDEX IF EXISTS idx_songs_title;
+DROP INDEX IF EXISTS idx_songs_artist;
+CREATE INDEX IF NOT EXISTS idx_songs_search ON songs(title, artist, name, path);
+-- Rename detection looks songs up by content hash and needs size and path:
+-- answer from the index alone, and leave out rows that were never hashed.
+DROP INDEX IF EXISTS idx_songs_content_hash;
+CREATE INDEX IF NOT EXISTS idx_songs_identity ON songs(content_hash, size, path)
+  WHERE content_hash IS NOT NULL;
+"""
+
+# Schema migrations, oldest first.  ``PRAGMA user_version`` holds how many of
+# them a database file has received.  Each runs in its own transaction
+# together with the version bump, so an interrupted upgrade leaves the file
+# at the previous version.  A step is a SQL script or a function taking the
+# connection.  Never change a step that has been released: append a new one.
+MIGRATIONS: Tuple[Union[str, Callable[[sqlite3.Connection], None]], ...] = (
+    _baseline,
+    _QUERY_INDEXES,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _dir_range(directory: str) -> Tuple[str, str]:
+    """Bounds of the paths below *directory*, for a range scan of the path index.
+
+    ``low <= path < high`` holds exactly for paths starting with
+    ``directory + os.sep``.
+    """
+    prefix = os.path.join(directory, "")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
 
 class DatabaseManager:
     def __init__(self, db_path: str = DB_PATH):
@@ -41,13 +203,44 @@ class DatabaseManager:
         return sqlite3.connect(self.db_path)
 
     def _init_db(self):
-        with self._conn() as c:
-            c.executescript(SCHEMA)
+        """Bring the database file up to :data:`SCHEMA_VERSION`."""
+        c = self._conn()
+        c.isolation_level = None  # transactions are managed explicitly
+        try:
+            version = c.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                logger.warning(
+                    f"Database schema version {version} is newer than this release "
+                    f"({SCHEMA_VERSION}): {self.db_path}"
+                )
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                c.execute("BEGIN IMMEDIATE")
+                try:
+                    # Another process may have migrated while we waited for the lock.
+                    if c.execute("PRAGMA user_version").fetchone()[0] < target:
+                        step = MIGRATIONS[target - 1]
+                        if callable(step):
+                            step(c)
+                        else:
+                            _run_script(c, step)
+                        c.execute(f"PRAGMA user_version = {target}")
+                    c.execute("COMMIT")
+                except BaseException:
+                    c.execute("ROLLBACK")
+                    raise
+            if 0 < version < SCHEMA_VERSION:
+                logger.info(
+                    f"Database schema upgraded from version {version} to "
+                    f"{SCHEMA_VERSION}: {self.db_path}"
+                )
+        finally:
+            c.close()
 
     def clear_database(self):
         with self._conn() as c:
             c.execute("DELETE FROM songs")
 
+    @metrics.timed("db.add_song")
     def add_song(self, **kw):
         fields = ",".join(kw.keys())
         placeholders = ",".join(["?"] * len(kw))
@@ -58,6 +251,155 @@ class DatabaseManager:
         except Exception:
             logger.exception("DB add_song error")
 
+    @metrics.timed("db.add_songs")
+    def add_songs(self, songs: List[Dict[str, object]]) -> None:
+        """Insert many songs in a single transaction.
+
+        Every mapping in *songs* must have the same keys; rows whose path is
+        already stored are ignored, as with :meth:`add_song`.
+        """
+        if not songs:
+            return
+        metrics.observe("db.batch_rows", len(songs))
+        keys = list(songs[0])
+        fields = ",".join(keys)
+        placeholders = ",".join(["?"] * len(keys))
+        try:
+            with self._conn() as c:
+                c.executemany(
+                    f"INSERT OR IGNORE INTO songs ({fields}) VALUES ({placeholders})",
+                    ([s[k] for k in keys] for s in songs),
+                )
+        except Exception:
+            logger.exception("DB add_songs error")
+
+    @metrics.timed("db.upsert_songs")
+    def upsert_songs(self, songs: List[Dict[str, object]]) -> None:
+        """Insert songs, or refresh the stored columns of paths already known.
+
+        As with :meth:`add_songs` every mapping must have the same keys.
+        ``original_path`` of an existing row is left untouched.  This is an
+        UPDATE followed by an INSERT rather than ``ON CONFLICT DO UPDATE``: the
+        conflict clause of an upsert would override the ``OR REPLACE`` of the
+        ``song_changes`` triggers.
+        """
+        if not songs:
+            return
+        keys = list(songs[0])
+        updated = [k for k in keys if k not in ("path", "original_path")]
+        known = self.existing_paths([s["path"] for s in songs])
+        with self._conn() as c:
+            c.executemany(
+                f"UPDATE songs SET {','.join(f'{k}=?' for k in updated)} WHERE path=?",
+                ([s[k] for k in updated] + [s["path"]] for s in songs if s["path"] in known),
+            )
+            c.executemany(
+                f"INSERT INTO songs ({','.join(keys)}) VALUES ({','.join('?' * len(keys))})",
+                ([s[k] for k in keys] for s in songs if s["path"] not in known),
+            )
+
+    @metrics.timed("db.existing_paths")
+    def existing_paths(self, paths: List[str]) -> Set[str]:
+        """Return which of *paths* are stored in the database."""
+        known: Set[str] = set()
+        with self._conn() as c:
+            for i in range(0, len(paths), _MAX_PARAMS):
+                chunk = paths[i : i + _MAX_PARAMS]
+                known.update(
+                    p
+                    for (p,) in c.execute(
+                        f"SELECT path FROM songs WHERE path IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+        return known
+
+    @metrics.timed("db.file_states")
+    def file_states(
+        self, paths: List[str]
+    ) -> Dict[str, Tuple[Optional[int], Optional[str], Optional[str]]]:
+        """Return ``(size, modified_date, content_hash)`` of the stored *paths*."""
+        states: Dict[str, Tuple[Optional[int], Optional[str], Optional[str]]] = {}
+        with self._conn() as c:
+            for i in range(0, len(paths), _MAX_PARAMS):
+                chunk = paths[i : i + _MAX_PARAMS]
+                for path, size, modified, content_hash in c.execute(
+                    "SELECT path, size, modified_date, content_hash FROM songs "
+                    f"WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    states[path] = (size, modified, content_hash)
+        return states
+
+    @metrics.timed("db.set_content_hashes")
+    def set_content_hashes(self, hashes: Dict[str, str]) -> None:
+        """Store the content hash of songs indexed before hashes were kept."""
+        with self._conn() as c:
+            c.executemany(
+                "UPDATE songs SET content_hash=? WHERE path=?",
+                ((h, path) for path, h in hashes.items()),
+            )
+
+    @metrics.timed("db.songs_by_identity")
+    def songs_by_identity(
+        self, identities: Iterable[Tuple[int, str]]
+    ) -> Dict[Tuple[int, str], List[str]]:
+        """Return the stored paths of each ``(size, content_hash)`` identity."""
+        wanted = set(identities)
+        hashes = sorted({h for _, h in wanted})
+        found: Dict[Tuple[int, str], List[str]] = {}
+        with self._conn() as c:
+            for i in range(0, len(hashes), _MAX_PARAMS):
+                chunk = hashes[i : i + _MAX_PARAMS]
+                for path, size, content_hash in c.execute(
+                    "SELECT path, size, content_hash FROM songs "
+                    f"WHERE content_hash IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                    chunk,
+                ):
+                    if (size, content_hash) in wanted:
+                        found.setdefault((size, content_hash), []).append(path)
+        return found
+
+    @metrics.timed("db.relocate_songs")
+    def relocate_songs(self, moves: List[Tuple[str, str]]) -> int:
+        """Re-point songs whose file was moved outside SongSearch.
+
+        *moves* holds ``(old_path, new_path)`` pairs.  Only ``path`` changes,
+        so the rest of the row (MusicBrainz ids, fingerprints, the organizer
+        columns) and plan entries are kept.  Returns the rows updated.
+        """
+        with self._conn() as c:
+            return c.executemany(
+                "UPDATE songs SET path=? WHERE path=?", ((new, old) for old, new in moves)
+            ).rowcount
+
+    @metrics.timed("db.delete_songs")
+    def delete_songs(self, paths: Iterable[str]) -> int:
+        """Delete the songs stored under *paths*; return how many were removed."""
+        with self._conn() as c:
+            return c.executemany("DELETE FROM songs WHERE path=?", ((p,) for p in paths)).rowcount
+
+    @metrics.timed("db.delete_songs_under")
+    def delete_songs_under(self, directory: str) -> int:
+        """Delete every song below *directory*; return how many were removed."""
+        low, high = _dir_range(directory)
+        with self._conn() as c:
+            return c.execute("DELETE FROM songs WHERE path >= ? AND path < ?", (low, high)).rowcount
+
+    @metrics.timed("db.song_paths_in_dir")
+    def song_paths_in_dir(self, directory: str) -> List[str]:
+        """Return the stored paths of the files directly inside *directory*."""
+        low, high = _dir_range(directory)
+        with self._conn() as c:
+            return [
+                path
+                for (path,) in c.execute(
+                    "SELECT path FROM songs WHERE path >= ? AND path < ?", (low, high)
+                )
+                if os.sep not in path[len(low) :]
+            ]
+
+    @metrics.timed("db.update_song_location")
     def update_song_location(self, identifier: int | str, new_path: str):
         with self._conn() as c:
             if isinstance(identifier, int):
@@ -65,6 +407,144 @@ class DatabaseManager:
             else:
                 c.execute("UPDATE songs SET path=? WHERE name=?", (new_path, identifier))
 
+    @metrics.timed("db.record_moves")
+    def record_moves(self, moves: List[Tuple[str, str]], status: str = "moved") -> None:
+        """Point songs at their new location after files were moved.
+
+        *moves* holds ``(old_path, new_path)`` pairs; ``path`` and
+        ``final_path`` become the new path and ``move_status`` is set to
+        *status*.  Paths that are not in the database are ignored, and rows
+        left at a new path by a file that is gone are replaced.
+        """
+        sources = {old for old, _ in moves}
+        with self._conn() as c:
+            c.executemany(
+                "DELETE FROM songs WHERE path=?",
+                ((new,) for _, new in moves if new not in sources),
+            )
+            c.executemany(
+                "UPDATE songs SET path=?, final_path=?, move_status=? WHERE path=?",
+                ((new, new, status, old) for old, new in moves),
+            )
+
+    # ---------------------------------------------------------------- plans --
+    @metrics.timed("db.create_plan")
+    def create_plan(self, dest_dir: str, name: str = "", template: Optional[str] = None) -> int:
+        """Create an empty plan for *dest_dir* and return its id.
+
+        *template* is the destination template the plan was built with.
+        """
+        with self._conn() as c:
+            return c.execute(
+                "INSERT INTO plans (name, dest_dir, template) VALUES (?, ?, ?)",
+                (name, dest_dir, template),
+            ).lastrowid
+
+    @metrics.timed("db.save_plan_entries")
+    def save_plan_entries(self, plan_id: int, entries: Iterable[Dict[str, object]]) -> int:
+        """Insert or update the entries of plan *plan_id*; return how many.
+
+        *entries* are plan dictionaries (as produced by ``plan_moves``) and
+        may be any iterable: they are written in batches within a single
+        transaction.  An entry without ``checked`` is checked when its status
+        is ``"ok"``.  Songs whose path is planned get ``original_path``,
+        ``proposed_path`` and ``move_status='planned'`` set.
+        """
+        fields = ",".join(PLAN_COLUMNS)
+        updates = ",".join(f"{f}=excluded.{f}" for f in PLAN_COLUMNS[1:])
+        sql = (
+            f"INSERT INTO plan_entries (plan_id,{fields}) "
+            f"VALUES (?,{','.join('?' * len(PLAN_COLUMNS))}) "
+            f"ON CONFLICT(plan_id, original_path) DO UPDATE SET {updates}"
+        )
+        count = 0
+        batch: List[Tuple] = []
+        with self._conn() as c:
+
+            def flush() -> None:
+                c.executemany(sql, batch)
+                c.executemany(
+                    "UPDATE songs SET original_path=?, proposed_path=?, move_status='planned' "
+                    "WHERE path=? AND move_status IS NOT 'moved'",
+                    ((row[1], row[2], row[1]) for row in batch if row[3] == "ok"),
+                )
+                batch.clear()
+
+            for entry in entries:
+                status = entry.get("status") or ""
+                checked = entry.get("checked")
+                batch.append(
+                    (plan_id,)
+                    + tuple(entry.get(f) or "" for f in PLAN_COLUMNS[:-1])
+                    + (int(status == "ok" if checked is None else bool(checked)),)
+                )
+                if len(batch) >= _PLAN_BATCH:
+                    count += len(batch)
+                    flush()
+            count += len(batch)
+            flush()
+        return count
+
+    def iter_plan_entries(
+        self, plan_id: int, status: Optional[str] = None, checked_only: bool = False
+    ) -> Iterator[Dict[str, object]]:
+        """Yield the entries of plan *plan_id* in planning order.
+
+        Entries can be filtered by *status* and to the checked ones only.
+        """
+        where = "plan_id=?"
+        params: List[object] = [plan_id]
+        if status is not None:
+            where += " AND status=?"
+            params.append(status)
+        if checked_only:
+            where += " AND checked"
+        with self._conn() as c:
+            for row in c.execute(
+                f"SELECT {','.join(PLAN_COLUMNS)} FROM plan_entries WHERE {where} ORDER BY rowid",
+                params,
+            ):
+                yield dict(zip(PLAN_COLUMNS, row))
+
+    def list_plans(self) -> List[Tuple]:
+        """Return ``(id, name, dest_dir, created_at, entries)`` newest first."""
+        with self._conn() as c:
+            return c.execute(
+                "SELECT p.id, p.name, p.dest_dir, p.created_at, "
+                "(SELECT count(*) FROM plan_entries e WHERE e.plan_id = p.id) "
+                "FROM plans p ORDER BY p.id DESC"
+            ).fetchall()
+
+    def get_plan(self, plan_id: int) -> Optional[Tuple]:
+        """Return ``(id, name, dest_dir, created_at, template)`` of a plan, or ``None``."""
+        with self._conn() as c:
+            return c.execute(
+                "SELECT id, name, dest_dir, created_at, template FROM plans WHERE id=?",
+                (plan_id,),
+            ).fetchone()
+
+    def delete_plan(self, plan_id: int) -> None:
+        with self._conn() as c:
+            c.execute("DELETE FROM plan_entries WHERE plan_id=?", (plan_id,))
+            c.execute("DELETE FROM plans WHERE id=?", (plan_id,))
+
+    @metrics.timed("db.sizes_for_paths")
+    def sizes_for_paths(self, paths: List[str]) -> Dict[str, int]:
+        """Return the stored ``size`` of each of *paths* that has one."""
+        sizes: Dict[str, int] = {}
+        with self._conn() as c:
+            for i in range(0, len(paths), _MAX_PARAMS):
+                chunk = paths[i : i + _MAX_PARAMS]
+                sizes.update(
+                    c.execute(
+                        "SELECT path, size FROM songs WHERE size IS NOT NULL "
+                        f"AND path IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+        return sizes
+
+    @metrics.timed("db.search_song_like")
     def search_song_like(self, query: str, mode: str = "song") -> List[Tuple]:
         """Search for songs by title or artist using a LIKE query.
 
@@ -88,6 +568,70 @@ class DatabaseManager:
                 (f"%{query}%",),
             ).fetchall()
 
+    def iter_songs(self) -> Iterator[Tuple]:
+        """Yield every song as ``(id, name, artist, title, path)`` ordered by id."""
+        with self._conn() as c:
+            yield from c.execute("SELECT id,name,artist,title,path FROM songs ORDER BY id")
+
+    def iter_catalogue_rows(self) -> Iterator[Tuple]:
+        """Yield ``(id, name, artist, title, path, duration, size)`` ordered by id."""
+        with self._conn() as c:
+            yield from c.execute(
+                "SELECT id,name,artist,title,path,duration,size FROM songs ORDER BY id"
+            )
+
+    @metrics.timed("db.fetch_all_songs")
+    def fetch_all_songs(self) -> List[Tuple]:
+        """Return every song as ``(id, name, artist, title, path)`` ordered by id."""
+        return list(self.iter_songs())
+
+    @metrics.timed("db.write_generation")
+    def write_generation(self) -> Tuple[int, int]:
+        """Return ``(instance, generation)`` identifying the current contents.
+
+        ``instance`` is a random id assigned when the database file is created
+        and ``generation`` increases with every change to the songs table.
+        """
+        with self._conn() as c:
+            meta = dict(c.execute("SELECT key, value FROM db_meta").fetchall())
+        return meta["instance"], meta["generation"]
+
+    @metrics.timed("db.changed_song_ids")
+    def changed_song_ids(self, since_generation: int) -> List[int]:
+        """Return ids of songs inserted, updated or deleted after *since_generation*."""
+        # Sorted here rather than with ORDER BY song_id, which makes SQLite
+        # scan the whole table in rowid order instead of using the
+        # generation index.
+        with self._conn() as c:
+            return sorted(
+                r[0]
+                for r in c.execute(
+                    "SELECT song_id FROM song_changes WHERE generation > ?",
+                    (since_generation,),
+                )
+            )
+
+    @metrics.timed("db.fetch_songs_by_ids")
+    def fetch_songs_by_ids(self, ids: List[int]) -> List[Tuple]:
+        """Return ``(id, name, artist, title, path)`` rows for *ids* ordered by id.
+
+        Ids that no longer exist are skipped.
+        """
+        rows: List[Tuple] = []
+        with self._conn() as c:
+            for i in range(0, len(ids), _MAX_PARAMS):
+                chunk = ids[i : i + _MAX_PARAMS]
+                rows.extend(
+                    c.execute(
+                        "SELECT id,name,artist,title,path FROM songs "
+                        f"WHERE id IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+        rows.sort(key=lambda r: r[0])
+        return rows
+
+    @metrics.timed("db.fetch_all_for_fuzzy")
     def fetch_all_for_fuzzy(self, query: str, mode: str) -> List[Tuple]:
         """Fetch candidate rows for fuzzy search using a LIKE filter.
 
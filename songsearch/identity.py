@@ -0,0 +1,80 @@
+"""Recognize files that were moved or renamed outside SongSearch.
+
+A file's identity is its size plus a hash of its first and last
+:data:`IDENTITY_BLOCK` bytes.  Reading two blocks is far cheaper than parsing
+tags, and the blocks cover the tag header and the end of the audio data, so
+an edited file gets a new identity while a moved one keeps it.
+
+:func:`find_renames` matches paths that are not in the database against the
+stored identities of songs whose file no longer exists; the caller re-points
+those rows with :meth:`DatabaseManager.relocate_songs` instead of inserting
+new ones, so ids, fingerprints, MusicBrainz ids and plan history survive.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .db import DatabaseManager
+
+IDENTITY_BLOCK = 64 * 1024
+
+Identity = Tuple[int, str]  # (size, content hash)
+
+
+def content_hash(path: str, size: Optional[int] = None) -> str:
+    """Return the hash of the head and tail blocks of *path*."""
+    with open(path, "rb") as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        h = hashlib.blake2b(str(size).encode(), digest_size=16)
+        h.update(f.read(IDENTITY_BLOCK))
+        if size > 2 * IDENTITY_BLOCK:
+            f.seek(-IDENTITY_BLOCK, os.SEEK_END)
+        h.update(f.read(IDENTITY_BLOCK))
+    return h.hexdigest()
+
+
+def file_identity(path: str, size: Optional[int] = None) -> Optional[Identity]:
+    """Return ``(size, content_hash)`` of *path*, or ``None`` if unreadable."""
+    try:
+        if size is None:
+            size = os.stat(path).st_size
+        return size, content_hash(path, size)
+    except OSError:
+        return None
+
+
+def find_renames(
+    db: DatabaseManager,
+    paths: Sequence[str],
+    map_fn: Callable[..., Iterator[Optional[Identity]]] = map,
+    sizes: Optional[Sequence[int]] = None,
+) -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+    """Match *paths*, which are not in *db*, with songs whose file is gone.
+
+    Returns ``(moves, hashes)``: ``(old_path, new_path)`` pairs for the
+    matched paths and the content hash of every other readable path, to be
+    stored with its new row.  *map_fn* hashes the files (for example the
+    ``map`` of a thread pool); *sizes*, when known, saves a ``stat`` each.
+    """
+    identities: Dict[str, Identity] = {}
+    if sizes is None:
+        sizes = [None] * len(paths)
+    for path, identity in zip(paths, map_fn(file_identity, paths, sizes)):
+        if identity is not None:
+            identities[path] = identity
+    candidates = db.songs_by_identity(identities.values())
+    moves: List[Tuple[str, str]] = []
+    claimed = set()
+    for path, identity in identities.items():
+        for old in candidates.get(identity, ()):
+            if old not in claimed and not os.path.exists(old):
+                claimed.add(old)
+                moves.append((old, path))
+                break
+    moved = {new for _, new in moves}
+    hashes = {p: identity[1] for p, identity in identities.items() if p not in moved}
+    return moves, hashes
@@ -0,0 +1,310 @@
+"""Library scanning: walk a folder, read tags and store the songs.
+
+:class:`LibraryIndexer` is independent of Qt so it can run on a worker thread
+of the GUI as well as from scripts.  It first lists the candidate files with
+:func:`~songsearch.walker.walk_audio_files` (cheap compared to parsing tags,
+and concurrent for network shares), then reads them batch by batch and commits the
+resulting rows in batches through :meth:`DatabaseManager.add_songs`.  Rows are
+therefore visible to searches while the scan is still running.  Stored files
+whose size and modification time did not change are not parsed again (only
+hashed once if their row predates content hashes), changed ones are re-read
+and updated, and files that were moved outside SongSearch are recognized by
+:func:`~songsearch.identity.find_renames` and re-point their existing row
+instead of getting a new one.
+
+A :class:`ScanControl` lets another thread pause, resume or cancel the scan,
+and progress is reported as :class:`ScanProgress` snapshots carrying the
+throughput and an estimated time to completion.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from mutagen import File
+
+from . import metrics
+from .concurrency import adaptive_map, limited_pool, limiter_for
+from .config import FILE_EXTS
+from .db import DatabaseManager
+from .identity import content_hash, file_identity, find_renames
+from .logger import logger
+from .probe import fast_probe
+from .profiling import profiled
+from .walker import AudioFile, walk_audio_files
+
+DEFAULT_BATCH_SIZE = 200
+# Minimum interval between two progress reports, in seconds.
+PROGRESS_INTERVAL = 0.25
+
+
+class ScanControl:
+    """Thread-safe pause/resume/cancel switch shared with a running scan."""
+
+    __slots__ = ("_running", "_cancelled")
+
+    def __init__(self) -> None:
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        self._running.set()  # wake up a paused scan so it can stop
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def wait(self) -> float:
+        """Block while paused; return the number of seconds spent waiting."""
+        if self._running.is_set():
+            return 0.0
+        start = time.monotonic()
+        self._running.wait()
+        return time.monotonic() - start
+
+
+@dataclass(frozen=True)
+class ScanProgress:
+    """Snapshot of a running scan."""
+
+    files_done: int
+    files_total: int
+    bytes_done: int
+    elapsed: float  # seconds, excluding time spent paused
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until completion, or ``None`` before any rate is known."""
+        rate = self.files_per_sec
+        if rate <= 0:
+            return None
+        return (self.files_total - self.files_done) / rate
+
+
+def iter_audio_files(root: str, exts: Iterable[str] = FILE_EXTS) -> Iterator[str]:
+    """Yield the paths below *root* whose lower-cased extension is in *exts*."""
+    for f in walk_audio_files(root, exts):
+        yield f.path
+
+
+def modified_date(mtime: float) -> str:
+    """Format a file mtime as stored in ``songs.modified_date``."""
+    return datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def song_record(
+    path: str, identity_hash: Optional[str] = None, entry: Optional[AudioFile] = None
+) -> Dict[str, object]:
+    """Read the tags and file attributes of *path* as ``songs`` column values.
+
+    *identity_hash* is the :func:`~songsearch.identity.content_hash` of the
+    file and *entry* its size and mtime, when the caller already has them.
+    """
+    name, ext = os.path.splitext(os.path.basename(path))
+    with metrics.timer("tags.read"):
+        probed = fast_probe(path)
+        if probed is not None:
+            tags, length = probed.tags, probed.length
+        else:
+            audio = File(path, easy=True)
+            tags = audio.tags if audio else {}
+            length = audio.info.length if audio is not None and getattr(audio, "info", None) else None
+    artist = tags.get("artist", [None])[0] if tags else None
+    title = tags.get("title", [None])[0] if tags else None
+    album = tags.get("album", [None])[0] if tags else None
+    date = tags.get("date", [None])[0] if tags else None
+    year = month = None
+    if date:
+        if len(date) >= 4:
+            year = date[:4]
+        if len(date) >= 7:
+            month = date[5:7]
+    genre = tags.get("genre", [None])[0] if tags else None
+    duration = int(length) if length is not None else None
+    if entry is None:
+        st = os.stat(path)
+        entry = AudioFile(path, st.st_size, st.st_mtime)
+    if not identity_hash:
+        with metrics.timer("index.content_hash"):
+            identity_hash = content_hash(path, entry.size)
+    return {
+        "name": name,
+        "artist": artist,
+        "title": title,
+        "album": album,
+        "year": year,
+        "month": month,
+        "genre": genre,
+        "path": path,
+        "duration": duration,
+        "file_format": ext.lower(),
+        "size": entry.size,
+        "modified_date": modified_date(entry.mtime),
+        "original_path": path,
+        "content_hash": identity_hash,
+    }
+
+
+class LibraryIndexer:
+    """Scan *root* for audio files and add them to *db* in batches.
+
+    With ``workers > 1`` the tags of each batch are read by a thread pool;
+    parsing is mostly file I/O, so this helps on network shares and slow
+    disks.  With ``workers=0`` (the default) listing and tag reads adapt
+    their parallelism to the device of *root* through the shared
+    :func:`~songsearch.concurrency.limiter_for` limiters.  Rows are still
+    committed in path order.
+    """
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        root: str,
+        exts: Iterable[str] = FILE_EXTS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        control: Optional[ScanControl] = None,
+        workers: int = 0,
+    ) -> None:
+        self.db = db
+        self.root = root
+        self.exts = set(exts)
+        self.batch_size = max(1, batch_size)
+        self.control = control or ScanControl()
+        self.workers = max(0, workers)
+
+    @staticmethod
+    def _read(
+        path: str, identity_hash: Optional[str] = None, entry: Optional[AudioFile] = None
+    ) -> Optional[Dict[str, object]]:
+        try:
+            return song_record(path, identity_hash, entry)
+        except Exception as e:  # pragma: no cover - logging only
+            logger.error(f"Index error: {path} -> {e}")
+            return None
+
+    @profiled("scan")
+    def run(self, on_progress: Optional[Callable[[ScanProgress], None]] = None) -> int:
+        """Run the scan and return the number of files indexed.
+
+        Unchanged stored files and moved files matched to their song count as
+        indexed without being parsed.
+
+        *on_progress* is called at most every :data:`PROGRESS_INTERVAL`
+        seconds, after each committed batch and once at the end.  A cancelled
+        scan keeps the batches committed so far.
+        """
+        control = self.control
+        # Listed concurrently (sizes and mtimes included), then sorted so
+        # batches are committed in path order.
+        adaptive = self.workers == 0
+        scan_limiter = limiter_for(self.root, "scan") if adaptive else None
+        entries = {f.path: f for f in walk_audio_files(self.root, self.exts, limiter=scan_limiter)}
+        paths = sorted(entries)
+        total = len(paths)
+        done = nbytes = 0
+        paused = 0.0
+        start = last_report = time.monotonic()
+
+        def report() -> None:
+            nonlocal last_report
+            last_report = time.monotonic()
+            if on_progress is not None:
+                on_progress(ScanProgress(done, total, nbytes, last_report - start - paused))
+
+        executor: Optional[ThreadPoolExecutor] = None
+        read: Callable[..., Iterator] = map
+        if adaptive:
+            limiter = limiter_for(self.root, "read")
+            executor = limited_pool(limiter, "index-read")
+            pool = executor
+            read = lambda fn, *items: adaptive_map(fn, limiter, pool, *items)  # noqa: E731
+        elif self.workers > 1:
+            executor = ThreadPoolExecutor(self.workers)
+            read = executor.map
+        try:
+            for first in range(0, total, self.batch_size):
+                chunk = paths[first : first + self.batch_size]
+                stored = self.db.file_states(chunk)
+                new: List[str] = []
+                changed: List[str] = []
+                unhashed: List[str] = []
+                for p in chunk:
+                    state = stored.get(p)
+                    if state is None:
+                        new.append(p)
+                    elif state[:2] != (entries[p].size, modified_date(entries[p].mtime)):
+                        changed.append(p)
+                    elif not state[2]:
+                        unhashed.append(p)
+                if unhashed:
+                    # Rows indexed before content hashes were stored: hash them
+                    # so that later moves of these files are recognized.
+                    self.db.set_content_hashes(
+                        {
+                            p: identity[1]
+                            for p, identity in zip(
+                                unhashed,
+                                read(file_identity, unhashed, [entries[p].size for p in unhashed]),
+                            )
+                            if identity is not None
+                        }
+                    )
+                moves, hashes = find_renames(self.db, new, read, [entries[p].size for p in new])
+                relocated = self.db.relocate_songs(moves)
+                if relocated:
+                    logger.info(f"{relocated} moved files matched to their existing songs")
+                done += len(chunk) - len(new) - len(changed) + len(moves)
+                moved = {new_path for _, new_path in moves}
+                todo = [p for p in new if p not in moved] + changed
+                batch: List[Dict[str, object]] = []
+                for record in read(
+                    self._read, todo, [hashes.get(p) for p in todo], [entries[p] for p in todo]
+                ):
+                    paused += control.wait()
+                    if control.cancelled:
+                        break
+                    if record is None:
+                        continue
+                    batch.append(record)
+                    done += 1
+                    nbytes += record["size"]
+                    if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                        report()
+                refreshed = set(changed)
+                self.db.add_songs([r for r in batch if r["path"] not in refreshed])
+                self.db.upsert_songs([r for r in batch if r["path"] in refreshed])
+                report()
+                if control.cancelled:
+                    break
+            if not total:
+                report()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return done
@@ -0,0 +1,288 @@
+"""Stage-level instrumentation: timers, counters and histograms.
+
+When a scan or a plan is slow this tells which stage the time goes to:
+database calls, tag reads, fingerprinting, the AcoustID and MusicBrainz
+lookups, destination building, moves and searches all report here.
+
+* :func:`timer` (a context manager) and :func:`timed` (a decorator) record
+  durations per stage in a histogram;
+* :func:`count` adds to a counter, :func:`observe` records any other value
+  (sizes, batch lengths) in a histogram;
+* :func:`snapshot` returns everything as a dict, :func:`prometheus_text`
+  in the Prometheus text exposition format, and :class:`LogSummary` logs a
+  summary every few seconds.
+
+Instrumentation is off unless ``SONGSEARCH_METRICS=1`` is set or
+:func:`enable` is called (``--metrics`` on the command line).  While off,
+:func:`timer` returns a shared no-op context manager and the other helpers
+return after testing one module flag, so the calls can stay in hot paths.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from .logger import logger
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+ENABLED = os.environ.get("SONGSEARCH_METRICS", "0") not in ("", "0")
+
+# Upper bounds in seconds (0.1 ms to 50 s); a last, unbounded bucket
+# catches the rest.
+DURATION_BUCKETS = tuple(m * 10.0**e for e in range(-4, 2) for m in (1.0, 2.5, 5.0))
+DEFAULT_BUCKETS = tuple(float(4**i) for i in range(12))  # 1 .. 4M
+_PREFIX = "songsearch"
+
+
+class Histogram:
+    """Bucketed distribution with count, sum and maximum."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the *q* quantile (0-1)."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank and seen:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self, scale: float = 1.0) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum * scale,
+            "mean": self.sum / self.count * scale if self.count else 0.0,
+            "p50": self.quantile(0.5) * scale,
+            "p90": self.quantile(0.9) * scale,
+            "p99": self.quantile(0.99) * scale,
+            "max": self.max * scale,
+        }
+
+
+class Registry:
+    """Thread-safe store of the counters, timers and histograms of a process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.timers: Dict[str, Histogram] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.timers.get(name)
+            if hist is None:
+                hist = self.timers[name] = Histogram(DURATION_BUCKETS)
+            hist.observe(seconds)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(buckets)
+            hist.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counters as numbers; timers in milliseconds and histograms as
+        ``count``/``sum``/``mean``/``p50``/``p90``/``p99``/``max``."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timers_ms": {k: h.summary(1000.0) for k, h in self.timers.items()},
+                "histograms": {k: h.summary() for k, h in self.histograms.items()},
+            }
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            if self.counters:
+                name = f"{_PREFIX}_events_total"
+                lines += [f"# HELP {name} Events counted per kind.", f"# TYPE {name} counter"]
+                lines += [
+                    f'{name}{{event="{_escape(k)}"}} {_number(v)}'
+                    for k, v in sorted(self.counters.items())
+                ]
+            if self.timers:
+                name = f"{_PREFIX}_stage_duration_seconds"
+                lines += [f"# HELP {name} Time spent per stage.", f"# TYPE {name} histogram"]
+                for key, hist in sorted(self.timers.items()):
+                    lines += _histogram_lines(name, "stage", key, hist)
+            if self.histograms:
+                name = f"{_PREFIX}_values"
+                lines += [f"# HELP {name} Distribution of recorded values.", f"# TYPE {name} histogram"]
+                for key, hist in sorted(self.histograms.items()):
+                    lines += _histogram_lines(name, "name", key, hist)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name: str, label: str, key: str, hist: Histogram) -> List[str]:
+    tag = f'{label}="{_escape(key)}"'
+    lines = []
+    cumulative = 0
+    for bound, n in zip(hist.buckets, hist.counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{tag},le="{bound:g}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{tag},le="+Inf"}} {hist.count}')
+    lines.append(f"{name}_sum{{{tag}}} {_number(hist.sum)}")
+    lines.append(f"{name}_count{{{tag}}} {hist.count}")
+    return lines
+
+
+REGISTRY = Registry()
+
+
+def enable(on: bool = True) -> None:
+    """Turn instrumentation on (or off) for the whole process."""
+    global ENABLED
+    ENABLED = on
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        REGISTRY.record_time(self.name, time.perf_counter() - self.start)
+
+
+_NULL_TIMER = nullcontext()
+
+
+def timer(name: str):
+    """Context manager recording the duration of its block under *name*."""
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator recording the duration of every call under *name*."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.record_time(name, time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def count(name: str, n: float = 1) -> None:
+    if ENABLED:
+        REGISTRY.count(name, n)
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+    if ENABLED:
+        REGISTRY.observe(name, value, buckets)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
+
+
+def prometheus_text() -> str:
+    return REGISTRY.prometheus()
+
+
+def reset() -> None:
+    REGISTRY.reset()
+
+
+def format_summary(snap: Optional[Dict[str, Dict[str, Any]]] = None, top: int = 10) -> str:
+    """One line per timer, most total time first, then the counters."""
+    snap = snap or snapshot()
+    timers = sorted(snap["timers_ms"].items(), key=lambda kv: kv[1]["sum"], reverse=True)
+    lines = [
+        f"{name}: n={t['count']} total={t['sum'] / 1000:.2f}s "
+        f"mean={t['mean']:.2f}ms p99={t['p99']:.2f}ms"
+        for name, t in timers[:top]
+    ]
+    if snap["counters"]:
+        lines.append(
+            " ".join(f"{k}={_number(v)}" for k, v in sorted(snap["counters"].items()))
+        )
+    return "\n".join(lines)
+
+
+class LogSummary:
+    """Log :func:`format_summary` every *interval* seconds on a daemon thread."""
+
+    def __init__(self, interval: float = 60.0, top: int = 10) -> None:
+        self.interval = interval
+        self.top = top
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+
+    def start(self) -> "LogSummary":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.log()
+
+    def log(self) -> None:
+        summary = format_summary(top=self.top)
+        if summary:
+            logger.info("Metrics:\n%s", summary)
+
+    def stop(self) -> None:
+        """Stop the thread and log a last summary."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.log()
@@ -13,6 +13,7 @@ except Exception:  # pragma: no cover - import failure
 
 from .config import MB_APP_NAME, MB_APP_VERSION, MB_CONTACT, ACOUSTID_API_KEY
 from .tags import _parse_date
+from . import metrics
 from .logger import logger
 
 
@@ -52,14 +53,16 @@ def enrich_with_musicbrainz(file_path: str) -> Dict[str, Any]:
         return tags
     try:
         fpcalc_path = detect_fpcalc()
-        if fpcalc_path:
-            duration, fingerprint = pyacoustid.fingerprint_file(
-                file_path, fpcalc_path=fpcalc_path
-            )
-        else:
-            duration, fingerprint = pyacoustid.fingerprint_file(file_path)
+        with metrics.timer("fingerprint.fpcalc"):
+            if fpcalc_path:
+                duration, fingerprint = pyacoustid.fingerprint_file(
+                    file_path, fpcalc_path=fpcalc_path
+                )
+            else:
+                duration, fingerprint = pyacoustid.fingerprint_file(file_path)
     except Exception as exc:  # pragma: no cover - external tool failure
         # Fingerprinting failed – nothing to enrich with
+        metrics.count("fingerprint.errors")
         logger.warning("Fingerprinting failed for %s: %s", file_path, exc)
         return tags
 
@@ -70,8 +73,10 @@ def enrich_with_musicbrainz(file_path: str) -> Dict[str, Any]:
         )
 
     try:
-        lookup = pyacoustid.lookup(api_key, fingerprint, duration)
+        with metrics.timer("remote.acoustid"):
+            lookup = pyacoustid.lookup(api_key, fingerprint, duration)
     except Exception as exc:  # pragma: no cover - network failure
+        metrics.count("remote.acoustid.errors")
         logger.warning("AcoustID lookup failed for %s: %s", file_path, exc)
         return tags
 
@@ -100,10 +105,12 @@ def enrich_with_musicbrainz(file_path: str) -> Dict[str, Any]:
             MB_APP_VERSION or "0.1",
             MB_CONTACT or None,
         )
-        mb_data = musicbrainzngs.get_recording_by_id(
-            recording_id, includes=["artists", "releases", "genres"]
-        )
+        with metrics.timer("remote.musicbrainz"):
+            mb_data = musicbrainzngs.get_recording_by_id(
+                recording_id, includes=["artists", "releases", "genres"]
+            )
     except Exception as exc:  # pragma: no cover - network failure
+        metrics.count("remote.musicbrainz.errors")
         logger.warning(
             "MusicBrainz lookup failed for %s (recording %s): %s",
             file_path,
@@ -1,10 +1,18 @@
 """Utilities for organizing files.
 
-Currently exposes :func:`build_destination` which builds the output path
-for a song based on its metadata.
+Exposes :func:`build_destination` which builds the output path for a song
+based on its metadata, the planning helpers and collision resolution.
 """
 
+from .collisions import CollisionIndex, resolve_collisions
 from .destination import build_destination
-from .plan import plan_moves, export_plan_csv
+from .plan import plan_moves, export_plan_csv, import_plan_csv
 
-__all__ = ["build_destination", "plan_moves", "export_plan_csv"]
+__all__ = [
+    "CollisionIndex",
+    "build_destination",
+    "export_plan_csv",
+    "import_plan_csv",
+    "plan_moves",
+    "resolve_collisions",
+]
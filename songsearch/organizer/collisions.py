@@ -0,0 +1,174 @@
+"""Detect and resolve destination collisions in move plans.
+
+Different sources can end up with the same destination: two songs with the
+same artist and title, tags that only differ in case, or long titles cut to
+the same 80 characters by the destination builder.  The destination may
+also already hold a file from an earlier organization.
+
+:class:`CollisionIndex` keeps every destination claimed so far in a hash map
+keyed by the normalized, case-folded path, and lists each target directory
+at most once to learn what already exists there.  Checking an entry is
+therefore O(1) and resolving a plan is O(n); one index can be fed a plan in
+several batches.  Conflicting entries are resolved with one of
+:data:`STRATEGIES`:
+
+``suffix``     give the later entry a free name: ``Title (2).mp3``
+``skip``       mark the later entry as a collision so it is not moved
+``keep-best``  among plan entries, keep the one with the highest bitrate;
+               files already on disk are never replaced, so such entries
+               are skipped
+"""
+
+from __future__ import annotations
+
+import os
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from ..logger import logger
+
+STRATEGIES = ("suffix", "skip", "keep-best")
+# Status given to plan entries that will not be moved because of a collision
+COLLISION_STATUS = "collision"
+
+
+def normalize_path(path: str) -> str:
+    """Return the key under which *path* is compared with other paths."""
+    return unicodedata.normalize("NFC", os.path.normpath(path)).casefold()
+
+
+def file_bitrate(path: str) -> int:
+    """Return the bitrate of *path* in bits per second, or 0 if unknown."""
+    from mutagen import File as MutagenFile
+
+    try:
+        audio = MutagenFile(path)
+        return int(getattr(audio.info, "bitrate", 0) or 0) if audio is not None else 0
+    except Exception:
+        logger.debug("Could not read bitrate of %s", path)
+        return 0
+
+
+@dataclass
+class CollisionReport:
+    collisions: int = 0
+    renamed: int = 0
+    skipped: int = 0
+    replaced: int = 0
+
+
+class CollisionIndex:
+    """Claimed destinations of a plan plus the files already on disk."""
+
+    def __init__(
+        self,
+        strategy: str = "suffix",
+        bitrate: Callable[[str], int] = file_bitrate,
+    ) -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}")
+        self.strategy = strategy
+        self.bitrate = bitrate
+        # normalized destination -> plan entry that claimed it
+        self._claims: Dict[str, Dict[str, str]] = {}
+        # normalized directory -> normalized names of the files it holds
+        self._listings: Dict[str, Set[str]] = {}
+        # normalized destination -> last suffix number tried for it
+        self._suffixes: Dict[str, int] = {}
+        self._bitrates: Dict[str, int] = {}
+        self.report = CollisionReport()
+
+    def __len__(self) -> int:
+        return len(self._claims)
+
+    # ------------------------------------------------------------- lookups --
+    def _listing(self, directory: str) -> Set[str]:
+        key = normalize_path(directory)
+        names = self._listings.get(key)
+        if names is None:
+            try:
+                with os.scandir(directory) as it:
+                    names = {unicodedata.normalize("NFC", e.name).casefold() for e in it}
+            except OSError:
+                names = set()
+            self._listings[key] = names
+        return names
+
+    def _on_disk(self, path: str) -> bool:
+        name = unicodedata.normalize("NFC", os.path.basename(path)).casefold()
+        return name in self._listing(os.path.dirname(path))
+
+    def is_taken(self, path: str) -> bool:
+        """Whether *path* is claimed by the plan or exists on disk."""
+        return normalize_path(path) in self._claims or self._on_disk(path)
+
+    def _bitrate(self, entry: Dict[str, str]) -> int:
+        src = entry["original_path"]
+        if src not in self._bitrates:
+            self._bitrates[src] = self.bitrate(src)
+        return self._bitrates[src]
+
+    # ------------------------------------------------------------ resolving --
+    def resolve(self, plan: Iterable[Dict[str, str]]) -> CollisionReport:
+        """Resolve the collisions of *plan* in place and return the totals so far.
+
+        Only entries with status ``"ok"`` take part.  Entries that will not be
+        moved get status :data:`COLLISION_STATUS` and the reason in
+        ``reason``.
+        """
+        for entry in plan:
+            if entry.get("status") != "ok" or not entry.get("proposed_path"):
+                continue
+            dest = entry["proposed_path"]
+            key = normalize_path(dest)
+            holder = self._claims.get(key)
+            # A file that is already where the plan wants it does not collide
+            # with itself.
+            in_place = key == normalize_path(entry["original_path"])
+            if holder is None and (in_place or not self._on_disk(dest)):
+                self._claims[key] = entry
+                continue
+
+            self.report.collisions += 1
+            if self.strategy == "suffix":
+                entry["proposed_path"] = self._free_name(dest, key)
+                self._claims[normalize_path(entry["proposed_path"])] = entry
+                self.report.renamed += 1
+            elif holder is None:
+                # An existing file is never replaced.
+                self._skip(entry, "destination exists")
+            elif self.strategy == "keep-best" and self._bitrate(entry) > self._bitrate(holder):
+                holder["status"] = COLLISION_STATUS
+                holder["reason"] = f"lower bitrate than {entry['original_path']}"
+                self._claims[key] = entry
+                self.report.replaced += 1
+            else:
+                reason = "lower bitrate than" if self.strategy == "keep-best" else "same destination as"
+                self._skip(entry, f"{reason} {holder['original_path']}")
+        return self.report
+
+    def _skip(self, entry: Dict[str, str], reason: str) -> None:
+        entry["status"] = COLLISION_STATUS
+        entry["reason"] = reason
+        self.report.skipped += 1
+
+    def _free_name(self, dest: str, key: str) -> str:
+        stem, ext = os.path.splitext(dest)
+        n = self._suffixes.get(key, 1)
+        while True:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+            if not self.is_taken(candidate):
+                self._suffixes[key] = n
+                return candidate
+
+
+def resolve_collisions(
+    plan: Iterable[Dict[str, str]],
+    strategy: str = "suffix",
+    bitrate: Optional[Callable[[str], int]] = None,
+) -> CollisionReport:
+    """Resolve the destination collisions of a whole *plan* in place."""
+    index = CollisionIndex(strategy, bitrate or file_bitrate)
+    return index.resolve(plan)
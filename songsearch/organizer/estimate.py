@@ -0,0 +1,223 @@
+"""Estimate what applying a move plan will cost, without moving anything.
+
+:func:`estimate_moves` classifies each ``(src, dest)`` move the way
+:class:`~songsearch.organizer.mover.MoveExecutor` will execute it: a rename
+when source and destination share a filesystem, a copy otherwise.  Sizes come
+from the ``size`` column of the database (files not in it are stat'ed), so a
+large plan is estimated with one ``stat`` per directory rather than per file.
+
+For every destination filesystem the bytes to copy are compared with its
+free space, and the directories that would be created are counted.  The
+duration is extrapolated from a short measured sample: a few megabytes of
+a real source file are copied (and fsynced) to a temporary file on each
+destination filesystem, and a temporary file is renamed a few times.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..db import DatabaseManager
+from ..logger import logger
+from .mover import existing_ancestor
+
+DEFAULT_SAMPLE_BYTES = 8 * 1024 * 1024
+_SAMPLE_RENAMES = 10
+
+
+@dataclass
+class DeviceEstimate:
+    """Copies that land on one destination filesystem."""
+
+    path: str  # an existing directory on the filesystem
+    copy_bytes: int = 0
+    free_bytes: int = 0
+    throughput: Optional[float] = None  # bytes per second, measured
+
+    @property
+    def fits(self) -> bool:
+        return self.copy_bytes <= self.free_bytes
+
+
+@dataclass
+class MoveEstimate:
+    moves: int = 0
+    renames: int = 0
+    copies: int = 0
+    skipped: int = 0  # source missing or destination already taken
+    copy_bytes: int = 0
+    dirs_to_create: int = 0
+    rename_seconds: Optional[float] = None  # per rename, measured
+    devices: Dict[int, DeviceEstimate] = field(default_factory=dict)
+
+    @property
+    def fits(self) -> bool:
+        """Whether every destination filesystem has room for its copies."""
+        return all(d.fits for d in self.devices.values())
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds to apply the plan, or ``None`` if not measured."""
+        seconds = 0.0
+        if self.renames:
+            if self.rename_seconds is None:
+                return None
+            seconds += self.renames * self.rename_seconds
+        measured = [d.throughput for d in self.devices.values() if d.throughput]
+        for device in self.devices.values():
+            if not device.copy_bytes:
+                continue
+            rate = device.throughput or (sum(measured) / len(measured) if measured else None)
+            if not rate:
+                return None
+            seconds += device.copy_bytes / rate
+        return seconds
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "moves": self.moves,
+            "renames": self.renames,
+            "copies": self.copies,
+            "skipped": self.skipped,
+            "copy_bytes": self.copy_bytes,
+            "dirs_to_create": self.dirs_to_create,
+            "fits": self.fits,
+            "eta": None if self.eta is None else round(self.eta, 1),
+            "filesystems": [
+                {
+                    "path": d.path,
+                    "copy_bytes": d.copy_bytes,
+                    "free_bytes": d.free_bytes,
+                    "fits": d.fits,
+                    "throughput": None if d.throughput is None else round(d.throughput),
+                }
+                for d in self.devices.values()
+            ],
+        }
+
+
+def estimate_moves(
+    moves: Iterable[Tuple[str, str]],
+    db: Optional[DatabaseManager] = None,
+    sample_bytes: int = DEFAULT_SAMPLE_BYTES,
+) -> MoveEstimate:
+    """Estimate applying *moves*; ``sample_bytes=0`` skips the timing sample."""
+    moves = list(moves)
+    estimate = MoveEstimate(moves=len(moves))
+    sizes = db.sizes_for_paths([src for src, _ in moves]) if db is not None else {}
+
+    # Cached per directory: whether it exists, and its device (or that of its
+    # nearest existing ancestor for destinations).
+    exists: Dict[str, bool] = {}
+    src_devs: Dict[str, Optional[int]] = {}
+    dest_devs: Dict[str, Tuple[int, str]] = {}
+    missing_dirs = set()
+    copy_samples: Dict[int, str] = {}
+    rename_dir: Optional[str] = None
+
+    def dir_exists(directory: str) -> bool:
+        if directory not in exists:
+            exists[directory] = os.path.isdir(directory)
+        return exists[directory]
+
+    for src, dest in moves:
+        src_dir = os.path.dirname(os.path.abspath(src))
+        if src_dir not in src_devs:
+            try:
+                src_devs[src_dir] = os.stat(src_dir).st_dev
+            except OSError:
+                src_devs[src_dir] = None
+        src_dev = src_devs[src_dir]
+        dest_dir = os.path.dirname(os.path.abspath(dest))
+        dest_exists = dir_exists(dest_dir)
+        if src_dev is None or (dest_exists and os.path.lexists(dest)):
+            estimate.skipped += 1
+            continue
+        size = sizes.get(src)
+        if size is None:
+            try:
+                size = os.stat(src).st_size
+            except OSError:
+                estimate.skipped += 1
+                continue
+
+        if dest_dir not in dest_devs:
+            anchor = dest_dir if dest_exists else existing_ancestor(dest_dir)
+            dest_devs[dest_dir] = (os.stat(anchor).st_dev, anchor)
+            probe = dest_dir
+            while probe != anchor and probe not in missing_dirs:
+                missing_dirs.add(probe)
+                probe = os.path.dirname(probe)
+        dest_dev, anchor = dest_devs[dest_dir]
+
+        if src_dev == dest_dev:
+            estimate.renames += 1
+            rename_dir = rename_dir or anchor
+            continue
+        estimate.copies += 1
+        estimate.copy_bytes += size
+        device = estimate.devices.get(dest_dev)
+        if device is None:
+            device = estimate.devices[dest_dev] = DeviceEstimate(anchor)
+            device.free_bytes = shutil.disk_usage(anchor).free
+            copy_samples[dest_dev] = src
+        device.copy_bytes += size
+
+    estimate.dirs_to_create = len(missing_dirs)
+    if sample_bytes > 0:
+        if rename_dir is not None:
+            estimate.rename_seconds = _sample_rename(rename_dir)
+        for dev, src in copy_samples.items():
+            device = estimate.devices[dev]
+            device.throughput = _sample_copy(src, device.path, sample_bytes)
+    return estimate
+
+
+def _sample_copy(src: str, directory: str, limit: int) -> Optional[float]:
+    """Copy up to *limit* bytes of *src* into *directory*; return bytes/second."""
+    try:
+        with open(src, "rb") as fin, tempfile.NamedTemporaryFile(
+            dir=directory, prefix=".songsearch-estimate-"
+        ) as fout:
+            start = time.perf_counter()
+            copied = 0
+            while copied < limit:
+                chunk = fin.read(min(1024 * 1024, limit - copied))
+                if not chunk:
+                    break
+                fout.write(chunk)
+                copied += len(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+            elapsed = time.perf_counter() - start
+    except OSError as exc:
+        logger.warning(f"Could not sample copy speed into {directory}: {exc}")
+        return None
+    return copied / elapsed if copied and elapsed > 0 else None
+
+
+def _sample_rename(directory: str) -> Optional[float]:
+    """Return the measured seconds per rename inside *directory*."""
+    try:
+        fd, path = tempfile.mkstemp(dir=directory, prefix=".songsearch-estimate-")
+        os.close(fd)
+    except OSError as exc:
+        logger.warning(f"Could not sample rename speed in {directory}: {exc}")
+        return None
+    names: List[str] = [path, path + ".1"]
+    try:
+        start = time.perf_counter()
+        for i in range(_SAMPLE_RENAMES):
+            os.replace(names[i % 2], names[(i + 1) % 2])
+        return (time.perf_counter() - start) / _SAMPLE_RENAMES
+    finally:
+        for name in names:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
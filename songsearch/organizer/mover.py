@@ -0,0 +1,460 @@
+"""Execute move plans quickly and recoverably.
+
+:class:`MoveExecutor` groups the moves of a plan by source and destination
+device.  Moves within one filesystem are a single rename each
+(a metadata update, done in order on the calling thread).  Moves across
+filesystems are copied by a bounded thread pool to ``<dest>.part``, renamed
+into place and only then is the source removed, so a destination path never
+holds a partial file.  Renames go through a hard link (or a plain rename on
+Windows, which refuses to replace), so a file that appears at the
+destination after the plan was checked is not replaced either.
+
+Every run is recorded in a :class:`MoveJournal`, an append-only JSON-lines
+file: the full list of moves is written (and fsynced) before anything is
+touched, then one line per finished move.  After a crash,
+:meth:`MoveExecutor.resume` finishes the pending moves (checking the
+filesystem for moves that completed just before the crash) and
+:meth:`MoveExecutor.rollback` puts every moved file back where it came from.
+Existing files are never overwritten.
+
+When a :class:`~songsearch.db.DatabaseManager` is given, successful moves
+update ``path``, ``final_path`` and ``move_status`` of the matching songs in
+batches.
+"""
+
+from __future__ import annotations
+
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .. import metrics
+from ..config import MOVE_JOURNAL_PATH
+from ..db import DatabaseManager
+from ..logger import logger
+from ..profiling import profiled
+
+DEFAULT_COPY_WORKERS = 4
+DEFAULT_BATCH_SIZE = 200
+
+# Journal events
+_START, _PLAN, _DONE, _FAILED, _UNDONE = "start", "plan", "done", "failed", "undone"
+
+
+@dataclass
+class MoveResult:
+    """Outcome of one move (or of undoing it)."""
+
+    src: str
+    dest: str
+    status: str  # "moved", "failed" or "undone"
+    method: str = ""  # "rename", "copy" or "recovered"
+    error: str = ""
+
+
+@dataclass
+class MoveSummary:
+    moved: int = 0
+    renamed: int = 0
+    copied: int = 0
+    undone: int = 0
+    failed: int = 0
+    bytes_copied: int = 0
+    elapsed: float = 0.0
+    failures: List[MoveResult] = field(default_factory=list)
+
+
+class MoveJournal:
+    """Append-only record of a move run.
+
+    The journal lists the planned moves followed by ``done``/``failed``/
+    ``undone`` events that refer to them by position.  Lines are flushed as
+    they are written and fsynced every :attr:`sync_every` events.
+    """
+
+    def __init__(self, path: str = MOVE_JOURNAL_PATH, sync_every: int = DEFAULT_BATCH_SIZE) -> None:
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self._fh = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def start(self, moves: List[Tuple[str, str]]) -> None:
+        """Replace the journal with a new run of *moves*."""
+        self.close()
+        tmp = self.path + ".tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps({"event": _START, "count": len(moves), "time": time.time()}) + "\n")
+            for src, dest in moves:
+                fh.write(json.dumps({"event": _PLAN, "src": src, "dest": dest}, ensure_ascii=False) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+    def load(self) -> Tuple[List[Tuple[str, str]], Dict[int, Tuple[str, str]]]:
+        """Return the planned moves and the last ``(event, method)`` of each.
+
+        A line cut short by a crash is dropped from the file so that later
+        events are appended after the last complete one.
+        """
+        moves: List[Tuple[str, str]] = []
+        states: Dict[int, Tuple[str, str]] = {}
+        valid = 0
+        with open(self.path, "rb") as fh:
+            for line in fh:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("Dropping truncated journal line in %s", self.path)
+                    break
+                valid += len(line)
+                event = record.get("event")
+                if event == _PLAN:
+                    moves.append((record["src"], record["dest"]))
+                elif event in (_DONE, _FAILED, _UNDONE):
+                    states[record["i"]] = (event, record.get("method", ""))
+        if valid < os.path.getsize(self.path):
+            with open(self.path, "r+b") as fh:
+                fh.truncate(valid)
+        return moves, states
+
+    def record(self, event: str, i: int, method: str = "", error: str = "") -> None:
+        entry: Dict[str, object] = {"event": event, "i": i}
+        if method:
+            entry["method"] = method
+        if error:
+            entry["error"] = error
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._fh.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._sync()
+
+    def _sync(self) -> None:
+        if self._fh is not None and self._unsynced:
+            os.fsync(self._fh.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._sync()
+                self._fh.close()
+                self._fh = None
+
+
+class MoveExecutor:
+    """Run moves with per-device strategies, a journal and DB updates."""
+
+    def __init__(
+        self,
+        journal: Optional[MoveJournal] = None,
+        db: Optional[DatabaseManager] = None,
+        copy_workers: int = DEFAULT_COPY_WORKERS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        self.journal = journal or MoveJournal()
+        self.db = db
+        self.copy_workers = max(1, copy_workers)
+        self.batch_size = max(1, batch_size)
+        self._devices: Dict[str, int] = {}
+
+    # ---------------------------------------------------------------- API --
+    def pending(self) -> int:
+        """Number of moves of the journaled run that have not finished."""
+        if not self.journal.exists():
+            return 0
+        moves, states = self.journal.load()
+        return sum(1 for i in range(len(moves)) if i not in states)
+
+    @profiled("organize")
+    def run(
+        self,
+        moves: Iterable[Tuple[str, str]],
+        on_result: Optional[Callable[[MoveResult], None]] = None,
+    ) -> MoveSummary:
+        """Start a new run of ``(src, dest)`` *moves*.
+
+        Raises :class:`RuntimeError` if the previous run has unfinished moves;
+        resume or roll it back first.
+        """
+        if self.pending():
+            raise RuntimeError(
+                f"{self.journal.path} has unfinished moves; resume or roll back first"
+            )
+        moves = list(moves)
+        self.journal.start(moves)
+        return self._execute(list(enumerate(moves)), on_result)
+
+    @profiled("organize")
+    def resume(self, on_result: Optional[Callable[[MoveResult], None]] = None) -> MoveSummary:
+        """Finish the moves of the journaled run that never completed."""
+        if not self.journal.exists():
+            return MoveSummary()
+        moves, states = self.journal.load()
+        todo = []
+        recovered: List[MoveResult] = []
+        for i, (src, dest) in enumerate(moves):
+            if i in states:
+                continue
+            src_exists, dest_exists = os.path.lexists(src), os.path.lexists(dest)
+            if dest_exists and src_exists and _same_file(src, dest):
+                # Linked into place, but the source was not unlinked yet.
+                os.remove(src)
+                src_exists = False
+            if dest_exists and not src_exists:
+                # Completed just before the crash, but not journaled.
+                self.journal.record(_DONE, i, "recovered")
+                recovered.append(MoveResult(src, dest, "moved", "recovered"))
+                continue
+            _remove_quietly(dest + ".part")
+            todo.append((i, (src, dest)))
+        summary = MoveSummary()
+        self._finish_batch(summary, recovered, on_result)
+        return self._execute(todo, on_result, summary)
+
+    @profiled("organize")
+    def rollback(self, on_result: Optional[Callable[[MoveResult], None]] = None) -> MoveSummary:
+        """Move every file of the journaled run back to its source, newest first."""
+        if not self.journal.exists():
+            return MoveSummary()
+        moves, states = self.journal.load()
+        undo = []
+        for i in reversed(range(len(moves))):
+            src, dest = moves[i]
+            event = states.get(i, ("",))[0]
+            if event == _DONE:
+                undo.append((i, (dest, src)))
+            elif not event:
+                # Interrupted run: undo moves that finished without being
+                # journaled and drop the ones that never happened.
+                if os.path.lexists(dest) and not os.path.lexists(src):
+                    undo.append((i, (dest, src)))
+                else:
+                    if _same_file(src, dest):
+                        os.remove(dest)
+                    self.journal.record(_FAILED, i, error="not moved before rollback")
+        return self._execute(undo, on_result, undo=True)
+
+    # ----------------------------------------------------------- internals --
+    def _device(self, path: str) -> int:
+        """Device of *path*, or of its nearest existing ancestor (cached per dir)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        dev = self._devices.get(directory)
+        if dev is None:
+            dev = self._devices[directory] = os.stat(existing_ancestor(directory)).st_dev
+        return dev
+
+    def _execute(
+        self,
+        entries: List[Tuple[int, Tuple[str, str]]],
+        on_result: Optional[Callable[[MoveResult], None]],
+        summary: Optional[MoveSummary] = None,
+        undo: bool = False,
+    ) -> MoveSummary:
+        summary = summary or MoveSummary()
+        start = time.monotonic()
+        self._devices.clear()
+        done_event = _UNDONE if undo else _DONE
+        ok_status = "undone" if undo else "moved"
+        batch: List[MoveResult] = []
+
+        def finish(i: int, src: str, dest: str, method: str, error: str = "") -> None:
+            if error:
+                # A failed undo leaves the move marked done so that a later
+                # rollback can try again.
+                if not undo:
+                    self.journal.record(_FAILED, i, method, error)
+                result = MoveResult(src, dest, "failed", method, error)
+                metrics.count("organizer.move.failed")
+            else:
+                self.journal.record(done_event, i, method)
+                result = MoveResult(src, dest, ok_status, method)
+            batch.append(result)
+            if len(batch) >= self.batch_size:
+                self._finish_batch(summary, batch, on_result)
+                batch.clear()
+
+        # Group by (source device, destination device): renames first, in
+        # plan order, then copies grouped per device pair.
+        renames: List[Tuple[int, str, str]] = []
+        copies: Dict[Tuple[int, int], List[Tuple[int, str, str]]] = {}
+        claimed: Set[str] = set()
+        for i, (src, dest) in entries:
+            try:
+                key = os.path.normcase(os.path.abspath(dest))
+                if key in claimed:
+                    raise FileExistsError(f"destination used by another move: {dest}")
+                if os.path.lexists(dest):
+                    raise FileExistsError(f"destination exists: {dest}")
+                claimed.add(key)
+                src_dev = os.stat(src).st_dev
+                dest_dev = self._device(dest)
+            except OSError as exc:
+                finish(i, src, dest, "", str(exc))
+                continue
+            if src_dev == dest_dev:
+                renames.append((i, src, dest))
+            else:
+                copies.setdefault((src_dev, dest_dev), []).append((i, src, dest))
+
+        created: Set[str] = set()
+        for i, src, dest in renames:
+            try:
+                _makedirs(os.path.dirname(dest), created)
+                with metrics.timer("organizer.move.rename"):
+                    _rename_noreplace(src, dest)
+            except OSError as exc:
+                finish(i, src, dest, "rename", str(exc))
+            else:
+                finish(i, src, dest, "rename")
+
+        if copies:
+            with ThreadPoolExecutor(self.copy_workers, thread_name_prefix="move-copy") as pool:
+                in_flight: Dict[Future, Tuple[int, str, str]] = {}
+                queue = [op for group in copies.values() for op in group]
+                for op in queue:
+                    # Keep at most 2x workers submitted to bound memory and
+                    # let results stream back in order of completion.
+                    if len(in_flight) >= 2 * self.copy_workers:
+                        self._drain(in_flight, finish, summary, wait_for=FIRST_COMPLETED)
+                    i, src, dest = op
+                    try:
+                        _makedirs(os.path.dirname(dest), created)
+                    except OSError as exc:
+                        finish(i, src, dest, "copy", str(exc))
+                        continue
+                    in_flight[pool.submit(_copy_move, src, dest)] = op
+                self._drain(in_flight, finish, summary)
+
+        self._finish_batch(summary, batch, on_result)
+        self.journal.close()
+        summary.elapsed += time.monotonic() - start
+        return summary
+
+    @staticmethod
+    def _drain(in_flight, finish, summary: MoveSummary, wait_for=None) -> None:
+        done, _ = wait(in_flight, return_when=wait_for) if wait_for else (list(in_flight), None)
+        for future in list(done):
+            i, src, dest = in_flight.pop(future)
+            try:
+                summary.bytes_copied += future.result()
+            except OSError as exc:
+                finish(i, src, dest, "copy", str(exc))
+            else:
+                finish(i, src, dest, "copy")
+
+    def _finish_batch(
+        self,
+        summary: MoveSummary,
+        results: List[MoveResult],
+        on_result: Optional[Callable[[MoveResult], None]],
+    ) -> None:
+        ok = []
+        status = "moved"
+        for r in results:
+            if r.status == "failed":
+                summary.failed += 1
+                summary.failures.append(r)
+            else:
+                ok.append((r.src, r.dest))
+                if r.status == "undone":
+                    summary.undone += 1
+                    status = "rolled_back"
+                else:
+                    summary.moved += 1
+                if r.method == "rename":
+                    summary.renamed += 1
+                elif r.method == "copy":
+                    summary.copied += 1
+            if on_result is not None:
+                on_result(r)
+        # A batch holds either moves or undos, never both.
+        if ok and self.db is not None:
+            self.db.record_moves(ok, status=status)
+
+
+def existing_ancestor(directory: str) -> str:
+    """Return *directory* or its nearest ancestor that exists."""
+    probe = os.path.abspath(directory)
+    while not os.path.exists(probe):
+        parent = os.path.dirname(probe)
+        if parent == probe:
+            break
+        probe = parent
+    return probe
+
+
+def _makedirs(directory: str, created: Set[str]) -> None:
+    if directory and directory not in created:
+        os.makedirs(directory, exist_ok=True)
+        created.add(directory)
+
+
+def _copy_move(src: str, dest: str) -> int:
+    """Copy *src* to *dest* via a ``.part`` file, then remove *src*."""
+    part = dest + ".part"
+    with metrics.timer("organizer.move.copy"):
+        try:
+            shutil.copy2(src, part)
+            _rename_noreplace(part, dest)
+        except BaseException:
+            _remove_quietly(part)
+            raise
+        size = os.path.getsize(dest)
+        os.remove(src)
+    metrics.count("organizer.bytes_copied", size)
+    return size
+
+
+# Errors of os.link on filesystems without hard links (FAT, some network
+# shares): fall back to checking before renaming.
+_NO_LINK = {errno.EPERM, errno.EACCES, errno.EMLINK, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+def _rename_noreplace(src: str, dest: str) -> None:
+    """Rename *src* to *dest*, raising :class:`FileExistsError` if *dest* exists."""
+    if os.name == "nt":
+        os.rename(src, dest)  # never replaces on Windows
+        return
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        raise
+    except OSError as exc:
+        if exc.errno not in _NO_LINK:
+            raise
+        if os.path.lexists(dest):
+            raise FileExistsError(errno.EEXIST, "destination exists", dest) from None
+        os.rename(src, dest)
+    else:
+        os.remove(src)
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
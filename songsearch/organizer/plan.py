@@ -1,14 +1,40 @@
 import os
 import csv
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 
+from .. import metrics
 from ..tags import read_tags
 from ..musicbrainz import enrich_with_musicbrainz
-from .destination import build_destination
+from ..config import DEFAULT_DEST_TEMPLATE
+from .destination import build_destination, compile_template
 from ..logger import logger
+from ..profiling import profiled
 
+# Keys of a plan entry, in CSV column order.
+PLAN_FIELDS = (
+    "original_path",
+    "proposed_path",
+    "status",
+    "reason",
+    "title",
+    "artist",
+    "album",
+    "year",
+    "month",
+    "genre",
+    "albumartist",
+    "track",
+    "disc",
+)
+# Plan fields that feed the destination template
+META_FIELDS = PLAN_FIELDS[4:]
 
-def plan_moves(file_paths: List[str], base_dest_dir: str) -> List[Dict[str, str]]:
+
+@profiled("plan")
+@metrics.timed("organizer.plan")
+def plan_moves(
+    file_paths: List[str], base_dest_dir: str, template: str = DEFAULT_DEST_TEMPLATE
+) -> List[Dict[str, str]]:
     """Create a move plan for *file_paths*.
 
     Each file is inspected using :func:`read_tags` and enriched with
@@ -23,6 +49,9 @@ def plan_moves(file_paths: List[str], base_dest_dir: str) -> List[Dict[str, str]
         List of source file paths to plan moves for.
     base_dest_dir:
         Base directory under which the destination paths are built.
+    template:
+        Destination template (see :mod:`songsearch.organizer.destination`);
+        it is validated before any file is read.
 
     Returns
     -------
@@ -32,6 +61,7 @@ def plan_moves(file_paths: List[str], base_dest_dir: str) -> List[Dict[str, str]
         failure, ``status="error"`` with a reason message.
     """
 
+    compile_template(template)
     plan: List[Dict[str, str]] = []
     for src in file_paths:
         try:
@@ -39,67 +69,60 @@ def plan_moves(file_paths: List[str], base_dest_dir: str) -> List[Dict[str, str]
             local = read_tags(src)
             mb = enrich_with_musicbrainz(src)
             meta = {**local, **mb}
-            dest = build_destination(base_dest_dir, meta, ext)
-            plan.append(
-                {
-                    "original_path": src,
-                    "proposed_path": dest,
-                    "status": "ok",
-                    "reason": "planned",
-                    "title": meta.get("title") or "",
-                    "artist": meta.get("artist") or "",
-                    "album": meta.get("album") or "",
-                    "year": meta.get("year") or "",
-                    "month": meta.get("month") or "",
-                    "genre": meta.get("genre") or "",
-                }
-            )
+            with metrics.timer("organizer.build_destination"):
+                dest = build_destination(base_dest_dir, meta, ext, template)
+            entry = {
+                "original_path": src,
+                "proposed_path": dest,
+                "status": "ok",
+                "reason": "planned",
+            }
+            entry.update((f, meta.get(f) or "") for f in META_FIELDS)
+            plan.append(entry)
         except Exception as exc:  # pragma: no cover - defensive
             logger.exception("Error planning move for %s", src)
-            plan.append(
-                {
-                    "original_path": src,
-                    "proposed_path": "",
-                    "status": "error",
-                    "reason": str(exc),
-                    "title": "",
-                    "artist": "",
-                    "album": "",
-                    "year": "",
-                    "month": "",
-                    "genre": "",
-                }
-            )
+            entry = {
+                "original_path": src,
+                "proposed_path": "",
+                "status": "error",
+                "reason": str(exc),
+            }
+            entry.update((f, "") for f in META_FIELDS)
+            plan.append(entry)
     return plan
 
 
-def export_plan_csv(plan: List[Dict[str, str]], csv_path: str) -> Tuple[int, int]:
-    """Write *plan* to ``csv_path`` and return counts of successes/errors."""
-
-    ok = sum(1 for r in plan if r.get("status") == "ok")
-    errors = sum(1 for r in plan if r.get("status") != "ok")
+def export_plan_csv(plan: Iterable[Dict[str, str]], csv_path: str) -> Tuple[int, int]:
+    """Write *plan* to ``csv_path`` and return counts of successes/errors.
 
-    fields = [
-        "original_path",
-        "proposed_path",
-        "status",
-        "reason",
-        "title",
-        "artist",
-        "album",
-        "year",
-        "month",
-        "genre",
-    ]
+    *plan* may be any iterable (for instance entries streamed from the
+    database); it is consumed once and never held in memory.
+    """
 
     dir_name = os.path.dirname(csv_path)
     if dir_name:
         os.makedirs(dir_name, exist_ok=True)
 
+    ok = errors = 0
     with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
+        writer = csv.DictWriter(f, fieldnames=PLAN_FIELDS, extrasaction="ignore")
         writer.writeheader()
         for row in plan:
             writer.writerow(row)
+            if row.get("status") == "ok":
+                ok += 1
+            else:
+                errors += 1
 
     return ok, errors
+
+
+def import_plan_csv(csv_path: str) -> Iterator[Dict[str, str]]:
+    """Yield the entries of a plan CSV written by :func:`export_plan_csv`.
+
+    Rows are read lazily; missing columns are returned as empty strings.
+    """
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {field: row.get(field) or "" for field in PLAN_FIELDS}
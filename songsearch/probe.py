@@ -0,0 +1,422 @@
+"""Fast metadata probe reading only the tag regions of common formats.
+
+Indexing needs six text fields and a duration, while ``mutagen.File`` parses
+a good deal more of each file than that.  :func:`probe` reads just the
+metadata regions, with bounded reads:
+
+``MP3``   the ID3v2.3/2.4 tag, then a few KiB at the first audio frame for
+          the Xing/Info or VBRI frame count (CBR files: size and bitrate)
+``FLAC``  the metadata block headers, STREAMINFO and the Vorbis comment;
+          pictures and padding are skipped with a seek
+``Ogg``   the Vorbis identification and comment packets, plus the last page
+          of the file for its granule position
+``MP4``   atom headers down to ``moov/trak/mdia`` (``hdlr`` and ``mdhd``)
+          and ``moov/udta/meta/ilst``; ``mdat`` and sample tables are skipped
+
+Tags are returned with the keys of mutagen's "easy" interfaces (``title``,
+``artist``, ``album``, ``genre``, ``date``, ``albumartist``,
+``tracknumber``, ``discnumber``, ``originaldate``).  Anything unusual (ID3v2.2,
+unsynchronisation, compressed frames, numeric genres, MP3 without an ID3v2
+tag, Opus, UTF-16 MP4 text, oversized tags, ...) makes :func:`probe` return
+``None`` and callers fall back to mutagen, so results never get worse.
+
+Set ``SONGSEARCH_FAST_PROBE=0`` to always use mutagen.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import struct
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from . import metrics
+from .logger import logger
+
+FAST_PROBE = os.environ.get("SONGSEARCH_FAST_PROBE", "1") != "0"
+
+# Tags (or any single metadata region) larger than this go to mutagen.
+PROBE_LIMIT = 4 * 1024 * 1024
+# Bytes searched for the first MPEG frame after the ID3 tag.
+_MPEG_SCAN = 2048
+# Bytes read from the end of an Ogg file to find its last page.
+_OGG_TAIL = 65536
+
+Tags = Dict[str, List[str]]
+
+
+class Probe(NamedTuple):
+    tags: Tags
+    length: Optional[float]  # seconds
+    bytes_read: int
+
+
+class _Unsupported(Exception):
+    """Raised for files the probe leaves to mutagen."""
+
+
+class _Reader:
+    """File wrapper counting the bytes read."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        self.f = f
+        self.count = 0
+        self.size = os.fstat(f.fileno()).st_size
+
+    def read_at(self, offset: int, n: int) -> bytes:
+        if n > PROBE_LIMIT:
+            raise _Unsupported(f"metadata region of {n} bytes")
+        self.f.seek(offset)
+        data = self.f.read(n)
+        self.count += len(data)
+        return data
+
+    def read_exact(self, offset: int, n: int) -> bytes:
+        data = self.read_at(offset, n)
+        if len(data) != n:
+            raise _Unsupported("truncated file")
+        return data
+
+
+def probe(path: str) -> Optional[Probe]:
+    """Return the tags and length of *path*, or ``None`` to use mutagen."""
+    try:
+        with open(path, "rb") as f:
+            r = _Reader(f)
+            head = r.read_at(0, 12)
+            if head.startswith(b"ID3"):
+                tags, length = _probe_mp3(r)
+            elif head.startswith(b"fLaC"):
+                tags, length = _probe_flac(r)
+            elif head.startswith(b"OggS"):
+                tags, length = _probe_ogg(r)
+            elif head[4:8] == b"ftyp":
+                tags, length = _probe_mp4(r)
+            else:
+                return None
+            return Probe(tags, length, r.count)
+    except (_Unsupported, struct.error, UnicodeDecodeError, ValueError, IndexError) as exc:
+        logger.debug(f"Fast probe skipped {path}: {exc}")
+    except OSError:
+        pass
+    return None
+
+
+def fast_probe(path: str) -> Optional[Probe]:
+    """:func:`probe` when :data:`FAST_PROBE` is enabled, else ``None``."""
+    if not FAST_PROBE:
+        return None
+    result = probe(path)
+    metrics.count("tags.probe_fallback" if result is None else "tags.probe")
+    return result
+
+
+def _add(tags: Tags, key: str, values: List[str]) -> None:
+    if values:
+        tags.setdefault(key, []).extend(values)
+
+
+# ------------------------------------------------------------------- MP3 --
+_ID3_KEYS = {
+    b"TIT2": "title",
+    b"TPE1": "artist",
+    b"TALB": "album",
+    b"TCON": "genre",
+    b"TPE2": "albumartist",
+    b"TRCK": "tracknumber",
+    b"TPOS": "discnumber",
+    b"TDRC": "date",
+    b"TYER": "date",
+    b"TDOR": "originaldate",
+    b"TORY": "originaldate",
+}
+# A genre given as an ID3v1 number, e.g. "(17)" or "17", needs mutagen's table.
+_NUMERIC_GENRE = re.compile(r"^\(?\d+\)?|^\((RX|CR)\)")
+
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _synchsafe(data: bytes) -> int:
+    if any(b & 0x80 for b in data):
+        raise _Unsupported("invalid synchsafe integer")
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_text(body: bytes) -> List[str]:
+    encoding, raw = body[0], body[1:]
+    if encoding in (1, 2):
+        codec = "utf-16" if encoding == 1 else "utf-16-be"
+        parts, start = [], 0
+        for i in range(0, len(raw) - 1, 2):
+            if raw[i] == 0 and raw[i + 1] == 0:
+                parts.append(raw[start:i])
+                start = i + 2
+        parts.append(raw[start : start + (len(raw) - start) // 2 * 2])
+        values = [p.decode(codec) for p in parts]
+    elif encoding in (0, 3):
+        values = raw.decode("latin-1" if encoding == 0 else "utf-8").split("\0")
+    else:
+        raise _Unsupported(f"text encoding {encoding}")
+    return [v for v in values if v]
+
+
+def _probe_mp3(r: _Reader) -> Tuple[Tags, Optional[float]]:
+    header = r.read_exact(0, 10)
+    major, flags = header[3], header[5]
+    if major not in (3, 4) or flags & 0xC0:  # v2.2, unsynchronisation, extended header
+        raise _Unsupported(f"ID3v2.{major} with flags {flags:#x}")
+    size = _synchsafe(header[6:10])
+    data = r.read_exact(10, size)
+    tags: Tags = {}
+    tdat = ""
+    pos = 0
+    while pos + 10 <= len(data) and data[pos] != 0:  # a zero byte starts the padding
+        frame_id = data[pos : pos + 4]
+        if major == 4:
+            frame_size = _synchsafe(data[pos + 4 : pos + 8])
+        else:
+            frame_size = int.from_bytes(data[pos + 4 : pos + 8], "big")
+        format_flags = data[pos + 9]
+        body = data[pos + 10 : pos + 10 + frame_size]
+        pos += 10 + frame_size
+        if frame_id != b"TDAT" and frame_id not in _ID3_KEYS:
+            continue
+        if format_flags & (0x4F if major == 4 else 0xE0):  # compressed, encrypted, ...
+            raise _Unsupported(f"{frame_id!r} frame flags {format_flags:#x}")
+        values = _id3_text(body) if body else []
+        if frame_id == b"TDAT":
+            tdat = values[0] if values else ""
+            continue
+        if frame_id == b"TCON" and any(_NUMERIC_GENRE.match(v) for v in values):
+            raise _Unsupported("numeric genre")
+        _add(tags, _ID3_KEYS[frame_id], values)
+    if pos > len(data):
+        raise _Unsupported("frame overruns the tag")
+    if major == 3 and tdat and len(tdat) == 4 and tdat.isdigit() and "date" in tags:
+        # mutagen merges the v2.3 year and DDMM frames into one date
+        tags["date"][0] += f"-{tdat[2:]}-{tdat[:2]}"
+    audio_start = 10 + size + (10 if major == 4 and flags & 0x10 else 0)
+    return tags, _mpeg_length(r, audio_start)
+
+
+def _mpeg_length(r: _Reader, start: int) -> float:
+    buf = r.read_at(start, _MPEG_SCAN)
+    if buf.startswith(b"fLaC"):
+        raise _Unsupported("FLAC with an ID3 tag")
+    for i in range(len(buf) - 3):
+        if buf[i] != 0xFF or buf[i + 1] & 0xE0 != 0xE0:
+            continue
+        h = int.from_bytes(buf[i : i + 4], "big")
+        version = (h >> 19) & 3
+        layer = (h >> 17) & 3
+        bitrate_index = (h >> 12) & 0xF
+        rate_index = (h >> 10) & 3
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            continue  # not a Layer III frame header
+        mono = (h >> 6) & 3 == 3
+        mpeg1 = version == 3
+        sample_rate = _SAMPLE_RATES[version][rate_index]
+        samples_per_frame = 1152 if mpeg1 else 576
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        xing = buf[i + 4 + side_info : i + 4 + side_info + 12]
+        if xing[:4] in (b"Xing", b"Info"):
+            if not xing[7] & 1:
+                raise _Unsupported("Xing header without a frame count")
+            frames = int.from_bytes(xing[8:12], "big")
+            return frames * samples_per_frame / sample_rate
+        vbri = buf[i + 36 : i + 36 + 18]
+        if vbri[:4] == b"VBRI":
+            frames = int.from_bytes(vbri[14:18], "big")
+            return frames * samples_per_frame / sample_rate
+        bitrate = _BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+        return (r.size - start - i) * 8 / bitrate
+    raise _Unsupported("no MPEG frame after the ID3 tag")
+
+
+# ------------------------------------------------------------ Vorbis/FLAC --
+def _vorbis_comment(data: bytes, tags: Tags) -> None:
+    pos = 4 + int.from_bytes(data[0:4], "little")  # vendor string
+    count = int.from_bytes(data[pos : pos + 4], "little")
+    pos += 4
+    for _ in range(count):
+        length = int.from_bytes(data[pos : pos + 4], "little")
+        entry = data[pos + 4 : pos + 4 + length]
+        if len(entry) != length or b"=" not in entry:
+            raise _Unsupported("malformed Vorbis comment")
+        pos += 4 + length
+        key, _, value = entry.decode("utf-8").partition("=")
+        tags.setdefault(key.lower(), []).append(value)
+
+
+def _probe_flac(r: _Reader) -> Tuple[Tags, Optional[float]]:
+    tags: Tags = {}
+    length: Optional[float] = None
+    pos = 4
+    while True:
+        header = r.read_exact(pos, 4)
+        block_type, size = header[0] & 0x7F, int.from_bytes(header[1:4], "big")
+        pos += 4
+        if block_type == 0:
+            info = r.read_exact(pos, size)
+            sample_rate = (info[10] << 12) | (info[11] << 4) | (info[12] >> 4)
+            total = ((info[13] & 0x0F) << 32) | int.from_bytes(info[14:18], "big")
+            length = total / sample_rate if sample_rate else 0.0
+        elif block_type == 4:
+            _vorbis_comment(r.read_exact(pos, size), tags)
+        elif block_type == 127:
+            raise _Unsupported("invalid FLAC metadata block")
+        pos += size
+        if header[0] & 0x80:
+            break
+    if length is None:
+        raise _Unsupported("FLAC without STREAMINFO")
+    return tags, length
+
+
+# ------------------------------------------------------------------- Ogg --
+def _ogg_packets(r: _Reader) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(serial, packet)`` from the start of an Ogg file."""
+    pos = 0
+    packet: List[bytes] = []
+    while True:
+        header = r.read_exact(pos, 27)
+        if header[:4] != b"OggS":
+            raise _Unsupported("lost Ogg page sync")
+        serial = int.from_bytes(header[14:18], "little")
+        segments = r.read_exact(pos + 27, header[26])
+        body = r.read_exact(pos + 27 + len(segments), sum(segments))
+        pos += 27 + len(segments) + len(body)
+        offset = 0
+        for lacing in segments:
+            packet.append(body[offset : offset + lacing])
+            offset += lacing
+            if lacing < 255:
+                yield serial, b"".join(packet)
+                packet = []
+
+
+def _probe_ogg(r: _Reader) -> Tuple[Tags, Optional[float]]:
+    packets = _ogg_packets(r)
+    serial, ident = next(packets)
+    if not ident.startswith(b"\x01vorbis"):
+        raise _Unsupported("Ogg stream is not Vorbis")
+    sample_rate = int.from_bytes(ident[12:16], "little")
+    comment_serial, comment = next(packets)
+    if comment_serial != serial or not comment.startswith(b"\x03vorbis"):
+        raise _Unsupported("unexpected second Ogg packet")
+    tags: Tags = {}
+    _vorbis_comment(comment[7:], tags)
+
+    tail_start = max(0, r.size - _OGG_TAIL)
+    tail = r.read_at(tail_start, r.size - tail_start)
+    last = tail.rfind(b"OggS")
+    if last < 0 or len(tail) < last + 18:
+        raise _Unsupported("no Ogg page at the end of the file")
+    if int.from_bytes(tail[last + 14 : last + 18], "little") != serial:
+        raise _Unsupported("multiplexed Ogg stream")
+    granule = int.from_bytes(tail[last + 6 : last + 14], "little", signed=True)
+    if granule < 0 or not sample_rate:
+        raise _Unsupported("no granule position on the last Ogg page")
+    return tags, granule / sample_rate
+
+
+# ------------------------------------------------------------------- MP4 --
+_MP4_TEXT = {
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"\xa9alb": "album",
+    b"\xa9gen": "genre",
+    b"aART": "albumartist",
+    b"\xa9day": "date",
+}
+_MP4_PAIRS = {b"trkn": "tracknumber", b"disk": "discnumber"}
+
+
+def _atoms(r: _Reader, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield ``(type, payload_start, payload_end)`` of the atoms in a range."""
+    pos = start
+    while pos + 8 <= end:
+        header = r.read_exact(pos, 8)
+        size, kind = int.from_bytes(header[:4], "big"), header[4:8]
+        header_size = 8
+        if size == 1:
+            size = int.from_bytes(r.read_exact(pos + 8, 8), "big")
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size or pos + size > end:
+            raise _Unsupported(f"bad size for atom {kind!r}")
+        yield kind, pos + header_size, pos + size
+        pos += size
+
+
+def _child(r: _Reader, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for k, s, e in _atoms(r, start, end):
+        if k == kind:
+            return s, e
+    return None
+
+
+def _probe_mp4(r: _Reader) -> Tuple[Tags, Optional[float]]:
+    moov = _child(r, 0, r.size, b"moov")
+    if moov is None:
+        raise _Unsupported("MP4 without moov")
+    length: Optional[float] = None
+    tags: Tags = {}
+    for kind, start, end in _atoms(r, *moov):
+        if kind == b"trak" and length is None:
+            length = _mp4_track_length(r, start, end)
+        elif kind == b"udta":
+            meta = _child(r, start, end, b"meta")
+            if meta is not None:
+                # ``meta`` is a full atom: version and flags precede its children.
+                ilst = _child(r, meta[0] + 4, meta[1], b"ilst")
+                if ilst is not None:
+                    _mp4_items(r, *ilst, tags)
+    if length is None:
+        raise _Unsupported("MP4 without an audio track")
+    return tags, length
+
+
+def _mp4_track_length(r: _Reader, start: int, end: int) -> Optional[float]:
+    mdia = _child(r, start, end, b"mdia")
+    if mdia is None:
+        return None
+    hdlr = mdhd = None
+    for kind, s, e in _atoms(r, *mdia):
+        if kind == b"hdlr":
+            hdlr = r.read_exact(s, 12)
+        elif kind == b"mdhd":
+            mdhd = r.read_exact(s, min(e - s, 32))
+    if hdlr is None or hdlr[8:12] != b"soun" or mdhd is None:
+        return None
+    if mdhd[0] == 0:
+        timescale, duration = struct.unpack(">II", mdhd[12:20])
+    else:
+        timescale, duration = struct.unpack(">IQ", mdhd[20:32])
+    return duration / timescale if timescale else 0.0
+
+
+def _mp4_items(r: _Reader, start: int, end: int, tags: Tags) -> None:
+    for kind, s, e in _atoms(r, start, end):
+        if kind == b"gnre":
+            raise _Unsupported("numeric MP4 genre")
+        key = _MP4_TEXT.get(kind) or _MP4_PAIRS.get(kind)
+        if key is None:
+            continue
+        for data_kind, ds, de in _atoms(r, s, e):
+            if data_kind != b"data":
+                continue
+            data = r.read_exact(ds, de - ds)
+            value_type, value = int.from_bytes(data[1:4], "big"), data[8:]
+            if kind in _MP4_PAIRS:
+                number, total = struct.unpack(">HH", value[2:6])
+                tags.setdefault(key, []).append(f"{number}/{total}" if total else str(number))
+            elif value_type == 1:
+                tags.setdefault(key, []).append(value.decode("utf-8"))
+            else:
+                raise _Unsupported(f"MP4 text of type {value_type}")
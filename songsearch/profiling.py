@@ -0,0 +1,245 @@
+"""Opt-in profiling of scans, searches, plans and moves.
+
+Set ``SONGSEARCH_PROFILE`` (or pass ``--profile`` on the command line) to a
+comma-separated list of modes:
+
+``cpu``     :mod:`cProfile` of the thread that runs the operation; exact
+            call counts, but work done on worker threads only shows up as
+            waiting
+``sample``  a sampling profiler that looks at the stacks of every busy
+            thread every few milliseconds; low overhead, sees the thread
+            pools
+``memory``  :mod:`tracemalloc`: peak traced memory of the operation and the
+            largest allocation sites left at its end
+
+Each profiled operation writes ``<operation>-<time>-<pid>-<n>`` files to
+:data:`~songsearch.config.PROFILE_DIR`: ``.txt`` (the top
+``SONGSEARCH_PROFILE_TOP`` functions of every mode and the memory peak),
+plus ``.prof`` (``cpu``, for :mod:`pstats` or snakeviz) and ``.folded``
+(``sample``, collapsed stacks for flame graph tools).
+
+One operation is profiled at a time: operations started while another one
+is being profiled (the scan of each root of ``index``, the plan of each
+batch) are part of its profile rather than profiled on their own.  With
+profiling off, :func:`profiled` costs one check of a module global per
+call.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, FrozenSet, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from . import config
+from .logger import logger
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+MODES = ("cpu", "sample", "memory")
+DEFAULT_TOP = 30
+SAMPLE_INTERVAL = 0.005  # seconds
+
+_Key = Tuple[str, int, str]  # filename, first line, function name
+# Innermost Python frames of threads blocked on a lock, queue or selector:
+# samples of idle threads are not counted.
+_IDLE = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def _parse_modes(value: str) -> FrozenSet[str]:
+    modes = {m.strip().lower() for m in value.split(",") if m.strip()}
+    if "all" in modes:
+        return frozenset(MODES)
+    unknown = modes - set(MODES)
+    if unknown:
+        logger.warning(f"Unknown profiling modes ignored: {', '.join(sorted(unknown))}")
+    return frozenset(modes & set(MODES))
+
+
+ACTIVE_MODES: FrozenSet[str] = _parse_modes(os.environ.get("SONGSEARCH_PROFILE", ""))
+TOP = int(os.environ.get("SONGSEARCH_PROFILE_TOP", DEFAULT_TOP))
+
+_lock = threading.Lock()
+_running = False
+_counter = itertools.count(1)
+
+
+def configure(modes: Iterable[str] | str, top: Optional[int] = None) -> FrozenSet[str]:
+    """Set the active modes (e.g. ``"cpu,memory"``; empty turns profiling off)."""
+    global ACTIVE_MODES, TOP
+    ACTIVE_MODES = _parse_modes(modes if isinstance(modes, str) else ",".join(modes))
+    if top is not None:
+        TOP = max(1, top)
+    return ACTIVE_MODES
+
+
+class _Sampler(threading.Thread):
+    """Count the functions on the stack of every other thread at intervals."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.own: Counter = Counter()  # function at the top of the stack
+        self.total: Counter = Counter()  # function anywhere on the stack
+        self.stacks: Counter = Counter()  # collapsed stacks, root first
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self._done.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                keys: List[_Key] = []
+                while frame is not None:
+                    code = frame.f_code
+                    keys.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self.samples += 1
+                self.own[keys[0]] += 1
+                self.total.update(set(keys))
+                stack = ";".join(f"{os.path.basename(k[0])}:{k[2]}" for k in reversed(keys))
+                self.stacks[stack] += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def _where(key: _Key) -> str:
+    filename, line, name = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+@contextmanager
+def profile(operation: str, modes: Optional[Iterable[str]] = None) -> Iterator[None]:
+    """Profile the block as *operation* with *modes* (default: the active ones)."""
+    global _running
+    modes = frozenset(modes) if modes is not None else ACTIVE_MODES
+    with _lock:
+        nested = _running
+        _running = _running or bool(modes)
+    if nested or not modes:
+        yield
+        return
+
+    profiler = sampler = None
+    started_tracing = False
+    if "memory" in modes:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    if "sample" in modes:
+        sampler = _Sampler()
+        sampler.start()
+    if "cpu" in modes:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+        if sampler is not None:
+            sampler.stop()
+        memory = None
+        if "memory" in modes:
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+            )
+            memory = (peak, snapshot)
+            if started_tracing:
+                tracemalloc.stop()
+        try:
+            _write(operation, elapsed, profiler, sampler, memory)
+        except OSError as exc:
+            logger.warning(f"Cannot write the profile of {operation}: {exc}")
+        finally:
+            with _lock:
+                _running = False
+
+
+def _write(
+    operation: str,
+    elapsed: float,
+    profiler: Optional[cProfile.Profile],
+    sampler: Optional[_Sampler],
+    memory: Optional[Tuple[int, tracemalloc.Snapshot]],
+) -> None:
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(
+        config.PROFILE_DIR,
+        f"{operation}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_counter)}",
+    )
+    out = io.StringIO()
+    out.write(f"{operation}: {elapsed:.3f}s wall time\n")
+
+    if profiler is not None:
+        profiler.dump_stats(stem + ".prof")
+        for order in ("cumulative", "tottime"):
+            out.write(f"\n== cpu: top {TOP} by {order} ==\n")
+            pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(order).print_stats(TOP)
+
+    if sampler is not None:
+        n = max(1, sampler.samples)
+        out.write(f"\n== sample: {sampler.samples} samples every {sampler.interval * 1000:g} ms ==\n")
+        out.write(f"{'own%':>7} {'total%':>7}  function\n")
+        for key, hits in sampler.own.most_common(TOP):
+            out.write(f"{hits / n:7.1%} {sampler.total[key] / n:7.1%}  {_where(key)}\n")
+        with open(stem + ".folded", "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {hits}\n" for stack, hits in sampler.stacks.most_common())
+
+    peak = None
+    if memory is not None:
+        peak, snapshot = memory
+        out.write(f"\n== memory: peak {peak / 2**20:.1f} MiB ==\n")
+        out.write(f"Largest allocation sites still alive at the end (top {TOP}):\n")
+        for stat in snapshot.statistics("lineno")[:TOP]:
+            out.write(f"{stat}\n")
+
+    with open(stem + ".txt", "w", encoding="utf-8") as f:
+        f.write(out.getvalue())
+    extra = f", peak memory {peak / 2**20:.1f} MiB" if peak is not None else ""
+    logger.info(f"Profile of {operation} ({elapsed:.2f}s{extra}) written to {stem}.txt")
+
+
+def profiled(operation: str) -> Callable[[F], F]:
+    """Decorator: :func:`profile` every call as *operation* when profiling is on."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ACTIVE_MODES:
+                return fn(*args, **kwargs)
+            with profile(operation):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
@@ -1,10 +1,43 @@
-from typing import List, Dict, Any
-from rapidfuzz import process, fuzz
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Sequence
+from .. import metrics
 from ..logger import logger
 from ..db import DatabaseManager
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .index import SearchIndex
 
-def fuzzy_search(db: DatabaseManager, query: str, mode: str, threshold: int) -> List[Dict[str, Any]]:
+# Maximum number of matches returned per query.
+DEFAULT_LIMIT = 50
+
+
+def _choice_key(row: Sequence[Any], mode: str) -> str:
+    """Return the text of *row* that queries are scored against."""
+    if mode == "artist":
+        return row[2] or ""
+    # song mode: use title if available; otherwise fallback to filename without extension
+    return row[3] or row[1] or ""
+
+
+def _to_result(row: Sequence[Any], score: float) -> Dict[str, Any]:
+    """Convert an ``(id, name, artist, title, path)`` row into a result dict."""
+    return {
+        "id": row[0],
+        "name": row[1],
+        "artist": row[2],
+        "title": row[3],
+        "path": row[4],
+        "score": score,
+    }
+
+
+@metrics.timed("search.fuzzy")
+def fuzzy_search(
+    db: DatabaseManager,
+    query: str,
+    mode: str,
+    threshold: int,
+    index: Optional["SearchIndex"] = None,
+) -> List[Dict[str, Any]]:
     """Return fuzzy-matched songs from the database.
 
     Args:
@@ -12,36 +45,38 @@ def fuzzy_search(db: DatabaseManager, query: str, mode: str, threshold: int) ->
         query: Text to search for.
         mode: "artist" to match against artist names, otherwise match song titles/names.
         threshold: Minimum score (0-100) required for a match.
+        index: Optional :class:`~songsearch.search.index.SearchIndex`.  When it
+            is up to date with *db* candidates are taken from the index instead
+            of a ``LIKE`` scan of the songs table.
     """
-    rows = db.fetch_all_for_fuzzy(query, mode)
+    rows = None
+    if index is not None and index.is_fresh(db):
+        ids = index.candidate_ids(query, mode)
+        if len(ids) <= len(index) // 4:
+            rows = db.fetch_songs_by_ids(ids)
+        else:
+            # Fetching most of the table by id is slower than scanning it.
+            # Keep the index's candidates (not LIKE's, which only folds
+            # ASCII case) so the matches do not depend on the path taken.
+            wanted = set(ids)
+            rows = [row for row in db.iter_songs() if row[0] in wanted]
+    if rows is None:
+        rows = db.fetch_all_for_fuzzy(query, mode)
 
-    if mode == "artist":
-        choices = [(r[2] or "", r) for r in rows]  # artist, row
-    else:
-        # song mode: use title if available; otherwise fallback to filename without extension
-        choices = [((r[3] or r[1] or ""), r) for r in rows]  # title/name, row
+    # Imported here so that importing the package (e.g. for SearchIndex at GUI
+    # startup) does not load rapidfuzz before the first search.
+    from rapidfuzz import process, fuzz
 
-    results: List[Dict[str, Any]] = []
     # process.extract returns list of (match_string, score, index); build results manually
-    matches = process.extract(
-        query,
-        [c[0] for c in choices],
-        scorer=fuzz.WRatio,
-        score_cutoff=threshold,
-        limit=50,
-    )
-    for _match_text, score, idx in matches:
-        row = choices[idx][1]
-        results.append(
-            {
-                "id": row[0],
-                "name": row[1],
-                "artist": row[2],
-                "title": row[3],
-                "path": row[4],
-                "score": score,
-            }
+    with metrics.timer("search.score"):
+        matches = process.extract(
+            query,
+            [_choice_key(r, mode) for r in rows],
+            scorer=fuzz.WRatio,
+            score_cutoff=threshold,
+            limit=DEFAULT_LIMIT,
         )
+    results = [_to_result(rows[idx], score) for _match_text, score, idx in matches]
 
     logger.debug("Fuzzy matches for '%s': %d", query, len(results))
     return results
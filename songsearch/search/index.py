@@ -0,0 +1,308 @@
+"""Persisted, memory-mapped candidate index for fuzzy search.
+
+The index file stores the song ids together with normalized (case-folded)
+search keys so that :func:`songsearch.search.fuzzy_search` can find its
+candidates without scanning the ``songs`` table.  Opening the index only maps
+the file and reads a fixed-size header, so the cost of the first search does
+not depend on the size of the library.
+
+File layout (all integers little endian, sections 8-byte aligned)::
+
+    header   magic, version, instance, generation, count, section offsets
+    ids      ``count`` int64 song ids in ascending order
+    song     PackedStrings of ``casefold(title) + US + casefold(name)``
+    artist   PackedStrings of ``casefold(artist)``
+
+The header records the database ``(instance, generation)`` pair the index was
+built from (see :meth:`DatabaseManager.write_generation`).  When the database
+has moved on, :meth:`SearchIndex.refresh` merges only the songs listed in
+``song_changes`` into a new file and atomically replaces the old one.
+"""
+
+from __future__ import annotations
+
+import functools
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Sequence
+
+from .. import metrics
+from ..config import INDEX_PATH
+from ..db import DatabaseManager
+from ..logger import logger
+from .packed import OFFSET_SIZE, OFFSET_TYPECODE, PackedStrings
+
+MAGIC = b"SSINDEX\0"
+VERSION = 1
+# magic, version, reserved, instance, generation, count,
+# ids_off, song_off, song_len, artist_off, artist_len
+_HEADER = struct.Struct("<8sIIqqqqqqqq")
+
+# Separates title and filename inside a song key; never part of a query.
+_KEY_SEP = "\x1f"
+
+
+def normalize(text: Optional[str]) -> str:
+    """Return the normalized form used for index keys and queries."""
+    return (text or "").casefold()
+
+
+def _song_key(row: Sequence) -> str:
+    return normalize(row[3]) + _KEY_SEP + normalize(row[1])
+
+
+def _artist_key(row: Sequence) -> str:
+    return normalize(row[2])
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _locked(method):
+    """Serialize *method* on the instance lock so threads never see a closed map."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class _Builder:
+    """Accumulates index sections before they are written to disk."""
+
+    def __init__(self) -> None:
+        self.ids = array(OFFSET_TYPECODE)
+        self.columns = [
+            (array(OFFSET_TYPECODE, [0]), bytearray()),
+            (array(OFFSET_TYPECODE, [0]), bytearray()),
+        ]
+
+    def add_rows(self, rows: Iterable[Sequence]) -> None:
+        (song_offs, song_blob), (artist_offs, artist_blob) = self.columns
+        for row in rows:
+            self.ids.append(row[0])
+            song_blob += _song_key(row).encode("utf-8")
+            song_offs.append(len(song_blob))
+            artist_blob += _artist_key(row).encode("utf-8")
+            artist_offs.append(len(artist_blob))
+
+    def copy_range(self, index: "SearchIndex", start: int, stop: int) -> None:
+        """Copy entries ``start:stop`` of an open *index* without decoding them."""
+        if start >= stop:
+            return
+        self.ids.frombytes(index._ids[start:stop].tobytes())
+        for (offs, blob), packed in zip(self.columns, (index._song, index._artist)):
+            src = packed.offsets
+            first, last = src[start], src[stop]
+            shift = len(blob) - first
+            blob += packed.blob[first:last]
+            offs.extend(o + shift for o in src[start + 1 : stop + 1])
+
+    def write(self, path: str, instance: int, generation: int) -> None:
+        count = len(self.ids)
+        sections = [self.ids.tobytes()] + [
+            PackedStrings(offs, bytes(blob)).to_bytes() for offs, blob in self.columns
+        ]
+        pos = _align(_HEADER.size)
+        layout = []
+        for data in sections:
+            layout.append((pos, len(data)))
+            pos = _align(pos + len(data))
+        (ids_off, _), (song_off, song_len), (artist_off, artist_len) = layout
+        header = _HEADER.pack(
+            MAGIC, VERSION, 0, instance, generation, count,
+            ids_off, song_off, song_len, artist_off, artist_len,
+        )
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(header)
+            for (off, _), data in zip(layout, sections):
+                fh.seek(off)
+                fh.write(data)
+            fh.truncate(pos)
+        os.replace(tmp, path)
+
+
+class SearchIndex:
+    """Memory-mapped index of normalized search keys.
+
+    Instances are safe to share between threads.
+
+    Args:
+        path: Location of the index file.  A missing or unreadable file is
+            treated as an empty, stale index.
+    """
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self.instance: Optional[int] = None
+        self.generation = -1
+        self._mm: Optional[mmap.mmap] = None
+        self._ids: Optional[memoryview] = None
+        self._song: Optional[PackedStrings] = None
+        self._artist: Optional[PackedStrings] = None
+        self._blob_starts = {"song": 0, "artist": 0}
+        self._open()
+
+    def _open(self) -> None:
+        self.close()
+        try:
+            with open(self.path, "rb") as fh:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        view = None
+        try:
+            (
+                magic, version, _reserved, instance, generation, count,
+                ids_off, song_off, song_len, artist_off, artist_len,
+            ) = _HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"unsupported index format {magic!r} v{version}")
+            if max(ids_off + count * OFFSET_SIZE, song_off + song_len, artist_off + artist_len) > len(mm):
+                raise ValueError("truncated index file")
+            view = memoryview(mm)
+            self._ids = view[ids_off : ids_off + count * OFFSET_SIZE].cast(OFFSET_TYPECODE)
+            self._song = PackedStrings.from_buffer(view[song_off : song_off + song_len], count)
+            self._artist = PackedStrings.from_buffer(
+                view[artist_off : artist_off + artist_len], count
+            )
+            self._blob_starts = {
+                "song": song_off + (count + 1) * OFFSET_SIZE,
+                "artist": artist_off + (count + 1) * OFFSET_SIZE,
+            }
+        except (struct.error, ValueError, TypeError) as exc:
+            logger.warning("Ignoring invalid search index %s: %s", self.path, exc)
+            # The mapping is released once the partial views are collected.
+            self._ids = self._song = self._artist = view = None
+            return
+        del view
+        self._mm = mm
+        self.instance, self.generation = instance, generation
+
+    @_locked
+    def close(self) -> None:
+        """Unmap the index file."""
+        # Drop every view into the mapping first; mmap refuses to close while
+        # buffers are exported.
+        self._ids = self._song = self._artist = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:  # pragma: no cover - a caller still holds a view
+                pass
+            self._mm = None
+        self.instance, self.generation = None, -1
+
+    def __len__(self) -> int:
+        return len(self._ids) if self._ids is not None else 0
+
+    # -------------------------------------------------------- maintenance --
+    @_locked
+    def is_fresh(self, db: DatabaseManager) -> bool:
+        """Return ``True`` if the index matches the current state of *db*."""
+        return self._mm is not None and (self.instance, self.generation) == db.write_generation()
+
+    @metrics.timed("search.index_refresh")
+    @_locked
+    def refresh(self, db: DatabaseManager) -> str:
+        """Bring the index up to date with *db*.
+
+        Returns ``"fresh"`` when nothing had to be done, ``"incremental"`` when
+        only changed songs were merged and ``"rebuilt"`` after a full rebuild.
+        """
+        # Read the generation before the rows: if the database changes in the
+        # meantime the index merely looks stale and is refreshed again later.
+        instance, generation = db.write_generation()
+        if self._mm is not None and self.instance == instance:
+            if self.generation == generation:
+                return "fresh"
+            if 0 <= self.generation < generation:
+                self._merge(db, instance, generation)
+                return "incremental"
+        self.rebuild(db, instance, generation)
+        return "rebuilt"
+
+    @_locked
+    def rebuild(
+        self,
+        db: DatabaseManager,
+        instance: Optional[int] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Write a new index from every song in *db*."""
+        if instance is None or generation is None:
+            instance, generation = db.write_generation()
+        builder = _Builder()
+        builder.add_rows(db.iter_songs())
+        self.close()
+        builder.write(self.path, instance, generation)
+        self._open()
+        logger.info("Search index rebuilt with %d songs", len(self))
+
+    def _merge(self, db: DatabaseManager, instance: int, generation: int) -> None:
+        changed = db.changed_song_ids(self.generation)
+        current = {row[0]: row for row in db.fetch_songs_by_ids(changed)}
+        ids = self._ids
+        builder = _Builder()
+        pos = 0
+        for song_id in changed:  # ascending, like the ids section
+            i = bisect_left(ids, song_id, pos)
+            builder.copy_range(self, pos, i)
+            if i < len(ids) and ids[i] == song_id:
+                i += 1  # drop the outdated entry
+            if song_id in current:
+                builder.add_rows([current[song_id]])
+            pos = i
+        builder.copy_range(self, pos, len(ids))
+        del ids
+        self.close()
+        builder.write(self.path, instance, generation)
+        self._open()
+        logger.debug("Search index merged %d changed songs", len(changed))
+
+    # ------------------------------------------------------------- lookup --
+    @metrics.timed("search.index_candidates")
+    @_locked
+    def candidate_ids(self, query: str, mode: str) -> List[int]:
+        """Return ids of songs whose keys contain *query* as a substring.
+
+        This mirrors the ``LIKE`` pre-filter of
+        :meth:`DatabaseManager.fetch_all_for_fuzzy` (title or filename in
+        song mode, artist otherwise) but is case-insensitive for all scripts.
+        """
+        if self._mm is None:
+            return []
+        ids = self._ids
+        key = "artist" if mode == "artist" else "song"
+        offsets = (self._artist if key == "artist" else self._song).offsets
+        needle = normalize(query).encode("utf-8")
+        if not needle:
+            return list(ids)
+
+        base = self._blob_starts[key]
+        end = base + offsets[len(ids)]
+        found: List[int] = []
+        pos = base
+        while True:
+            hit = self._mm.find(needle, pos, end)
+            if hit < 0:
+                break
+            row = bisect_right(offsets, hit - base) - 1
+            row_end = base + offsets[row + 1]
+            if hit + len(needle) <= row_end:
+                found.append(ids[row])
+                pos = row_end
+            else:  # match straddles two keys
+                pos = hit + 1
+        return found
+
@@ -0,0 +1,106 @@
+"""Compact string storage shared by the search structures.
+
+A :class:`PackedStrings` keeps a list of strings as a single UTF-8 blob plus
+an offset table (``n + 1`` signed 64-bit integers).  The layout contains no
+Python objects, so it can be placed in shared memory or in a file and read
+back through a :class:`memoryview` without copying.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Iterator, List, Sequence, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+OFFSET_TYPECODE = "q"
+OFFSET_SIZE = array(OFFSET_TYPECODE).itemsize
+
+
+class PackedStrings(Sequence[str]):
+    """Immutable sequence of strings stored as one blob plus offsets."""
+
+    __slots__ = ("_offsets", "_blob")
+
+    def __init__(self, offsets: Union[array, memoryview], blob: Buffer) -> None:
+        if len(offsets) == 0:
+            raise ValueError("offset table must contain at least one entry")
+        self._offsets = offsets
+        self._blob = blob
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str | None]) -> "PackedStrings":
+        """Pack *strings*; ``None`` is stored as an empty string."""
+        builder = PackedStringsBuilder()
+        for s in strings:
+            builder.append(s)
+        return builder.build()
+
+    @classmethod
+    def from_buffer(cls, buf: Buffer, count: int) -> "PackedStrings":
+        """View a buffer produced by :meth:`to_bytes` holding *count* strings."""
+        view = memoryview(buf)
+        table = (count + 1) * OFFSET_SIZE
+        offsets = view[:table].cast(OFFSET_TYPECODE)
+        return cls(offsets, view[table : table + offsets[count]])
+
+    # ------------------------------------------------------------ sequence --
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("PackedStrings index out of range")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        blob = bytes(self._blob)
+        offsets = self._offsets
+        for i in range(len(self)):
+            yield blob[offsets[i] : offsets[i + 1]].decode("utf-8")
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+    # ------------------------------------------------------------- buffers --
+    @property
+    def offsets(self) -> Union[array, memoryview]:
+        return self._offsets
+
+    @property
+    def blob(self) -> Buffer:
+        return self._blob
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the serialized form returned by :meth:`to_bytes`."""
+        return len(self._offsets) * OFFSET_SIZE + len(self._blob)
+
+    def to_bytes(self) -> bytes:
+        return self._offsets.tobytes() + bytes(self._blob)
+
+
+class PackedStringsBuilder:
+    """Incrementally build a :class:`PackedStrings`."""
+
+    __slots__ = ("offsets", "blob")
+
+    def __init__(self) -> None:
+        self.offsets = array(OFFSET_TYPECODE, [0])
+        self.blob = bytearray()
+
+    def append(self, s: str | None) -> None:
+        self.blob += (s or "").encode("utf-8")
+        self.offsets.append(len(self.blob))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def build(self) -> PackedStrings:
+        return PackedStrings(self.offsets, bytes(self.blob))
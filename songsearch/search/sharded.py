@@ -0,0 +1,241 @@
+"""Multi-process fuzzy search over very large catalogues.
+
+:class:`ShardedSearchEngine` splits the search keys of a catalogue into
+contiguous shards.  Each shard is packed into its own shared memory segment
+(see :class:`~songsearch.search.packed.PackedStrings`) and served by a
+dedicated worker process, so no key data is pickled through pipes.  Queries
+are scattered to every shard, each worker returns its local top-k and the
+parent merges them into the global top-k.  Results use the same dictionaries
+as :func:`songsearch.search.fuzzy_search`.
+
+Like :func:`~songsearch.search.fuzzy_search` with an up-to-date
+:class:`~songsearch.search.index.SearchIndex`, only songs whose normalized
+title or filename (artist in artist mode) contains the query are scored, so
+both return the same matches; ``prefilter=False`` scores every key instead.
+"""
+
+from __future__ import annotations
+
+import heapq
+import multiprocessing as mp
+import os
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..db import DatabaseManager
+from ..logger import logger
+from . import DEFAULT_LIMIT, _choice_key, _to_result
+from .index import _artist_key, _song_key, normalize
+from .packed import PackedStrings
+
+Row = Sequence[Any]
+
+
+def _attach(name: str) -> SharedMemory:
+    """Attach to an existing segment without registering it for cleanup.
+
+    The parent owns (and unlinks) every segment.  Before Python 3.13 merely
+    attaching registers the segment with the resource tracker, which would
+    then try to unlink it a second time when the worker exits.
+    """
+    try:
+        return SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None  # type: ignore[assignment]
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register  # type: ignore[assignment]
+
+
+# Columns packed into each shard's segment, in order: the keys queries are
+# scored against and the normalized keys candidates are filtered on (the
+# same as the search index's).
+_COLUMNS = ("song", "artist", "song_filter", "artist_filter")
+
+
+def _shard_worker(conn, shm_name: str, count: int, sizes: Sequence[int], base: int) -> None:
+    """Serve queries for one shard until ``None`` is received."""
+    from rapidfuzz import fuzz, process
+
+    shm = _attach(shm_name)
+    packed = {}
+    start = 0
+    for column, size in zip(_COLUMNS, sizes):
+        packed[column] = PackedStrings.from_buffer(shm.buf[start : start + size], count)
+        start += size
+    # rapidfuzz needs ``str`` objects; decode a column the first time a query
+    # needs it and keep it for the worker's lifetime.
+    decoded: Dict[str, List[str]] = {}
+
+    def column(name: str) -> List[str]:
+        if name not in decoded:
+            decoded[name] = packed[name].to_list()
+        return decoded[name]
+
+    conn.send("ready")
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            queries, mode, threshold, limit, prefilter = msg
+            key = "artist" if mode == "artist" else "song"
+            keys = column(key)
+            out = []
+            for q in queries:
+                needle = normalize(q)
+                if prefilter and needle:
+                    rows = [i for i, text in enumerate(column(key + "_filter")) if needle in text]
+                    choices = [keys[i] for i in rows]
+                else:
+                    rows, choices = None, keys
+                matches = process.extract(
+                    q, choices, scorer=fuzz.WRatio, score_cutoff=threshold, limit=limit
+                )
+                if rows is not None:
+                    matches = [(text, score, rows[idx]) for text, score, idx in matches]
+                out.append([(score, base + idx) for _text, score, idx in matches])
+            conn.send(out)
+    except (EOFError, KeyboardInterrupt):  # pragma: no cover - parent went away
+        pass
+    finally:
+        packed.clear()
+        decoded.clear()
+        shm.close()
+
+
+class ShardedSearchEngine:
+    """Fuzzy search engine that partitions the catalogue across processes.
+
+    Args:
+        rows: ``(id, name, artist, title, path)`` tuples, as returned by
+            :meth:`DatabaseManager.fetch_all_songs`, or a
+            :class:`~songsearch.catalogue.SongCatalogue`.
+        workers: Number of shards/worker processes.  Defaults to the CPU count.
+        limit: Maximum number of matches returned per query.
+        prefilter: Only score songs whose normalized key contains the query,
+            as :func:`~songsearch.search.fuzzy_search` does.
+        mp_context: Optional :mod:`multiprocessing` context used to start the
+            workers.
+    """
+
+    def __init__(
+        self,
+        rows: Sequence[Row],
+        workers: Optional[int] = None,
+        limit: int = DEFAULT_LIMIT,
+        prefilter: bool = True,
+        mp_context: Any = None,
+    ) -> None:
+        workers = workers or os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.rows = rows
+        self.limit = limit
+        self.prefilter = prefilter
+        self.workers = max(1, min(workers, len(rows))) if rows else 1
+        self._segments: List[SharedMemory] = []
+        self._conns: List[Any] = []
+        self._procs: List[Any] = []
+        ctx = mp_context or mp.get_context()
+
+        n = len(rows)
+        bounds = [n * i // self.workers for i in range(self.workers + 1)]
+        try:
+            for start, end in zip(bounds, bounds[1:]):
+                self._start_shard(ctx, rows[start:end], start)
+            for conn in self._conns:
+                conn.recv()  # wait until every shard is attached
+        except Exception:
+            self.close()
+            raise
+        logger.debug("Sharded search ready: %d rows in %d shards", n, self.workers)
+
+    @classmethod
+    def from_db(cls, db: DatabaseManager, **kwargs: Any) -> "ShardedSearchEngine":
+        """Build an engine from every song stored in *db*."""
+        return cls(db.fetch_all_songs(), **kwargs)
+
+    def _start_shard(self, ctx: Any, shard: Sequence[Row], base: int) -> None:
+        blobs = [
+            PackedStrings.from_strings(key(r) for r in shard).to_bytes()
+            for key in (
+                lambda r: _choice_key(r, "song"),
+                lambda r: _choice_key(r, "artist"),
+                _song_key,
+                _artist_key,
+            )
+        ]
+        shm = SharedMemory(create=True, size=max(1, sum(map(len, blobs))))
+        self._segments.append(shm)
+        start = 0
+        for blob in blobs:
+            shm.buf[start : start + len(blob)] = blob
+            start += len(blob)
+
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(
+            target=_shard_worker,
+            args=(child_conn, shm.name, len(shard), [len(b) for b in blobs], base),
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        self._conns.append(parent_conn)
+        self._procs.append(proc)
+
+    # -------------------------------------------------------------- search --
+    def search(self, query: str, mode: str, threshold: int) -> List[Dict[str, Any]]:
+        """Return the best matches for *query* (see :func:`fuzzy_search`)."""
+        return self.search_batch([query], mode, threshold)[0]
+
+    def search_batch(
+        self, queries: Sequence[str], mode: str, threshold: int
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several queries in one round trip to the shards."""
+        if not self._conns:
+            raise RuntimeError("search engine is closed")
+        queries = list(queries)
+        if not queries or not self.rows:
+            return [[] for _ in queries]
+
+        msg = (queries, mode, threshold, self.limit, self.prefilter)
+        for conn in self._conns:
+            conn.send(msg)
+        per_shard: List[List[List[Tuple[float, int]]]] = [conn.recv() for conn in self._conns]
+
+        results = []
+        for qi in range(len(queries)):
+            candidates = (hit for shard in per_shard for hit in shard[qi])
+            # Highest score first; ties keep catalogue order like process.extract.
+            best = heapq.nsmallest(self.limit, candidates, key=lambda h: (-h[0], h[1]))
+            results.append([_to_result(self.rows[idx], score) for score, idx in best])
+        return results
+
+    # ----------------------------------------------------------- lifecycle --
+    def close(self) -> None:
+        """Stop the workers and release the shared memory segments."""
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):  # pragma: no cover - worker died
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():  # pragma: no cover - defensive
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._conns, self._procs, self._segments = [], [], []
+
+    def __enter__(self) -> "ShardedSearchEngine":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,333 @@
+"""Local JSON-over-HTTP search service.
+
+One long-running process keeps a :class:`DatabaseManager` and a warm
+:class:`~songsearch.search.index.SearchIndex` and answers requests from any
+number of clients, instead of every user or script building its own state.
+Requests are served concurrently by :class:`ThreadingHTTPServer`; the index is
+safe to share between threads and every database call opens its own
+connection.
+
+Endpoints (request and response bodies are JSON):
+
+``POST /search``   ``{"queries": [...], "mode": "song", "threshold": 70, "limit": 50}``
+``GET /songs/<id>`` one song, 404 if unknown
+``POST /songs``    ``{"ids": [...]}`` several songs
+``POST /rescan``   ``{"roots": [...]}`` start indexing in the background (202)
+``GET /rescan``    state of the last rescan
+``GET /metrics``   request count and latency percentiles per endpoint
+``GET /metrics/stages`` stage timers and counters (:func:`songsearch.metrics.snapshot`)
+``GET /metrics/prometheus`` the same in the Prometheus text format
+``GET /health``    liveness probe
+
+Stage metrics are only collected with ``--metrics`` or
+``SONGSEARCH_METRICS=1``.  Every response carries an ``X-Elapsed-Ms`` header with the time spent
+handling it.  The server binds to ``127.0.0.1`` by default and has no
+authentication; it is meant for a trusted local network at most.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from . import metrics
+from .config import DEFAULT_FUZZY_THRESHOLD, FILE_EXTS
+from .db import DatabaseManager
+from .indexer import LibraryIndexer, ScanControl, ScanProgress
+from .logger import logger
+from .search import DEFAULT_LIMIT, fuzzy_search
+from .search.index import SearchIndex
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Latency samples kept per endpoint for the percentiles in /metrics.
+METRICS_WINDOW = 10_000
+# Upper bound on queries accepted by one /search request.
+MAX_BATCH = 1000
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Return the *q*-th percentile (0-100) of *sorted_values* (nearest rank)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class LatencyStats:
+    """Thread-safe per-endpoint request counters and latency samples."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    def record(self, endpoint: str, elapsed_ms: float, error: bool = False) -> None:
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self._window)
+            samples.append(elapsed_ms)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            data = {k: sorted(v) for k, v in self._samples.items()}
+            counts, errors = dict(self._counts), dict(self._errors)
+        return {
+            endpoint: {
+                "count": counts[endpoint],
+                "errors": errors.get(endpoint, 0),
+                "mean_ms": sum(values) / len(values),
+                "p50_ms": percentile(values, 50),
+                "p99_ms": percentile(values, 99),
+                "max_ms": values[-1],
+            }
+            for endpoint, values in data.items()
+        }
+
+
+class SearchService:
+    """Shared state behind the HTTP handlers."""
+
+    def __init__(self, db: DatabaseManager, index: SearchIndex) -> None:
+        self.db = db
+        self.index = index
+        self.metrics = LatencyStats()
+        self._scan_lock = threading.Lock()
+        self._scan_thread: Optional[threading.Thread] = None
+        self._scan_control: Optional[ScanControl] = None
+        self._scan_state: Dict[str, Any] = {"state": "idle"}
+        # Map the index and bring it up to date before the first request.
+        self.index.refresh(self.db)
+
+    # ------------------------------------------------------------- search --
+    def search(
+        self, queries: Sequence[str], mode: str, threshold: int, limit: int
+    ) -> List[Dict[str, Any]]:
+        self.index.refresh(self.db)
+        return [
+            {
+                "query": q,
+                "matches": fuzzy_search(self.db, q.lower(), mode, threshold, index=self.index)[:limit],
+            }
+            for q in queries
+        ]
+
+    def songs(self, ids: Sequence[int]) -> List[Dict[str, Any]]:
+        return [
+            {"id": r[0], "name": r[1], "artist": r[2], "title": r[3], "path": r[4]}
+            for r in self.db.fetch_songs_by_ids(list(ids))
+        ]
+
+    # ------------------------------------------------------------- rescan --
+    def start_rescan(self, roots: Sequence[str]) -> bool:
+        """Index *roots* on a background thread; ``False`` if a scan is running."""
+        with self._scan_lock:
+            if self._scan_thread is not None and self._scan_thread.is_alive():
+                return False
+            control = ScanControl()
+            self._scan_control = control
+            self._scan_state = {"state": "running", "roots": list(roots), "files_done": 0}
+            self._scan_thread = threading.Thread(
+                target=self._rescan, args=(list(roots), control), name="rescan", daemon=True
+            )
+            self._scan_thread.start()
+            return True
+
+    def _rescan(self, roots: List[str], control: ScanControl) -> None:
+        done = 0
+
+        def progress(p: ScanProgress) -> None:
+            with self._scan_lock:
+                self._scan_state.update(
+                    files_done=done + p.files_done,
+                    files_per_sec=p.files_per_sec,
+                    eta=p.eta,
+                )
+
+        try:
+            for root in roots:
+                done += LibraryIndexer(self.db, root, FILE_EXTS, control=control).run(progress)
+                if control.cancelled:
+                    break
+            self.index.refresh(self.db)
+            state = "cancelled" if control.cancelled else "done"
+            with self._scan_lock:
+                self._scan_state.update(state=state, files_done=done)
+        except Exception as exc:  # pragma: no cover - logging only
+            logger.exception("Rescan failed")
+            with self._scan_lock:
+                self._scan_state.update(state="failed", error=str(exc))
+
+    def rescan_state(self) -> Dict[str, Any]:
+        with self._scan_lock:
+            return dict(self._scan_state)
+
+    def close(self) -> None:
+        if self._scan_control is not None:
+            self._scan_control.cancel()
+        if self._scan_thread is not None:
+            self._scan_thread.join()
+        self.index.close()
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _int_field(body: Dict[str, Any], key: str, default: int) -> int:
+    try:
+        return int(body.get(key, default))
+    except (TypeError, ValueError):
+        raise _BadRequest(f"'{key}' must be an integer") from None
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """Route requests to the :class:`SearchService` of the server."""
+
+    server: "SearchServer"
+    protocol_version = "HTTP/1.1"  # keep-alive for clients that reuse connections
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # waits for the delayed ACK of the headers on keep-alive connections.
+    disable_nagle_algorithm = True
+
+    # --------------------------------------------------------------- utils --
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError as exc:
+            raise _BadRequest(f"invalid JSON: {exc}") from None
+        if not isinstance(body, dict):
+            raise _BadRequest("request body must be a JSON object")
+        return body
+
+    def _dispatch(self, method: str) -> None:
+        start = time.perf_counter()
+        path = self.path.split("?", 1)[0].rstrip("/") or "/"
+        endpoint: Optional[str] = f"{method} {path}"
+        try:
+            status, payload, endpoint = self._route(method, path, endpoint)
+        except _BadRequest as exc:
+            status, payload = HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except Exception as exc:  # pragma: no cover - logging only
+            logger.exception("Request failed: %s", endpoint)
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(exc)}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if endpoint is not None:
+            self.server.service.metrics.record(endpoint, elapsed_ms, error=status >= 500)
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Elapsed-Ms", f"{elapsed_ms:.3f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str, path: str, endpoint: str) -> Tuple[int, Any, Optional[str]]:
+        """Return ``(status, payload, endpoint)``; *endpoint* is ``None`` for
+        unknown routes so they do not show up in the metrics."""
+        service = self.server.service
+        if method == "POST":
+            body = self._read_json()
+        if (method, path) == ("POST", "/search"):
+            queries = body.get("queries")
+            if isinstance(queries, str):
+                queries = [queries]
+            if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                raise _BadRequest("'queries' must be a list of strings")
+            if len(queries) > MAX_BATCH:
+                raise _BadRequest(f"at most {MAX_BATCH} queries per request")
+            mode = body.get("mode", "song")
+            if mode not in ("song", "artist"):
+                raise _BadRequest("'mode' must be 'song' or 'artist'")
+            threshold = _int_field(body, "threshold", DEFAULT_FUZZY_THRESHOLD)
+            limit = _int_field(body, "limit", DEFAULT_LIMIT)
+            return HTTPStatus.OK, {"results": service.search(queries, mode, threshold, limit)}, endpoint
+        if (method, path) == ("POST", "/songs"):
+            ids = body.get("ids")
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                raise _BadRequest("'ids' must be a list of integers")
+            return HTTPStatus.OK, {"songs": service.songs(ids)}, endpoint
+        if method == "GET" and path.startswith("/songs/"):
+            endpoint = "GET /songs/<id>"
+            try:
+                song_id = int(path[len("/songs/") :])
+            except ValueError:
+                raise _BadRequest("song id must be an integer") from None
+            songs = service.songs([song_id])
+            if not songs:
+                return HTTPStatus.NOT_FOUND, {"error": "song not found"}, endpoint
+            return HTTPStatus.OK, songs[0], endpoint
+        if (method, path) == ("POST", "/rescan"):
+            roots = body.get("roots")
+            if not isinstance(roots, list) or not roots or not all(isinstance(r, str) for r in roots):
+                raise _BadRequest("'roots' must be a non-empty list of folders")
+            if not service.start_rescan(roots):
+                return HTTPStatus.CONFLICT, {"error": "a rescan is already running"}, endpoint
+            return HTTPStatus.ACCEPTED, service.rescan_state(), endpoint
+        if (method, path) == ("GET", "/rescan"):
+            return HTTPStatus.OK, service.rescan_state(), endpoint
+        if (method, path) == ("GET", "/metrics"):
+            return HTTPStatus.OK, service.metrics.snapshot(), endpoint
+        if (method, path) == ("GET", "/metrics/stages"):
+            return HTTPStatus.OK, metrics.snapshot(), endpoint
+        if (method, path) == ("GET", "/metrics/prometheus"):
+            return HTTPStatus.OK, metrics.prometheus_text(), endpoint
+        if (method, path) == ("GET", "/health"):
+            return HTTPStatus.OK, {"status": "ok", "songs": len(service.index)}, endpoint
+        return HTTPStatus.NOT_FOUND, {"error": f"no endpoint {endpoint}"}, None
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        self._dispatch("POST")
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class SearchServer(ThreadingHTTPServer):
+    """HTTP server with a shared :class:`SearchService`."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: SearchService) -> None:
+        super().__init__(address, SearchRequestHandler)
+        self.service = service
+
+
+def serve(
+    db: DatabaseManager,
+    index: SearchIndex,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+) -> None:
+    """Run the service until interrupted."""
+    service = SearchService(db, index)
+    with SearchServer((host, port), service) as server:
+        host, port = server.server_address[:2]
+        logger.info("Serving %d songs on http://%s:%d", len(index), host, port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
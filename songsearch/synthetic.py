@@ -0,0 +1,422 @@
+"""Synthetic music libraries for load tests and benchmarks.
+
+Real libraries cannot be shipped, so this module makes up realistic ones:
+
+* :func:`write_mp3`, :func:`write_flac`, :func:`write_ogg` and
+  :func:`write_m4a` write tiny but valid files (a few hundred bytes of
+  silence-like audio plus real tags, written through mutagen);
+* :class:`TagGenerator` produces tags whose artists and genres follow a
+  Zipf distribution, as in real collections where a few artists make up
+  much of the library.  Some titles are near-duplicates of earlier ones
+  ("(Remastered)", "(Live)", other case or punctuation), some fields are
+  missing and some names are not ASCII;
+* :func:`generate_library` writes N such files in a configurable folder
+  layout, and :func:`populate_songs` inserts N rows straight into the
+  ``songs`` table for search-only benchmarks at million-row scale.
+
+Everything is derived from a seed, so the same arguments give the same
+library.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import random
+import re
+import struct
+from bisect import bisect
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .db import DatabaseManager
+from .logger import logger
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, joint stereo: 417-byte frames
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\0" * 413
+
+FORMATS = (".mp3", ".flac", ".ogg", ".m4a")
+
+# Folder layouts, formatted with the tags of a track plus ``ext`` and ``index``.
+LAYOUTS = {
+    "artist-album": "{albumartist}/{album}/{tracknumber:0>2} {title}{ext}",
+    "genre": "{genre}/{artist} - {title}{ext}",
+    "flat": "{artist} - {title}{ext}",
+}
+DEFAULT_LAYOUT = "artist-album"
+# Stand-ins for missing tags in folder and file names.
+_PLACEHOLDERS = {
+    "artist": "Unknown Artist",
+    "albumartist": "Unknown Artist",
+    "album": "Unknown Album",
+    "genre": "Unknown",
+    "title": "Untitled",
+    "tracknumber": "00",
+}
+
+
+# ---------------------------------------------------------------- files --
+def write_mp3(path, tags=None, frames=20, v2_version=4, xing=False):
+    """Write an MP3 of *frames* frames (26 ms each) with ID3v2 *tags*."""
+    from mutagen.easyid3 import EasyID3
+
+    with open(path, "wb") as f:
+        if xing:
+            # Side info of a stereo MPEG-1 frame is 32 bytes.
+            info = b"Xing" + struct.pack(">II", 1, frames)
+            f.write((MP3_FRAME[:36] + info + MP3_FRAME[48:])[:417])
+        f.write(MP3_FRAME * frames)
+    id3 = EasyID3()
+    id3.update(tags or {})
+    id3.save(path, v2_version=v2_version)
+    return path
+
+
+def write_flac(path, tags=None, seconds=3.0, sample_rate=44100, picture=b""):
+    """Write a FLAC stream header claiming *seconds* of audio, with Vorbis *tags*."""
+    from mutagen.flac import FLAC, Picture
+
+    total = int(seconds * sample_rate)
+    info = struct.pack(">HH", 4096, 4096) + b"\0" * 6
+    bits = (sample_rate << 44) | (1 << 41) | (15 << 36) | total  # stereo, 16 bit
+    info += bits.to_bytes(8, "big") + b"\0" * 16
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info)
+        f.write(b"\xff\xf8" + b"\0" * 64)
+    audio = FLAC(path)
+    audio.add_tags()
+    audio.tags.update(tags or {})
+    if picture:
+        pic = Picture()
+        pic.data = picture
+        pic.mime = "image/jpeg"
+        audio.add_picture(pic)
+    audio.save()
+    return path
+
+
+def write_ogg(path, tags=None, seconds=3.0, sample_rate=44100):
+    """Write the three header pages of an Ogg Vorbis stream plus one audio page."""
+    from mutagen._vorbis import VCommentDict
+    from mutagen.ogg import OggPage
+
+    ident = (
+        b"\x01vorbis"
+        + struct.pack("<IBIiii", 0, 2, sample_rate, 0, 128000, 0)
+        + b"\xb8\x01"
+    )
+    comment = VCommentDict()
+    for key, value in (tags or {}).items():
+        comment[key] = value
+    pages = []
+    for seq, (packets, granule) in enumerate(
+        [
+            ([ident], 0),
+            ([b"\x03vorbis" + comment.write(), b"\x05vorbis" + b"\0" * 32], 0),
+            ([b"\0" * 100], int(seconds * sample_rate)),
+        ]
+    ):
+        page = OggPage()
+        page.packets = packets
+        page.serial = 1234
+        page.sequence = seq
+        page.position = granule
+        page.first = seq == 0
+        page.last = seq == 2
+        pages.append(page.write())
+    with open(path, "wb") as f:
+        f.write(b"".join(pages))
+    return path
+
+
+def _atom(kind, *children):
+    body = b"".join(children)
+    return struct.pack(">I", 8 + len(body)) + kind + body
+
+
+def write_m4a(path, tags=None, seconds=3.0, timescale=44100):
+    """Write an MP4 audio file with one sound track and iTunes-style *tags*."""
+    from mutagen.easymp4 import EasyMP4
+
+    duration = int(seconds * timescale)
+    mvhd = _atom(b"mvhd", b"\0" * 12 + struct.pack(">II", timescale, duration) + b"\0" * 80)
+    mdhd = _atom(b"mdhd", b"\0" * 12 + struct.pack(">II", timescale, duration) + b"\0" * 4)
+    hdlr = _atom(b"hdlr", b"\0" * 8 + b"soun" + b"\0" * 13)
+    stbl = _atom(b"stbl", _atom(b"stco", b"\0" * 8))
+    trak = _atom(b"trak", _atom(b"mdia", mdhd, hdlr, _atom(b"minf", stbl)))
+    with open(path, "wb") as f:
+        f.write(_atom(b"ftyp", b"M4A \0\0\0\0M4A mp42isom"))
+        f.write(_atom(b"moov", mvhd, trak))
+        f.write(_atom(b"mdat", b"\0" * 256))
+    audio = EasyMP4(path)
+    audio.add_tags()
+    audio.update(tags or {})
+    audio.save()
+    return path
+
+
+WRITERS: Dict[str, Callable[..., str]] = {
+    ".mp3": write_mp3,
+    ".flac": write_flac,
+    ".ogg": write_ogg,
+    ".m4a": write_m4a,
+}
+
+
+# ----------------------------------------------------------------- tags --
+_WORDS = (
+    "love night heart fire dance baby light dream rain blue girl time home road "
+    "summer river city gold wild fall sun moon star ghost honey young street "
+    "corazón noche fuego luna amor vida sueño cielo mar camino"
+).split()
+_NAME_PARTS = (
+    "Black Silver Electric Velvet Midnight Crystal Neon Iron Golden Paper "
+    "Lucky Broken Northern Hollow Lonely Stone Atlantic Wild Sonic Tiger "
+    "Wolves Kings Hearts Rivers Machines Sisters Brothers Echoes Satellites"
+).split()
+_FIRST = "Ana Ben Carla Dan Elena Frank Grace Hugo Iris Jack Lucía Marco Nina Omar".split()
+_LAST = "Smith García Jones Müller Rossi Dubois Silva Kowalski Berg Novak Ortiz".split()
+# Names that exercise non-ASCII handling: accents, other scripts, emoji.
+_UNICODE_NAMES = (
+    "Björk Guðmundsdóttir",
+    "Sigur Rós",
+    "Mötley Crüe",
+    "Beyoncé",
+    "坂本龍一",
+    "宇多田ヒカル",
+    "방탄소년단",
+    "Кино",
+    "Ζωή Παπαδοπούλου",
+    "عمرو دياب",
+    "Café Tacvba",
+    "Motörhead",
+    "🎧 Lo-Fi Club",
+)
+_UNICODE_WORDS = "café naïve señor über niño 夜 愛 сердце ночь 꿈 φως".split()
+# Ranked by popularity for the Zipf draw.
+GENRES = [
+    g.replace("_", " ")
+    for g in (
+        "Rock Pop Electronic Hip-Hop Jazz Classical Indie Metal R&B Folk Reggae "
+        "Latin Blues Country Soul Punk Ambient House Techno Funk Salsa Flamenco "
+        "Bossa_Nova K-Pop J-Pop Soundtrack Disco Gospel Ska Trance"
+    ).split()
+]
+_VARIANTS: Sequence[Callable[[str], str]] = (
+    lambda t: f"{t} (Remastered {random.Random(t).randint(1995, 2023)})",
+    lambda t: f"{t} (Live)",
+    lambda t: f"{t} - Radio Edit",
+    lambda t: t.lower(),
+    lambda t: t.upper(),
+    lambda t: re.sub(r"[^\w\s]", "", t) + "!",
+    lambda t: f"{t} (feat. {random.Random(t).choice(_FIRST)})",
+    lambda t: t.replace(" ", "  ", 1),
+)
+
+
+def _zipf_weights(n: int, s: float) -> List[float]:
+    """Cumulative weights of ranks ``1..n`` under a Zipf law of exponent *s*."""
+    return list(itertools.accumulate(1 / (k**s) for k in range(1, n + 1)))
+
+
+class TagGenerator:
+    """Endless, reproducible stream of realistic tag dictionaries.
+
+    Keys are the mutagen "easy" names (``title``, ``artist``, ``album``,
+    ``albumartist``, ``genre``, ``date``, ``tracknumber``, ``discnumber``)
+    plus ``length`` in seconds, which is not a tag and is dropped when files
+    are written.
+
+    *artists* is the size of the artist pool (ranked by a Zipf law of
+    exponent *zipf*, as are genres); *near_dupes*, *missing* and *unicode*
+    are the probabilities of a near-duplicate title, of each optional field
+    being absent and of a non-ASCII name.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        artists: int = 500,
+        zipf: float = 1.1,
+        near_dupes: float = 0.05,
+        missing: float = 0.05,
+        unicode: float = 0.1,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.near_dupes = near_dupes
+        self.missing = missing
+        self.unicode = unicode
+        self.artists = [self._artist_name(i) for i in range(max(1, artists))]
+        self._artist_cum = _zipf_weights(len(self.artists), zipf)
+        self._genre_cum = _zipf_weights(len(GENRES), zipf)
+        # Each artist sticks to a main genre and has a few albums.
+        self._artist_genre: Dict[str, str] = {}
+        self._albums: Dict[str, List[str]] = {}
+        self._tracks: Dict[tuple, int] = {}
+        self._recent: List[str] = []
+
+    def _words(self, n: int) -> str:
+        rng = self.rng
+        pool = _UNICODE_WORDS if rng.random() < self.unicode else _WORDS
+        return " ".join(rng.choice(pool) for _ in range(n)).title()
+
+    def _artist_name(self, i: int) -> str:
+        rng = self.rng
+        if rng.random() < self.unicode:
+            name = rng.choice(_UNICODE_NAMES)
+        elif rng.random() < 0.5:
+            name = f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"
+        else:
+            name = f"The {rng.choice(_NAME_PARTS)} {rng.choice(_NAME_PARTS)}"
+        # Pools are larger than the name space: tell namesakes apart.
+        return name if i < 200 else f"{name} {i}"
+
+    def _pick(self, items: Sequence[str], cum: List[float]) -> str:
+        return items[bisect(cum, self.rng.random() * cum[-1])]
+
+    def _title(self) -> str:
+        rng = self.rng
+        if self._recent and rng.random() < self.near_dupes:
+            return rng.choice(_VARIANTS)(rng.choice(self._recent))
+        title = self._words(rng.randint(1, 4))
+        self._recent.append(title)
+        if len(self._recent) > 1000:
+            del self._recent[: len(self._recent) // 2]
+        return title
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return self
+
+    def __next__(self) -> Dict[str, str]:
+        rng = self.rng
+        artist = self._pick(self.artists, self._artist_cum)
+        genre = self._artist_genre.get(artist)
+        if genre is None or rng.random() < 0.1:
+            genre = self._pick(GENRES, self._genre_cum)
+            self._artist_genre.setdefault(artist, genre)
+        albums = self._albums.setdefault(artist, [])
+        if not albums or (len(albums) < 8 and rng.random() < 0.05):
+            albums.append(self._words(rng.randint(1, 3)))
+        album = rng.choice(albums)
+        track = self._tracks[artist, album] = self._tracks.get((artist, album), 0) + 1
+        tags = {
+            "title": self._title(),
+            "artist": artist,
+            "album": album,
+            "albumartist": artist,
+            "genre": genre,
+            "date": f"{rng.randint(1960, 2024)}-{rng.randint(1, 12):02d}",
+            "tracknumber": str(track),
+            "discnumber": "1",
+        }
+        for key in ("artist", "album", "albumartist", "genre", "date", "tracknumber", "discnumber"):
+            if rng.random() < self.missing:
+                del tags[key]
+        tags["length"] = str(rng.randint(90, 420))
+        return tags
+
+
+# -------------------------------------------------------------- library --
+_UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+@lru_cache(maxsize=65536)
+def _component(value: str) -> str:
+    return _UNSAFE.sub("_", value).strip(" .") or "_"
+
+
+def _relative_path(layout: str, tags: Dict[str, str], ext: str, index: int) -> str:
+    fields = {k: _component(tags.get(k) or v) for k, v in _PLACEHOLDERS.items()}
+    fields["tracknumber"] = fields["tracknumber"].split("/")[0]
+    parts = layout.split("/")
+    return os.path.join(*(p.format(**fields, ext=ext, index=index) for p in parts))
+
+
+def generate_library(
+    root: str,
+    n: int,
+    seed: int = 0,
+    formats: Iterable[str] = FORMATS,
+    layout: str = DEFAULT_LAYOUT,
+    tags: Optional[TagGenerator] = None,
+) -> List[str]:
+    """Write *n* tagged audio files below *root* and return their paths.
+
+    *formats* are extensions from :data:`FORMATS`, picked round-robin.
+    *layout* is a key of :data:`LAYOUTS` or a template with the same fields
+    (tag names, ``ext`` and ``index``); clashing names get a " (2)" suffix.
+    """
+    formats = [f if f.startswith(".") else f".{f}" for f in formats]
+    unknown = [f for f in formats if f not in WRITERS]
+    if unknown or not formats:
+        raise ValueError(f"unsupported formats: {unknown or 'none given'}")
+    template = LAYOUTS.get(layout, layout)
+    tags = tags or TagGenerator(seed)
+    used: set = set()
+    paths: List[str] = []
+    for index, meta in zip(range(n), tags):
+        ext = formats[index % len(formats)]
+        rel = _relative_path(template, meta, ext, index)
+        stem, suffix = os.path.splitext(rel)
+        copy = 1
+        while rel.lower() in used:
+            copy += 1
+            rel = f"{stem} ({copy}){suffix}"
+        used.add(rel.lower())
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        length = float(meta.pop("length"))
+        if ext == ".mp3":
+            write_mp3(path, meta)  # frame count, not length, sets the duration
+        else:
+            WRITERS[ext](path, meta, seconds=length)
+        paths.append(path)
+    logger.info(f"Generated {len(paths)} files in {root}")
+    return paths
+
+
+def song_rows(
+    n: int, seed: int = 0, root: str = "/music", tags: Optional[TagGenerator] = None
+) -> Iterator[Dict[str, object]]:
+    """Yield *n* ``songs`` rows for made-up files below *root* (nothing is written)."""
+    tags = tags or TagGenerator(seed)
+    template = LAYOUTS[DEFAULT_LAYOUT]
+    for index, meta in zip(range(n), tags):
+        ext = FORMATS[index % len(FORMATS)]
+        # The index keeps paths unique without tracking a million of them.
+        rel = _relative_path(template, meta, f" [{index}]{ext}", index)
+        year, _, month = (meta.get("date") or "").partition("-")
+        length = int(meta["length"])
+        yield {
+            "name": os.path.splitext(os.path.basename(rel))[0],
+            "artist": meta.get("artist"),
+            "title": meta["title"],
+            "album": meta.get("album"),
+            "year": year or None,
+            "month": month or None,
+            "genre": meta.get("genre"),
+            "path": os.path.join(root, rel),
+            "duration": length,
+            "file_format": ext[1:],
+            "size": length * 16_000,
+        }
+
+
+def populate_songs(
+    db: DatabaseManager,
+    n: int,
+    seed: int = 0,
+    root: str = "/music",
+    batch_size: int = 20_000,
+) -> int:
+    """Insert *n* synthetic rows into the ``songs`` table of *db*, in batches."""
+    rows = song_rows(n, seed, root)
+    done = 0
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        db.add_songs(batch)
+        done += len(batch)
+    logger.info(f"Inserted {done} synthetic songs into {db.db_path}")
+    return done
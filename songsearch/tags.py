@@ -1,9 +1,10 @@
 """Utilities for reading audio metadata tags.
 
 This module provides :func:`read_tags` which extracts common
-metadata fields from audio files using the `mutagen` library.  The
-function is tolerant to missing tags and parsing errors and always
-returns a dictionary with the expected keys.
+metadata fields from audio files using :func:`songsearch.probe.fast_probe`
+or, for files it does not handle, the `mutagen` library.  The function is
+tolerant to missing tags and parsing errors and always returns a
+dictionary with the expected keys.
 """
 
 from dataclasses import dataclass, asdict
@@ -11,7 +12,9 @@ from typing import Optional, Dict, Any, Tuple
 
 from mutagen import File as MutagenFile
 
+from . import metrics
 from .logger import logger
+from .probe import fast_probe
 
 
 @dataclass
@@ -24,6 +27,9 @@ class SongTags:
     year: Optional[str] = None
     month: Optional[str] = None
     genre: Optional[str] = None
+    albumartist: Optional[str] = None
+    track: Optional[str] = None
+    disc: Optional[str] = None
 
 
 def _first_value(audio: Dict[str, Any], key: str) -> Optional[str]:
@@ -64,6 +70,7 @@ def _parse_date(value: Any) -> Tuple[Optional[str], Optional[str]]:
     return year, month
 
 
+@metrics.timed("tags.read")
 def read_tags(file_path: str) -> Dict[str, Optional[str]]:
     """Read common audio tags from *file_path*.
 
@@ -76,14 +83,15 @@ def read_tags(file_path: str) -> Dict[str, Optional[str]]:
     -------
     Dict[str, Optional[str]]
         Dictionary with keys ``title``, ``artist``, ``album``, ``year``,
-        ``month`` and ``genre``.  Missing tags are represented as
-        ``None``.
+        ``month``, ``genre``, ``albumartist``, ``track`` and ``disc``.
+        Missing tags are represented as ``None``.
     """
 
     tags = SongTags()
 
     try:
-        audio = MutagenFile(file_path, easy=True)
+        probed = fast_probe(file_path)
+        audio = probed.tags if probed is not None else MutagenFile(file_path, easy=True)
         if not audio:
             return asdict(tags)
 
@@ -91,6 +99,9 @@ def read_tags(file_path: str) -> Dict[str, Optional[str]]:
         tags.artist = _first_value(audio, "artist")
         tags.album = _first_value(audio, "album")
         tags.genre = _first_value(audio, "genre")
+        tags.albumartist = _first_value(audio, "albumartist")
+        tags.track = _first_value(audio, "tracknumber")
+        tags.disc = _first_value(audio, "discnumber")
 
         date_val = (
             _first_value(audio, "date")
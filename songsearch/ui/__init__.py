@@ -1,6 +1,23 @@
 """UI components for SongSearch."""
 
-from .search_panel import SearchPanel
-from .organizer_panel import OrganizerPanel
+import importlib
+from typing import Any
+
+# Panels are imported on first access so that importing a single UI module
+# (or the main window) does not pull in every panel and its dependencies.
+_LAZY_EXPORTS = {
+    "SearchPanel": ".search_panel",
+    "OrganizerPanel": ".organizer_panel",
+}
 
 __all__ = ["SearchPanel", "OrganizerPanel"]
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _LAZY_EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
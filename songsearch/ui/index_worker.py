@@ -0,0 +1,68 @@
+"""Background library indexing for :class:`~songsearch.ui.search_panel.SearchPanel`.
+
+The scan runs on its own :class:`QThreadPool`, separate from the search pool,
+so searches keep working while a large folder is indexed: batches are
+committed as they are read and each search refreshes the index from the
+committed rows.  Progress, completion and errors reach the panel as signals
+delivered on the UI thread.  :class:`WatchSignals` does the same for the
+batches applied by a :class:`~songsearch.watcher.LibraryWatcher`.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from ..db import DatabaseManager
+from ..indexer import LibraryIndexer, ScanControl
+from ..logger import logger
+from ..search.index import SearchIndex
+
+
+class IndexSignals(QObject):
+    """Signals emitted by :class:`IndexTask` (delivered on the UI thread)."""
+
+    # ScanProgress snapshot
+    progress = pyqtSignal(object)
+    # files indexed, whether the scan was cancelled
+    finished = pyqtSignal(int, bool)
+    # error message
+    failed = pyqtSignal(str)
+
+
+class WatchSignals(QObject):
+    """Signals of a library watcher (delivered on the UI thread)."""
+
+    # songs updated, songs removed
+    batch = pyqtSignal(int, int)
+
+
+class IndexTask(QRunnable):
+    """Run a :class:`~songsearch.indexer.LibraryIndexer` off the UI thread."""
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        root: str,
+        exts: Iterable[str],
+        index: Optional[SearchIndex],
+        signals: IndexSignals,
+        control: ScanControl,
+    ) -> None:
+        super().__init__()
+        self.indexer = LibraryIndexer(db, root, exts, control=control)
+        self.index = index
+        self.signals = signals
+        self.control = control
+
+    def run(self) -> None:
+        try:
+            count = self.indexer.run(self.signals.progress.emit)
+            if self.index is not None:
+                # Leave the index warm for the next search.
+                self.index.refresh(self.indexer.db)
+            self.signals.finished.emit(count, self.control.cancelled)
+        except Exception as exc:  # pragma: no cover - logging only
+            logger.exception("Indexing failed")
+            self.signals.failed.emit(str(exc))
@@ -0,0 +1,50 @@
+"""Placeholder widget that builds its real contents on demand.
+
+:class:`LazyTab` lets the main window add its tabs without importing or
+constructing the panels behind them.  The panel is created the first time
+the tab has been painted (so the window shows up with a placeholder first) or
+when :meth:`LazyTab.widget` is called, whichever happens first.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+
+class LazyTab(QWidget):
+    """Container whose child widget is produced by *factory* on first use."""
+
+    def __init__(self, factory: Callable[[], QWidget], parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._factory = factory
+        self._widget: Optional[QWidget] = None
+        self._scheduled = False
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._placeholder = QLabel("Cargando...")
+        self._placeholder.setAlignment(Qt.AlignCenter)
+        self._layout.addWidget(self._placeholder)
+
+    @property
+    def is_built(self) -> bool:
+        return self._widget is not None
+
+    def widget(self) -> QWidget:
+        """Return the real widget, constructing it if needed."""
+        if self._widget is None:
+            self._widget = self._factory()
+            self._layout.removeWidget(self._placeholder)
+            self._placeholder.deleteLater()
+            self._layout.addWidget(self._widget)
+        return self._widget
+
+    def paintEvent(self, event) -> None:  # noqa: N802 - Qt API
+        super().paintEvent(event)
+        if self._widget is None and not self._scheduled:
+            # Build once the placeholder is on screen rather than on show, so
+            # the first frame of the window is not held up by the panel.
+            self._scheduled = True
+            QTimer.singleShot(0, self.widget)
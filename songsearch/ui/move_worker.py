@@ -0,0 +1,77 @@
+"""Background file moves for :class:`~songsearch.ui.organizer_panel.OrganizerPanel`.
+
+A :class:`MoveTask` runs one :class:`~songsearch.organizer.mover.MoveExecutor`
+action (a new run, resuming an interrupted one or rolling one back) on the
+panel's thread pool.  Results are forwarded in batches so a plan of thousands
+of files does not flood the UI thread with one signal per file.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from ..logger import logger
+from ..organizer.mover import MoveExecutor, MoveResult
+
+# Seconds between two progress signals
+PROGRESS_INTERVAL = 0.2
+
+
+class MoveSignals(QObject):
+    """Signals emitted by :class:`MoveTask` (delivered on the UI thread)."""
+
+    # list of MoveResult finished since the previous signal
+    progress = pyqtSignal(object)
+    # MoveSummary
+    finished = pyqtSignal(object)
+    # error message
+    failed = pyqtSignal(str)
+
+
+class MoveTask(QRunnable):
+    """Run ``executor.run``, ``executor.resume`` or ``executor.rollback``."""
+
+    def __init__(
+        self,
+        executor: MoveExecutor,
+        action: str,
+        signals: MoveSignals,
+        moves: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> None:
+        super().__init__()
+        self.executor = executor
+        self.action = action
+        self.signals = signals
+        self.moves = moves or []
+        self._pending: List[MoveResult] = []
+        self._last = 0.0
+
+    def _on_result(self, result: MoveResult) -> None:
+        self._pending.append(result)
+        now = time.monotonic()
+        if now - self._last >= PROGRESS_INTERVAL:
+            self._flush()
+            self._last = now
+
+    def _flush(self) -> None:
+        if self._pending:
+            self.signals.progress.emit(self._pending)
+            self._pending = []
+
+    def run(self) -> None:
+        try:
+            if self.action == "run":
+                summary = self.executor.run(self.moves, self._on_result)
+            elif self.action == "resume":
+                summary = self.executor.resume(self._on_result)
+            else:
+                summary = self.executor.rollback(self._on_result)
+            self._flush()
+            self.signals.finished.emit(summary)
+        except Exception as exc:
+            logger.exception("Move task failed")
+            self._flush()
+            self.signals.failed.emit(str(exc))
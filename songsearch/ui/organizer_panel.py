@@ -7,14 +7,15 @@ Este panel permite al usuario seleccionar archivos y moverlos a una carpeta de
 
 from __future__ import annotations
 
-import os
-import shutil
-from typing import List
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QThreadPool, Qt
 from PyQt5.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
     QFileDialog,
     QHBoxLayout,
+    QHeaderView,
     QLabel,
     QLineEdit,
     QPushButton,
@@ -23,12 +24,20 @@ from PyQt5.QtWidgets import (
     QVBoxLayout,
     QWidget,
     QStyle,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
 )
 
-from ..organizer.plan import plan_moves
-from ..organizer.destination import build_destination
+from ..config import DEFAULT_DEST_TEMPLATE, MOVE_JOURNAL_PATH
+from ..organizer.collisions import resolve_collisions
+from ..organizer.destination import TEMPLATE_FIELDS, TemplateError, compile_template
+from ..organizer.plan import export_plan_csv, import_plan_csv, plan_moves
+from .plan_model import EDITABLE_FIELDS, HEADERS, PlanTableModel
+from .formatting import format_bytes, format_duration
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ..db import DatabaseManager
+    from ..organizer.mover import MoveResult, MoveSummary
+    from .move_worker import MoveSignals
 
 
 class OrganizerPanel(QWidget):
@@ -38,9 +47,25 @@ class OrganizerPanel(QWidget):
         super().__init__(parent)
         self.file_paths: List[str] = []
         self.dest_dir: str = ""
-        self.plan: List[dict] = []
+        self.plan_model = PlanTableModel(self)
+        # Plan guardado en la base de datos que se está mostrando
+        self.plan_id: int | None = None
+        self.journal_path = MOVE_JOURNAL_PATH
+        self._db: DatabaseManager | None = None
+        # Los movimientos se ejecutan en segundo plano, de uno en uno.
+        self._move_pool = QThreadPool(self)
+        self._move_pool.setMaxThreadCount(1)
+        self._move_signals: MoveSignals | None = None
         self._build_ui()
 
+    @property
+    def db(self) -> DatabaseManager:
+        if self._db is None:
+            from ..db import DatabaseManager
+
+            self._db = DatabaseManager()
+        return self._db
+
     # ------------------------------------------------------------------ UI --
     def _build_ui(self) -> None:
         main = QVBoxLayout(self)
@@ -71,19 +96,63 @@ class OrganizerPanel(QWidget):
         top_layout.addLayout(dest_layout)
         main.addLayout(top_layout)
 
-        splitter = QSplitter(Qt.Vertical)
-        self.plan_table = QTableWidget()
-        self.plan_table.setColumnCount(5)
-        self.plan_table.setHorizontalHeaderLabels(
-            ["Mover", "Origen", "Destino", "Género", "Año"]
+        template_layout = QHBoxLayout()
+        template_layout.setContentsMargins(0, 0, 0, 0)
+        template_layout.setSpacing(5)
+        template_layout.addWidget(QLabel("Plantilla:"))
+        self.template_edit = QLineEdit(DEFAULT_DEST_TEMPLATE)
+        self.template_edit.setToolTip(
+            "Campos: " + ", ".join("{%s}" % f for f in TEMPLATE_FIELDS) + "\n"
+            "{albumartist|artist}: primer campo con valor\n"
+            "[Disco {disc}/]: sección que solo aparece si sus campos tienen valor"
         )
-        self.plan_table.itemChanged.connect(self._plan_item_changed)
+        template_layout.addWidget(self.template_edit)
+        main.addLayout(template_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.plan_table = QTableView()
+        self.plan_table.setModel(self.plan_model)
+        self.plan_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # Fixed row heights and interactive column widths: the view never has
+        # to measure every row of a large plan.
+        vheader = self.plan_table.verticalHeader()
+        vheader.setSectionResizeMode(QHeaderView.Fixed)
+        vheader.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        hheader = self.plan_table.horizontalHeader()
+        hheader.setSectionResizeMode(QHeaderView.Interactive)
+        hheader.setStretchLastSection(True)
+        for col, width in enumerate((50, 320, 420, 120)):
+            self.plan_table.setColumnWidth(col, width)
         splitter.addWidget(self.plan_table)
         self.log = QTextEdit()
         self.log.setReadOnly(True)
         splitter.addWidget(self.log)
         main.addWidget(splitter)
 
+        bulk_layout = QHBoxLayout()
+        bulk_layout.setContentsMargins(0, 0, 0, 0)
+        bulk_layout.setSpacing(5)
+        bulk_layout.addWidget(QLabel("Editar selección:"))
+        self.bulk_field = QComboBox()
+        for col, field in EDITABLE_FIELDS.items():
+            self.bulk_field.addItem(HEADERS[col], field)
+        bulk_layout.addWidget(self.bulk_field)
+        self.bulk_value = QLineEdit()
+        bulk_layout.addWidget(self.bulk_value)
+        bulk_btn = QPushButton("Aplicar a selección")
+        bulk_btn.clicked.connect(self.apply_to_selection)
+        bulk_layout.addWidget(bulk_btn)
+        bulk_layout.addWidget(QLabel("Colisiones:"))
+        self.collision_strategy = QComboBox()
+        for label, strategy in (
+            ("Añadir sufijo", "suffix"),
+            ("Omitir", "skip"),
+            ("Mejor bitrate", "keep-best"),
+        ):
+            self.collision_strategy.addItem(label, strategy)
+        bulk_layout.addWidget(self.collision_strategy)
+        main.addLayout(bulk_layout)
+
         btn_layout = QHBoxLayout()
         btn_layout.setContentsMargins(0, 0, 0, 0)
         btn_layout.setSpacing(5)
@@ -91,10 +160,33 @@ class OrganizerPanel(QWidget):
         plan_btn.setIcon(style.standardIcon(QStyle.SP_FileDialogDetailedView))
         plan_btn.clicked.connect(self.plan_files)
         btn_layout.addWidget(plan_btn)
+        open_btn = QPushButton("Abrir último plan")
+        open_btn.clicked.connect(self.open_last_plan)
+        btn_layout.addWidget(open_btn)
+        export_btn = QPushButton("Exportar CSV")
+        export_btn.clicked.connect(self.export_csv)
+        btn_layout.addWidget(export_btn)
+        import_btn = QPushButton("Importar CSV")
+        import_btn.clicked.connect(self.import_csv)
+        btn_layout.addWidget(import_btn)
+        estimate_btn = QPushButton("Estimar")
+        estimate_btn.setToolTip("Calcular copias, espacio libre y duración sin mover nada")
+        estimate_btn.clicked.connect(self.estimate_files)
+        btn_layout.addWidget(estimate_btn)
         organize_btn = QPushButton("Organizar")
         organize_btn.setIcon(style.standardIcon(QStyle.SP_DialogApplyButton))
         organize_btn.clicked.connect(self.organize_files)
         btn_layout.addWidget(organize_btn)
+        resume_btn = QPushButton("Reanudar")
+        resume_btn.setToolTip("Completar una organización interrumpida")
+        resume_btn.clicked.connect(self.resume_moves)
+        btn_layout.addWidget(resume_btn)
+        undo_btn = QPushButton("Deshacer")
+        undo_btn.setIcon(style.standardIcon(QStyle.SP_ArrowBack))
+        undo_btn.setToolTip("Devolver los archivos de la última organización a su origen")
+        undo_btn.clicked.connect(self.rollback_moves)
+        btn_layout.addWidget(undo_btn)
+        self.move_buttons = [organize_btn, resume_btn, undo_btn]
         main.addLayout(btn_layout)
 
     # -------------------------------------------------------------- actions --
@@ -102,8 +194,7 @@ class OrganizerPanel(QWidget):
         paths, _ = QFileDialog.getOpenFileNames(self, "Seleccionar archivos")
         if paths:
             self.file_paths = list(paths)
-            self.plan = []
-            self.plan_table.setRowCount(0)
+            self.plan_model.clear()
             self.log.append(f"{len(paths)} archivos seleccionados.")
 
     def select_destination(self) -> None:
@@ -121,84 +212,180 @@ class OrganizerPanel(QWidget):
             self.log.append("Seleccione una carpeta de destino.")
             return
 
-        self.plan = plan_moves(self.file_paths, self.dest_dir)
-        self.plan_table.setRowCount(len(self.plan))
-        self.plan_table.blockSignals(True)
-        for row, item in enumerate(self.plan):
-            check_item = QTableWidgetItem()
-            if item.get("status") == "ok":
-                check_item.setCheckState(Qt.Checked)
-            else:
-                check_item.setCheckState(Qt.Unchecked)
-                check_item.setFlags(check_item.flags() & ~Qt.ItemIsEnabled)
-            self.plan_table.setItem(row, 0, check_item)
-
-            origin_item = QTableWidgetItem(item.get("original_path", ""))
-            origin_item.setFlags(origin_item.flags() & ~Qt.ItemIsEditable)
-            self.plan_table.setItem(row, 1, origin_item)
+        template = self.template_edit.text().strip() or DEFAULT_DEST_TEMPLATE
+        try:
+            compile_template(template)
+        except TemplateError as exc:
+            self.log.append(f"Plantilla no válida: {exc}")
+            return
 
-            dest_item = QTableWidgetItem(item.get("proposed_path", ""))
-            dest_item.setFlags(dest_item.flags() & ~Qt.ItemIsEditable)
-            self.plan_table.setItem(row, 2, dest_item)
+        plan = plan_moves(self.file_paths, self.dest_dir, template)
+        strategy = self.collision_strategy.currentData()
+        report = resolve_collisions(plan, strategy)
+        self.plan_model.template = template
+        self.plan_model.collision_strategy = strategy
+        self.plan_model.set_plan(plan, self.dest_dir)
+        self.plan_id = self.db.create_plan(self.dest_dir, template=template)
+        self.db.save_plan_entries(self.plan_id, plan)
+        self.log.append(f"Plan generado para {len(plan)} archivos.")
+        if report.collisions:
+            self.log.append(
+                f"{report.collisions} colisiones de destino: {report.renamed} renombrados, "
+                f"{report.skipped} omitidos, {report.replaced} sustituidos."
+            )
 
-            genre_item = QTableWidgetItem(item.get("genre", ""))
-            self.plan_table.setItem(row, 3, genre_item)
+    def save_plan(self) -> None:
+        """Guarda el plan mostrado (con ediciones y casillas) en la base de datos."""
+        if self.plan_id is None:
+            self.plan_id = self.db.create_plan(
+                self.plan_model.dest_dir, template=self.plan_model.template
+            )
+        self.db.save_plan_entries(self.plan_id, self.plan_model.entries())
 
-            year_item = QTableWidgetItem(item.get("year", ""))
-            self.plan_table.setItem(row, 4, year_item)
+    def load_plan(self, plan_id: int) -> bool:
+        """Muestra un plan guardado sin volver a leer etiquetas ni consultar MusicBrainz."""
+        info = self.db.get_plan(plan_id)
+        if info is None:
+            self.log.append(f"No existe el plan {plan_id}.")
+            return False
+        self.plan_id = plan_id
+        self.dest_dir = info[2]
+        self.dest_edit.setText(self.dest_dir)
+        self.plan_model.template = info[4] or DEFAULT_DEST_TEMPLATE
+        self.template_edit.setText(self.plan_model.template)
+        self.plan_model.set_plan(self.db.iter_plan_entries(plan_id), self.dest_dir)
+        self.file_paths = [self.plan_model.row(i)["original_path"] for i in range(len(self.plan_model))]
+        self.log.append(f"Plan {plan_id} abierto ({len(self.plan_model)} archivos).")
+        return True
 
-        self.plan_table.blockSignals(False)
-        self.plan_table.resizeColumnsToContents()
-        self.log.append(f"Plan generado para {len(self.plan)} archivos.")
+    def open_last_plan(self) -> None:
+        plans = self.db.list_plans()
+        if not plans:
+            self.log.append("No hay planes guardados.")
+            return
+        self.load_plan(plans[0][0])
 
-    def organize_files(self) -> None:
-        if not self.plan:
+    def export_csv(self) -> None:
+        if not len(self.plan_model):
             self.log.append("No hay plan generado.")
             return
+        path, _ = QFileDialog.getSaveFileName(self, "Exportar plan", "plan.csv", "CSV (*.csv)")
+        if path:
+            ok, errors = export_plan_csv(self.plan_model.rows(), path)
+            self.log.append(f"Plan exportado a {path}: {ok} correctos, {errors} con errores.")
+
+    def import_csv(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "Importar plan", "", "CSV (*.csv)")
+        if not path:
+            return
+        self.plan_model.set_plan(import_plan_csv(path), self.dest_dir)
+        self.plan_model.template = self.template_edit.text().strip() or DEFAULT_DEST_TEMPLATE
+        self.plan_id = None
+        self.save_plan()
+        self.log.append(f"Plan importado de {path} ({len(self.plan_model)} archivos).")
 
-        for row, item in enumerate(self.plan):
-            check_item = self.plan_table.item(row, 0)
-            if not check_item or check_item.checkState() != Qt.Checked:
-                continue
+    def apply_to_selection(self) -> None:
+        rows = {index.row() for index in self.plan_table.selectionModel().selectedRows()}
+        if not rows:
+            self.log.append("No hay filas seleccionadas.")
+            return
+        field = self.bulk_field.currentData()
+        self.plan_model.collision_strategy = self.collision_strategy.currentData()
+        changed = self.plan_model.set_field(rows, field, self.bulk_value.text())
+        self.log.append(f"{changed} filas actualizadas.")
+
+    def _checked_moves(self, report: bool) -> List[Tuple[str, str]]:
+        moves = []
+        for row in self.plan_model.checked_rows():
+            item = self.plan_model.row(row)
             src = item.get("original_path", "")
             dest = item.get("proposed_path", "")
             if item.get("status") == "ok" and src and dest:
-                try:
-                    os.makedirs(os.path.dirname(dest), exist_ok=True)
-                    shutil.move(src, dest)
-                    self.log.append(f"Movido: {src} -> {dest}")
-                except Exception as exc:  # pragma: no cover - logging only
-                    self.log.append(f"Error al mover {src}: {exc}")
-            else:
+                moves.append((src, dest))
+            elif report:
                 reason = item.get("reason", "desconocido")
                 self.log.append(f"Error con {src}: {reason}")
+        return moves
 
-    # ------------------------------------------------------- event handlers --
-    def _plan_item_changed(self, item: QTableWidgetItem) -> None:
-        if item.column() not in (3, 4):
+    def estimate_files(self) -> None:
+        """Informa del coste de organizar las filas marcadas sin mover nada."""
+        if not len(self.plan_model):
+            self.log.append("No hay plan generado.")
             return
-        row = item.row()
-        if row >= len(self.plan):
+        from ..organizer.estimate import estimate_moves
+
+        estimate = estimate_moves(self._checked_moves(report=False), self.db)
+        eta = estimate.eta
+        self.log.append(
+            f"Estimación: {estimate.renames} renombrados, {estimate.copies} copias "
+            f"({format_bytes(estimate.copy_bytes)}), {estimate.skipped} omitidos, "
+            f"{estimate.dirs_to_create} carpetas nuevas, duración aproximada "
+            f"{format_duration(eta) if eta is not None else 'desconocida'}."
+        )
+        for device in estimate.devices.values():
+            status = "suficiente" if device.fits else "INSUFICIENTE"
+            self.log.append(
+                f"  {device.path}: copiar {format_bytes(device.copy_bytes)}, "
+                f"libres {format_bytes(device.free_bytes)} ({status})"
+            )
+
+    def organize_files(self) -> None:
+        if not len(self.plan_model):
+            self.log.append("No hay plan generado.")
             return
-        field = "genre" if item.column() == 3 else "year"
-        self.plan[row][field] = item.text()
-
-        ext = os.path.splitext(self.plan[row].get("original_path", ""))[1]
-        meta = {
-            "year": self.plan[row].get("year"),
-            "month": self.plan[row].get("month"),
-            "genre": self.plan[row].get("genre"),
-            "artist": self.plan[row].get("artist"),
-            "title": self.plan[row].get("title"),
-        }
-        dest = build_destination(self.dest_dir, meta, ext)
-        self.plan[row]["proposed_path"] = dest
-        dest_item = self.plan_table.item(row, 2)
-        if dest_item is None:
-            dest_item = QTableWidgetItem(dest)
-            dest_item.setFlags(dest_item.flags() & ~Qt.ItemIsEditable)
-            self.plan_table.setItem(row, 2, dest_item)
-        else:
-            self.plan_table.blockSignals(True)
-            dest_item.setText(dest)
-            self.plan_table.blockSignals(False)
+
+        moves = self._checked_moves(report=True)
+        # Las ediciones y casillas se guardan antes de mover nada.
+        self.save_plan()
+        if moves:
+            self._start_moves("run", moves)
+
+    def resume_moves(self) -> None:
+        self._start_moves("resume")
+
+    def rollback_moves(self) -> None:
+        self._start_moves("rollback")
+
+    def _start_moves(self, action: str, moves: Optional[List[Tuple[str, str]]] = None) -> None:
+        from ..organizer.mover import MoveExecutor, MoveJournal
+        from .move_worker import MoveSignals, MoveTask
+
+        if self._move_signals is None:
+            self._move_signals = MoveSignals(self)
+            self._move_signals.progress.connect(self._on_move_progress)
+            self._move_signals.finished.connect(self._on_moves_finished)
+            self._move_signals.failed.connect(self._on_moves_failed)
+        for btn in self.move_buttons:
+            btn.setEnabled(False)
+        executor = MoveExecutor(MoveJournal(self.journal_path), self.db)
+        self._move_pool.start(MoveTask(executor, action, self._move_signals, moves))
+
+    def wait_for_moves(self, msecs: int = -1) -> bool:
+        """Block until the current moves finish (used on shutdown and in tests)."""
+        return self._move_pool.waitForDone(msecs)
+
+    def _on_move_progress(self, results: List[MoveResult]) -> None:
+        for r in results:
+            if r.status == "moved":
+                self.log.append(f"Movido: {r.src} -> {r.dest}")
+            elif r.status == "undone":
+                self.log.append(f"Restaurado: {r.dest}")
+            else:
+                self.log.append(f"Error al mover {r.src}: {r.error}")
+
+    def _on_moves_finished(self, summary: MoveSummary) -> None:
+        self.log.append(
+            f"Movidos: {summary.moved} ({summary.renamed} renombrados, "
+            f"{summary.copied} copiados), restaurados: {summary.undone}, "
+            f"errores: {summary.failed} en {summary.elapsed:.1f} s."
+        )
+        self._end_moves()
+
+    def _on_moves_failed(self, message: str) -> None:
+        self.log.append(f"Error: {message}")
+        self._end_moves()
+
+    def _end_moves(self) -> None:
+        for btn in self.move_buttons:
+            btn.setEnabled(True)
+
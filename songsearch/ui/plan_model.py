@@ -0,0 +1,213 @@
+"""Modelo de tabla para el plan del organizador.
+
+El plan se guarda por columnas (una lista por campo más un ``bytearray`` con
+las casillas marcadas) en lugar de crear ``QTableWidgetItem`` por celda.  La
+vista solo pide los datos de las filas visibles, así que planes de cientos de
+miles de filas se muestran al instante.  Las ediciones masivas (género o año
+para varias filas) recalculan los destinos en una sola pasada, vuelven a
+resolver las colisiones de destino y emiten una única señal ``dataChanged``.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from ..config import DEFAULT_DEST_TEMPLATE
+from ..organizer.collisions import COLLISION_STATUS, CollisionIndex
+from ..organizer.destination import compile_template
+from ..organizer.plan import META_FIELDS, PLAN_FIELDS
+
+# Values of these fields repeat heavily across a plan; interning them stores
+# every distinct value once.
+_INTERNED = {"status", "reason", "artist", "album", "year", "month", "genre", "albumartist", "track", "disc"}
+
+COL_MOVE, COL_SOURCE, COL_DEST, COL_GENRE, COL_YEAR = range(5)
+HEADERS = ["Mover", "Origen", "Destino", "Género", "Año"]
+_COLUMN_FIELDS = {COL_SOURCE: "original_path", COL_DEST: "proposed_path", COL_GENRE: "genre", COL_YEAR: "year"}
+EDITABLE_FIELDS = {COL_GENRE: "genre", COL_YEAR: "year"}
+
+
+class PlanTableModel(QAbstractTableModel):
+    """Modelo del plan; solo son editables la casilla, el género y el año."""
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.dest_dir = ""
+        # Plantilla con la que se recalculan los destinos al editar
+        self.template = DEFAULT_DEST_TEMPLATE
+        # Estrategia con la que se resuelven las colisiones tras editar
+        self.collision_strategy = "suffix"
+        self._cols: Dict[str, List[str]] = {f: [] for f in PLAN_FIELDS}
+        self._checked = bytearray()
+
+    # ------------------------------------------------------------ contents --
+    def set_plan(self, plan: Iterable[Dict[str, str]], dest_dir: str) -> None:
+        """Sustituye el contenido por *plan* (diccionarios de ``plan_moves``).
+
+        Las entradas con la clave ``checked`` (planes guardados) conservan su
+        casilla; las demás se marcan si su estado es ``"ok"``.
+        """
+        self.beginResetModel()
+        self.dest_dir = dest_dir
+        cols: Dict[str, List[str]] = {f: [] for f in PLAN_FIELDS}
+        checked = bytearray()
+        appenders = [
+            (cols[f].append, f, f in _INTERNED) for f in PLAN_FIELDS
+        ]
+        for entry in plan:
+            for append, field, intern in appenders:
+                value = entry.get(field) or ""
+                append(sys.intern(value) if intern else value)
+            flag = entry.get("checked")
+            checked.append(entry.get("status") == "ok" if flag is None else bool(flag))
+        self._cols, self._checked = cols, checked
+        self.endResetModel()
+
+    def clear(self) -> None:
+        self.set_plan([], self.dest_dir)
+
+    def __len__(self) -> int:
+        return len(self._checked)
+
+    def row(self, i: int) -> Dict[str, str]:
+        """Devuelve la fila *i* como diccionario del plan."""
+        return {f: self._cols[f][i] for f in PLAN_FIELDS}
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        return (self.row(i) for i in range(len(self)))
+
+    def entries(self) -> Iterator[Dict[str, object]]:
+        """Filas con su casilla (``checked``), listas para guardarse en la base de datos."""
+        return ({**self.row(i), "checked": self.is_checked(i)} for i in range(len(self)))
+
+    def is_checked(self, i: int) -> bool:
+        return bool(self._checked[i])
+
+    def checked_rows(self) -> Iterator[int]:
+        return (i for i, flag in enumerate(self._checked) if flag)
+
+    # --------------------------------------------------------- bulk edits --
+    def set_field(self, rows: Iterable[int], field: str, value: str) -> int:
+        """Asigna *value* a *field* en *rows* y recalcula sus destinos.
+
+        Devuelve el número de filas modificadas.  Los destinos que pasan a
+        coincidir con otros se resuelven con :attr:`collision_strategy`.  Las
+        vistas reciben una sola señal ``dataChanged`` que cubre el rango
+        afectado.
+        """
+        if field not in EDITABLE_FIELDS.values():
+            raise ValueError(f"field {field!r} is not editable")
+        rows = sorted(set(rows))
+        if not rows:
+            return 0
+        column = self._cols[field]
+        value = sys.intern(value)
+        for i in rows:
+            column[i] = value
+        affected = self._recompute(rows)
+        first, last = min([rows[0], *affected]), max([rows[-1], *affected])
+        self.dataChanged.emit(self.index(first, COL_MOVE), self.index(last, COL_YEAR))
+        return len(rows)
+
+    def _recompute(self, rows: Iterable[int]) -> List[int]:
+        cols = self._cols
+        originals, proposed, status = cols["original_path"], cols["proposed_path"], cols["status"]
+        rows = [i for i in rows if status[i] == "ok"]
+        meta_cols = [(f, cols[f]) for f in META_FIELDS]
+        destinations = compile_template(self.template).render_many(
+            self.dest_dir,
+            (
+                ({f: col[i] for f, col in meta_cols}, os.path.splitext(originals[i])[1])
+                for i in rows
+            ),
+        )
+        for i, dest in zip(rows, destinations):
+            proposed[i] = dest
+        return self._resolve_collisions(rows)
+
+    def _resolve_collisions(self, rows: List[int]) -> List[int]:
+        """Resolve the collisions of the re-rendered *rows* against the plan.
+
+        The other rows were resolved already and keep their destinations: they
+        claim them first so only the edited rows get a suffix or are skipped
+        (``keep-best`` may still skip an earlier holder).  Returns the rows
+        whose destination, status or check box changed.
+        """
+        cols = self._cols
+        originals, proposed = cols["original_path"], cols["proposed_path"]
+        status, reason = cols["status"], cols["reason"]
+        edited = set(rows)
+        order = [i for i in range(len(self)) if status[i] == "ok" and i not in edited] + rows
+        entries = [
+            {"original_path": originals[i], "proposed_path": proposed[i], "status": "ok", "reason": reason[i]}
+            for i in order
+        ]
+        CollisionIndex(self.collision_strategy).resolve(entries)
+        changed = []
+        for i, entry in zip(order, entries):
+            if entry["proposed_path"] != proposed[i]:
+                proposed[i] = entry["proposed_path"]
+                changed.append(i)
+            if entry["status"] != "ok":
+                status[i] = COLLISION_STATUS
+                reason[i] = entry["reason"]
+                self._checked[i] = 0
+                changed.append(i)
+        return changed
+
+    # --------------------------------------------------------------- model --
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else len(self._checked)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        ok = self._cols["status"][index.row()] == "ok"
+        col = index.column()
+        if col == COL_MOVE:
+            return (Qt.ItemIsEnabled | Qt.ItemIsUserCheckable | Qt.ItemIsSelectable) if ok else Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if col in EDITABLE_FIELDS:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if col == COL_MOVE:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if self._checked[row] else Qt.Unchecked
+            if role == Qt.ToolTipRole and self._cols["status"][row] != "ok":
+                return self._cols["reason"][row]
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return self._cols[_COLUMN_FIELDS[col]][row]
+        return None
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
+        if not index.isValid():
+            return False
+        row, col = index.row(), index.column()
+        if col == COL_MOVE and role == Qt.CheckStateRole:
+            if self._cols["status"][row] != "ok":
+                return False
+            self._checked[row] = int(value) == Qt.Checked
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+            return True
+        if col in EDITABLE_FIELDS and role == Qt.EditRole:
+            self.set_field([row], EDITABLE_FIELDS[col], str(value))
+            return True
+        return False
@@ -0,0 +1,111 @@
+"""Item model holding search results for :class:`~songsearch.ui.search_panel.SearchPanel`.
+
+Results are stored in parallel Python lists (one entry per row) rather than
+as one ``QListWidgetItem`` per match.  Rows are exposed to the view lazily in
+batches through :meth:`SearchResultsModel.fetchMore`, so appending tens of
+thousands of results only costs a few list extensions and the view only ever
+lays out what it displays.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple, Union
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+
+# Roles shared with the previous QListWidget implementation.
+StatusRole = Qt.UserRole
+IdRole = Qt.UserRole + 1
+PathRole = Qt.UserRole + 2
+
+_COLORS = {FOUND: QColor("green"), NOT_FOUND: QColor("red")}
+
+Identifier = Union[int, str, None]
+ResultRow = Tuple[str, str, Optional[str], Identifier]
+
+
+class SearchResultsModel(QAbstractListModel):
+    """List model of ``(name, status, path, identifier)`` search results."""
+
+    FETCH_BATCH = 256
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._names: List[str] = []
+        self._status: List[str] = []
+        self._paths: List[Optional[str]] = []
+        self._ids: List[Identifier] = []
+        self._loaded = 0  # rows currently exposed to views
+
+    # --------------------------------------------------------------- model --
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self._loaded < len(self._names)
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if parent.isValid():
+            return
+        count = min(self.FETCH_BATCH, len(self._names) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < self._loaded:
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return self._names[row]
+        if role == StatusRole:
+            return self._status[row]
+        if role == PathRole:
+            return self._paths[row]
+        if role == IdRole:
+            return self._ids[row]
+        if role == Qt.ForegroundRole:
+            return _COLORS.get(self._status[row])
+        if role == Qt.ToolTipRole:
+            return (self._paths[row] or "") if self._status[row] == FOUND else "No encontrado."
+        return None
+
+    # ------------------------------------------------------------ mutation --
+    def __len__(self) -> int:
+        """Total number of results, including rows not fetched by a view yet."""
+        return len(self._names)
+
+    def extend(self, rows: Iterable[ResultRow]) -> None:
+        """Append results; only the first batch is exposed to views immediately."""
+        for name, status, path, identifier in rows:
+            self._names.append(name)
+            self._status.append(status)
+            self._paths.append(path)
+            self._ids.append(identifier)
+        if self._loaded < self.FETCH_BATCH:
+            self.fetchMore(QModelIndex())
+
+    def append(
+        self, name: str, status: str, path: Optional[str] = None, identifier: Identifier = None
+    ) -> None:
+        self.extend([(name, status, path, identifier)])
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._names, self._status, self._paths, self._ids = [], [], [], []
+        self._loaded = 0
+        self.endResetModel()
+
+    def mark_found(self, row: int, path: str) -> None:
+        """Mark *row* as found at *path* (after the user assigned a file)."""
+        self._status[row] = FOUND
+        self._paths[row] = path
+        if row < self._loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
@@ -14,13 +14,9 @@ configuration will automatically appear in the UI.
 from __future__ import annotations
 
 import os
-from datetime import datetime
+from typing import TYPE_CHECKING
 
-from mutagen import File
-
-from PyQt5.QtCore import Qt, QUrl
-from PyQt5.QtGui import QColor
-from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer
+from PyQt5.QtCore import QCoreApplication, QModelIndex, QThreadPool, QTimer, Qt, QUrl
 from PyQt5.QtWidgets import (
     QButtonGroup,
     QCheckBox,
@@ -29,8 +25,8 @@ from PyQt5.QtWidgets import (
     QGroupBox,
     QHBoxLayout,
     QLabel,
-    QListWidget,
-    QListWidgetItem,
+    QListView,
+    QProgressBar,
     QPushButton,
     QRadioButton,
     QStyle,
@@ -44,8 +40,23 @@ from PyQt5.QtWidgets import (
 
 from ..config import DEFAULT_FUZZY_THRESHOLD, FILE_EXTS
 from ..db import DatabaseManager
-from ..logger import logger
-from ..search import fuzzy_search
+from ..search.index import SearchIndex
+from .formatting import format_duration
+from .results_model import FOUND, NOT_FOUND, IdRole, PathRole, SearchResultsModel, StatusRole
+from .search_worker import CancelToken, SearchSignals, SearchTask
+
+if TYPE_CHECKING:  # pragma: no cover
+    from PyQt5.QtMultimedia import QMediaPlayer
+
+    from ..indexer import ScanControl, ScanProgress
+    from ..watcher import LibraryWatcher
+    from .index_worker import IndexSignals, WatchSignals
+
+# Search-as-you-type waits this long after the last keystroke before querying;
+# together with the indexed lookup this keeps results within ~100 ms.
+LIVE_SEARCH_DELAY_MS = 50
+# Shorter inputs match most of the library and are only searched on demand.
+LIVE_SEARCH_MIN_CHARS = 3
 
 
 class SearchPanel(QWidget):
@@ -53,12 +64,60 @@ class SearchPanel(QWidget):
 
     def __init__(self, parent: QWidget | None = None) -> None:
         super().__init__(parent)
-        self.db = DatabaseManager()
+        # The database, the media player and the indexing machinery (which
+        # pulls in mutagen) are created on first use so the panel opens fast.
+        self._db: DatabaseManager | None = None
+        # Mapping the index is cheap; it is brought up to date lazily before
+        # the first search so startup cost does not grow with the library.
+        self.index = SearchIndex()
         self.selected_folder: str | None = None
-        self.player = QMediaPlayer()
+        self.player: QMediaPlayer | None = None
+        # Searches run on a single background thread; the pool is created
+        # before the signals object so that on teardown it waits for the
+        # running task while the signals are still alive.
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = SearchSignals(self)
+        self._signals.partial.connect(self._on_search_partial)
+        self._signals.finished.connect(self._on_search_finished)
+        self._signals.failed.connect(self._on_search_failed)
+        self._request_id = 0
+        self._token: CancelToken | None = None
+        self._live_request = False
+        self._clear_pending = False
+        self._live_timer = QTimer(self)
+        self._live_timer.setSingleShot(True)
+        self._live_timer.setInterval(LIVE_SEARCH_DELAY_MS)
+        self._live_timer.timeout.connect(lambda: self._perform_search(live=True))
+        # Library scans get their own thread so searches are never queued
+        # behind them.
+        self._index_pool = QThreadPool(self)
+        self._index_pool.setMaxThreadCount(1)
+        self._index_signals: IndexSignals | None = None
+        self._scan: ScanControl | None = None
+        # Keeps the selected folder in sync once enabled (see _toggle_watch).
+        self._watcher: LibraryWatcher | None = None
+        self._watch_signals: WatchSignals | None = None
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self._cancel_index)
+            app.aboutToQuit.connect(self._stop_watch)
         self._build_ui()
-        self.player.positionChanged.connect(self._update_position)
-        self.player.durationChanged.connect(self._update_duration)
+
+    @property
+    def db(self) -> DatabaseManager:
+        if self._db is None:
+            self._db = DatabaseManager()
+        return self._db
+
+    def _ensure_player(self) -> QMediaPlayer:
+        if self.player is None:
+            from PyQt5.QtMultimedia import QMediaPlayer
+
+            self.player = QMediaPlayer(self)
+            self.player.positionChanged.connect(self._update_position)
+            self.player.durationChanged.connect(self._update_duration)
+        return self.player
 
     # ------------------------------------------------------------------ UI --
     def _build_ui(self) -> None:
@@ -87,7 +146,10 @@ class SearchPanel(QWidget):
         main.addLayout(search_layout)
 
         splitter = QSplitter(Qt.Vertical)
-        self.results = QListWidget()
+        self.results_model = SearchResultsModel(self)
+        self.results = QListView()
+        self.results.setUniformItemSizes(True)
+        self.results.setModel(self.results_model)
         splitter.addWidget(self.results)
 
         controls_widget = QWidget()
@@ -146,10 +208,38 @@ class SearchPanel(QWidget):
         file_formats_group.setLayout(ft)
         params.addWidget(file_formats_group, 2, 0, 1, 2)
 
+        self.live_checkbox = QCheckBox("Buscar mientras escribe")
+        self.live_checkbox.setChecked(True)
+        params.addWidget(self.live_checkbox, 3, 0, 1, 2)
+
+        self.watch_checkbox = QCheckBox("Mantener la carpeta actualizada")
+        self.watch_checkbox.setToolTip(
+            "Añade, actualiza y elimina canciones automáticamente cuando cambian los archivos"
+        )
+        params.addWidget(self.watch_checkbox, 4, 0, 1, 2)
+
         params_group = QGroupBox("Parámetros de búsqueda")
         params_group.setLayout(params)
         main.addWidget(params_group)
 
+        # indexing progress, only shown while a scan is running
+        self.index_box = QWidget()
+        index_layout = QHBoxLayout(self.index_box)
+        index_layout.setContentsMargins(0, 0, 0, 0)
+        self.index_progress = QProgressBar()
+        self.index_progress.setTextVisible(True)
+        index_layout.addWidget(self.index_progress)
+        self.index_status = QLabel()
+        index_layout.addWidget(self.index_status)
+        self.index_pause_button = QPushButton("Pausar")
+        self.index_pause_button.setIcon(style.standardIcon(QStyle.SP_MediaPause))
+        index_layout.addWidget(self.index_pause_button)
+        self.index_cancel_button = QPushButton("Cancelar")
+        self.index_cancel_button.setIcon(style.standardIcon(QStyle.SP_DialogCancelButton))
+        index_layout.addWidget(self.index_cancel_button)
+        self.index_box.setVisible(False)
+        main.addWidget(self.index_box)
+
         # simple log
         self.log = QTextEdit()
         self.log.setReadOnly(True)
@@ -158,12 +248,18 @@ class SearchPanel(QWidget):
 
         # connections
         self.folder_button.clicked.connect(self._select_folder)
-        self.search_button.clicked.connect(self._perform_search)
+        self.search_button.clicked.connect(lambda: self._perform_search())
+        self.input_text.textChanged.connect(self._schedule_live_search)
+        self.artist_radio.toggled.connect(self._schedule_live_search)
+        self.quality_slider.valueChanged.connect(self._schedule_live_search)
         self.update_button.clicked.connect(self._update_database)
+        self.index_pause_button.clicked.connect(self._toggle_index_pause)
+        self.index_cancel_button.clicked.connect(self._cancel_index)
+        self.watch_checkbox.toggled.connect(self._toggle_watch)
         self.clear_button.clicked.connect(self._clear)
-        self.results.itemDoubleClicked.connect(self._handle_double_click)
+        self.results.doubleClicked.connect(self._handle_double_click)
         self.play_pause_button.clicked.connect(self._toggle_play_pause)
-        self.progress_bar.sliderMoved.connect(self.player.setPosition)
+        self.progress_bar.sliderMoved.connect(self._seek)
 
     # ------------------------------------------------------------ interaction --
     def _select_folder(self) -> None:
@@ -178,93 +274,200 @@ class SearchPanel(QWidget):
             if not self.selected_folder:
                 self.log.append("No se seleccionó ninguna carpeta.")
                 return
+        if self._scan is not None:
+            self.log.append("Ya hay una actualización en curso.")
+            return
+        from ..indexer import ScanControl
+        from .index_worker import IndexSignals, IndexTask
+
+        if self._index_signals is None:
+            self._index_signals = IndexSignals(self)
+            self._index_signals.progress.connect(self._on_index_progress)
+            self._index_signals.finished.connect(self._on_index_finished)
+            self._index_signals.failed.connect(self._on_index_failed)
+        exts = [ext for ext, cb in self.file_type_checkboxes.items() if cb.isChecked()]
         self.log.append("Actualizando la base de datos...")
-        count = 0
-        for root, _, files in os.walk(self.selected_folder):
-            for f in files:
-                name, ext = os.path.splitext(f)
-                ext = ext.lower()
-                if (
-                    ext in FILE_EXTS
-                    and self.file_type_checkboxes.get(ext, None)
-                    and self.file_type_checkboxes[ext].isChecked()
-                ):
-                    p = os.path.join(root, f)
-                    try:
-                        audio = File(p, easy=True)
-                        tags = audio.tags if audio else {}
-                        artist = tags.get("artist", [None])[0] if tags else None
-                        title = tags.get("title", [None])[0] if tags else None
-                        album = tags.get("album", [None])[0] if tags else None
-                        date = tags.get("date", [None])[0] if tags else None
-                        year = month = None
-                        if date:
-                            if len(date) >= 4:
-                                year = date[:4]
-                            if len(date) >= 7:
-                                month = date[5:7]
-                        genre = tags.get("genre", [None])[0] if tags else None
-                        duration = (
-                            int(audio.info.length)
-                            if audio is not None and getattr(audio, "info", None)
-                            else None
-                        )
-                        size = os.path.getsize(p)
-                        mdate = datetime.fromtimestamp(os.path.getmtime(p)).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                        self.db.add_song(
-                            name=name,
-                            artist=artist,
-                            title=title,
-                            album=album,
-                            year=year,
-                            month=month,
-                            genre=genre,
-                            path=p,
-                            duration=duration,
-                            file_format=ext,
-                            size=size,
-                            modified_date=mdate,
-                            original_path=p,
-                        )
-                        count += 1
-                    except Exception as e:  # pragma: no cover - logging only
-                        logger.error(f"Index error: {p} -> {e}")
-        self.log.append(f"Base de datos actualizada con {count} archivos.")
+        self._scan = ScanControl()
+        self.index_progress.setRange(0, 0)  # busy until the files are listed
+        self.index_status.setText("Buscando archivos...")
+        self.index_pause_button.setText("Pausar")
+        self.index_box.setVisible(True)
+        self.update_button.setEnabled(False)
+        self._index_pool.start(
+            IndexTask(
+                self.db,
+                self.selected_folder,
+                exts,
+                self.index,
+                self._index_signals,
+                self._scan,
+            )
+        )
+
+    def _toggle_index_pause(self) -> None:
+        if self._scan is None:
+            return
+        if self._scan.paused:
+            self._scan.resume()
+            self.index_pause_button.setText("Pausar")
+            self.index_pause_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+        else:
+            self._scan.pause()
+            self.index_pause_button.setText("Reanudar")
+            self.index_pause_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+
+    def _cancel_index(self) -> None:
+        if self._scan is not None:
+            self._scan.cancel()
+
+    def _on_index_progress(self, progress: ScanProgress) -> None:
+        self.index_progress.setRange(0, max(progress.files_total, 1))
+        self.index_progress.setValue(progress.files_done)
+        eta = progress.eta
+        self.index_status.setText(
+            f"{progress.files_done}/{progress.files_total} archivos · "
+            f"{progress.files_per_sec:.0f} arch/s · "
+            f"{progress.bytes_per_sec / 1_000_000:.1f} MB/s · "
+            f"restante {format_duration(eta) if eta is not None else '--:--'}"
+        )
+
+    def _end_index(self) -> None:
+        self._scan = None
+        self.index_box.setVisible(False)
+        self.update_button.setEnabled(True)
+
+    def _on_index_finished(self, count: int, cancelled: bool) -> None:
+        self._end_index()
+        if cancelled:
+            self.log.append(f"Actualización cancelada ({count} archivos añadidos).")
+        else:
+            self.log.append(f"Base de datos actualizada con {count} archivos.")
+
+    def _on_index_failed(self, message: str) -> None:
+        self._end_index()
+        self.log.append(f"Error al actualizar la base de datos: {message}")
+
+    def _toggle_watch(self, enabled: bool) -> None:
+        if not enabled:
+            self._stop_watch()
+            return
+        if not self.selected_folder:
+            self._select_folder()
+            if not self.selected_folder:
+                self.log.append("No se seleccionó ninguna carpeta.")
+                self.watch_checkbox.setChecked(False)
+                return
+        from ..watcher import LibraryWatcher
+        from .index_worker import WatchSignals
+
+        if self._watch_signals is None:
+            self._watch_signals = WatchSignals(self)
+            self._watch_signals.batch.connect(self._on_watch_batch)
+        exts = [ext for ext, cb in self.file_type_checkboxes.items() if cb.isChecked()]
+        self._watcher = LibraryWatcher(
+            self.db, [self.selected_folder], exts, on_batch=self._watch_signals.batch.emit
+        )
+        self._watcher.start()
+        self.log.append(f"Vigilando cambios en {self.selected_folder}")
+
+    def _stop_watch(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+            self.log.append("Vigilancia de la carpeta detenida.")
+
+    def _on_watch_batch(self, upserted: int, deleted: int) -> None:
+        self.log.append(
+            f"Carpeta sincronizada: {upserted} canciones actualizadas, {deleted} eliminadas."
+        )
 
     def _clear(self) -> None:
+        self._cancel_search()
         self.input_text.clear()
-        self.results.clear()
+        self.results_model.clear()
         self.log.clear()
 
-    def _perform_search(self) -> None:
-        rows = [s.strip() for s in self.input_text.toPlainText().splitlines() if s.strip()]
+    def _schedule_live_search(self, *_args) -> None:
+        """Restart the debounce timer after an edit to the query or parameters."""
+        if self.live_checkbox.isChecked():
+            self._live_timer.start()
+
+    def _cancel_search(self) -> None:
+        self._live_timer.stop()
+        # Results still queued from the running search no longer match.
+        self._request_id += 1
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+        # Drop tasks that have not started yet; a running one stops at its
+        # next query line.
+        self._pool.clear()
+
+    def _perform_search(self, live: bool = False) -> None:
+        self._cancel_search()
+        text = self.input_text.toPlainText()
+        rows = [s.strip() for s in text.splitlines() if s.strip()]
+        if live and len(text.strip()) < LIVE_SEARCH_MIN_CHARS:
+            rows = []
         if not rows:
-            self.log.append("Introduce canciones o artistas.")
+            if live:
+                self.results_model.clear()
+            else:
+                self.log.append("Introduce canciones o artistas.")
             return
         mode = "artist" if self.artist_radio.isChecked() else "song"
         thr = self.quality_slider.value()
-        self.results.clear()
-        found_any = False
-        for q in rows:
-            matches = fuzzy_search(self.db, q.lower(), mode, thr)
-            if matches:
-                for m in matches:
-                    self._add_result(
-                        m["title"] or m["name"] or q,
-                        "found",
-                        m["path"],
-                        m["id"],
-                    )
-                found_any = True
-            else:
-                self._add_result(q, "not_found", identifier=q)
+
+        self._token = CancelToken()
+        self._live_request = live
+        # Keep the previous results on screen until the first new ones arrive.
+        self._clear_pending = True
+        self._pool.start(
+            SearchTask(
+                self._request_id,
+                rows,
+                mode,
+                thr,
+                self.db,
+                self.index,
+                self._signals,
+                self._token,
+            )
+        )
+
+    def _take_clear(self) -> None:
+        if self._clear_pending:
+            self.results_model.clear()
+            self._clear_pending = False
+
+    def _on_search_partial(self, request_id: int, query: str, matches: list) -> None:
+        if request_id != self._request_id:
+            return  # superseded by a newer search
+        self._take_clear()
+        if matches:
+            self.results_model.extend(
+                (m["title"] or m["name"] or query, FOUND, m["path"], m["id"]) for m in matches
+            )
+        else:
+            self._add_result(query, NOT_FOUND, identifier=query)
+
+    def _on_search_finished(self, request_id: int, found_any: bool) -> None:
+        if request_id != self._request_id:
+            return
+        self._take_clear()
+        self._token = None
+        if self._live_request:
+            return
         if found_any:
             self.log.append("Búsqueda completada (coincidencias encontradas).")
         else:
             self.log.append("Sin coincidencias.")
 
+    def _on_search_failed(self, request_id: int, message: str) -> None:
+        if request_id == self._request_id:
+            self._token = None
+            self.log.append(f"Error en la búsqueda: {message}")
+
     def _add_result(
         self,
         name: str,
@@ -272,48 +475,42 @@ class SearchPanel(QWidget):
         path: str | None = None,
         identifier: int | str | None = None,
     ) -> None:
-        item = QListWidgetItem(name)
-        item.setData(Qt.UserRole, status)
-        if identifier is not None:
-            item.setData(Qt.UserRole + 1, identifier)
-        if status == "found":
-            item.setForeground(QColor("green"))
-            item.setToolTip(path or "")
-        else:
-            item.setForeground(QColor("red"))
-            item.setToolTip("No encontrado.")
-        self.results.addItem(item)
-
-    def _handle_double_click(self, item: QListWidgetItem) -> None:
-        status = item.data(Qt.UserRole)
-        if status == "found":
-            self._play(item.toolTip())
-        elif status == "not_found":
-            self._assign_location(item)
-
-    def _assign_location(self, item: QListWidgetItem) -> None:
+        self.results_model.append(name, status, path, identifier)
+
+    def _handle_double_click(self, index: QModelIndex) -> None:
+        status = index.data(StatusRole)
+        if status == FOUND:
+            self._play(index.data(PathRole))
+        elif status == NOT_FOUND:
+            self._assign_location(index)
+
+    def _assign_location(self, index: QModelIndex) -> None:
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Asignar archivo", self.selected_folder or ""
         )
         if file_path:
-            item.setForeground(QColor("green"))
-            item.setToolTip(file_path)
-            item.setData(Qt.UserRole, "found")
-            self.log.append(f"Ubicación asignada a '{item.text()}'.")
-            identifier = item.data(Qt.UserRole + 1) or item.text()
+            name = index.data(Qt.DisplayRole)
+            self.results_model.mark_found(index.row(), file_path)
+            self.log.append(f"Ubicación asignada a '{name}'.")
+            identifier = index.data(IdRole) or name
             self.db.update_song_location(identifier, file_path)
 
     def _play(self, path: str) -> None:
         if not path or not os.path.exists(path):
             self.log.append("Archivo no disponible.")
             return
-        self.player.setMedia(QMediaContent(QUrl.fromLocalFile(os.path.normpath(path))))
-        self.player.play()
+        from PyQt5.QtMultimedia import QMediaContent
+
+        player = self._ensure_player()
+        player.setMedia(QMediaContent(QUrl.fromLocalFile(os.path.normpath(path))))
+        player.play()
         self.play_pause_button.setEnabled(True)
         self.log.append(f"Reproduciendo: {path}")
 
     def _toggle_play_pause(self) -> None:
-        if self.player.state() == QMediaPlayer.PlayingState:
+        if self.player is None:
+            return
+        if self.player.state() == type(self.player).PlayingState:
             self.player.pause()
             self.play_pause_button.setText("Play")
             self.play_pause_button.setIcon(
@@ -326,6 +523,10 @@ class SearchPanel(QWidget):
                 self.style().standardIcon(QStyle.SP_MediaPause)
             )
 
+    def _seek(self, position: int) -> None:
+        if self.player is not None:
+            self.player.setPosition(position)
+
     def _update_position(self, pos: int | None = None) -> None:  # pragma: no cover
         # The ``pos`` parameter is part of the Qt signal but the method uses the
         # current player position for clarity.
@@ -334,4 +535,3 @@ class SearchPanel(QWidget):
     def _update_duration(self, duration: int) -> None:  # pragma: no cover
         self.progress_bar.setRange(0, duration)
         self.progress_bar.setEnabled(True)
-
@@ -0,0 +1,99 @@
+"""Background execution of searches for :class:`~songsearch.ui.search_panel.SearchPanel`.
+
+Searches run on a :class:`QThreadPool` so the event loop keeps painting and
+reacting to input while a long, multi-line query is matched.  Each search is
+tagged with a request id and carries a :class:`CancelToken`; starting a new
+search cancels the previous one, which stops at the next query line and never
+reports its (outdated) results.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import List, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from ..db import DatabaseManager
+from ..logger import logger
+from ..profiling import profile
+from ..search import fuzzy_search
+from ..search.index import SearchIndex
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared between the UI and a task."""
+
+    __slots__ = ("_event",)
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class SearchSignals(QObject):
+    """Signals emitted by :class:`SearchTask` (delivered on the UI thread)."""
+
+    # request id, query line, list of fuzzy_search result dicts
+    partial = pyqtSignal(int, str, list)
+    # request id, whether any line produced a match
+    finished = pyqtSignal(int, bool)
+    # request id, error message
+    failed = pyqtSignal(int, str)
+
+
+class SearchTask(QRunnable):
+    """Run :func:`fuzzy_search` for each query line off the UI thread."""
+
+    def __init__(
+        self,
+        request_id: int,
+        queries: List[str],
+        mode: str,
+        threshold: int,
+        db: DatabaseManager,
+        index: Optional[SearchIndex],
+        signals: SearchSignals,
+        token: CancelToken,
+    ) -> None:
+        super().__init__()
+        self.request_id = request_id
+        self.queries = queries
+        self.mode = mode
+        self.threshold = threshold
+        self.db = db
+        self.index = index
+        self.signals = signals
+        self.token = token
+
+    def run(self) -> None:
+        if self.token.cancelled:
+            return
+        with profile("search"):
+            self._run()
+
+    def _run(self) -> None:
+        try:
+            if self.index is not None:
+                self.index.refresh(self.db)
+            found_any = False
+            for q in self.queries:
+                if self.token.cancelled:
+                    return
+                matches = fuzzy_search(
+                    self.db, q.lower(), self.mode, self.threshold, index=self.index
+                )
+                if self.token.cancelled:
+                    return
+                found_any = found_any or bool(matches)
+                self.signals.partial.emit(self.request_id, q, matches)
+            self.signals.finished.emit(self.request_id, found_any)
+        except Exception as exc:  # pragma: no cover - logging only
+            logger.exception("Search failed")
+            self.signals.failed.emit(self.request_id, str(exc))
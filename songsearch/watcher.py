@@ -0,0 +1,450 @@
+"""Keep the ``songs`` table in sync with folders as they change.
+
+:class:`LibraryWatcher` follows one or more library roots and turns file
+system changes into batched upserts and deletes.  Events are coalesced per
+path (a file written three times and then deleted is one delete) and applied
+once the tree has been quiet for :attr:`~LibraryWatcher.debounce` seconds, or
+at the latest after :attr:`~LibraryWatcher.max_delay` seconds during a
+continuous stream of changes.
+
+Two backends are available:
+
+``inotify``  Linux only, through :mod:`ctypes` (no extra dependency).  One
+             watch per directory; the thread sleeps in :func:`select.select`
+             until the kernel reports an event, so an idle watcher costs no
+             CPU.  Files are picked up when they are closed after writing or
+             moved in, which also catches tag edits made in place.
+``poll``     Everywhere else, or when the inotify watch limit is reached.
+             Every :attr:`~LibraryWatcher.poll_interval` seconds the mtime of
+             each known directory is checked (one ``stat`` per directory, no
+             listing); only directories whose mtime changed are listed and
+             compared with the paths stored in the database.  Files rewritten
+             in place do not change their directory's mtime and are only
+             picked up by the next full scan, which re-reads stored files
+             whose size or modification time changed.
+
+Neither backend keeps per-file state in memory: the inotify backend holds one
+entry per directory and the polling backend one mtime per directory.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .config import FILE_EXTS
+from .db import DatabaseManager
+from .identity import find_renames
+from .indexer import song_record
+from .logger import logger
+from .walker import walk_audio_files
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_MAX_DELAY = 10.0
+DEFAULT_POLL_INTERVAL = 30.0
+BACKENDS = ("auto", "inotify", "poll")
+
+# Called after each applied batch with (paths upserted, paths deleted).
+BatchCallback = Callable[[int, int], None]
+
+
+class _Changes:
+    """Coalesced pending changes."""
+
+    def __init__(self) -> None:
+        self.files: Dict[str, bool] = {}  # path -> exists (upsert) / gone (delete)
+        self.dirs_added: Set[str] = set()
+        self.dirs_removed: Set[str] = set()
+        self.first = 0.0  # monotonic time of the oldest pending change
+        self.last = 0.0  # monotonic time of the newest pending change
+
+    def __bool__(self) -> bool:
+        return bool(self.files or self.dirs_added or self.dirs_removed)
+
+    def _touch(self) -> None:
+        now = time.monotonic()
+        if not self:
+            self.first = now
+        self.last = now
+
+    def file(self, path: str, exists: bool) -> None:
+        self._touch()
+        self.files[path] = exists
+
+    def dir_added(self, path: str) -> None:
+        self._touch()
+        self.dirs_removed.discard(path)
+        self.dirs_added.add(path)
+
+    def dir_removed(self, path: str) -> None:
+        self._touch()
+        self.dirs_added.discard(path)
+        self.dirs_removed.add(path)
+
+    def update(self, newer: "_Changes") -> None:
+        """Apply the changes of *newer*, which happened after these, on top."""
+        self.files.update(newer.files)
+        for path in newer.dirs_removed:
+            self.dirs_added.discard(path)
+            self.dirs_removed.add(path)
+        for path in newer.dirs_added:
+            self.dirs_removed.discard(path)
+            self.dirs_added.add(path)
+
+
+class LibraryWatcher:
+    """Watch *roots* and apply changes to *db* in debounced batches."""
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        roots: Iterable[str],
+        exts: Iterable[str] = FILE_EXTS,
+        backend: str = "auto",
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        batch_size: int = 500,
+        on_batch: Optional[BatchCallback] = None,
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+        self.db = db
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.exts = {e.lower() for e in exts}
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.on_batch = on_batch
+        self.backend = backend
+        self._changes = _Changes()
+        self._stop = threading.Event()
+        # Set once every directory is being watched.
+        self.ready = threading.Event()
+        # Self-pipe that wakes run() from select(); owned by run().
+        self._wake_lock = threading.Lock()
+        self._wake_r: Optional[int] = None
+        self._wake_w: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+        self._dir_mtimes: Dict[str, int] = {}
+        self._next_poll = 0.0
+        if backend in ("auto", "inotify"):
+            try:
+                self._inotify = _Inotify()
+            except OSError as exc:
+                if backend == "inotify":
+                    raise
+                logger.info(f"inotify unavailable ({exc}); polling directories instead")
+        self.backend = "inotify" if self._inotify is not None else "poll"
+
+    # ------------------------------------------------------------------ API --
+    def start(self) -> None:
+        """Watch on a daemon thread until :meth:`stop` is called."""
+        self._thread = threading.Thread(target=self.run, name="library-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop watching; pending changes are applied before returning."""
+        self._stop.set()
+        with self._wake_lock:
+            if self._wake_w is not None:
+                os.write(self._wake_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self) -> None:
+        """Watch until :meth:`stop`; blocks the calling thread."""
+        with self._wake_lock:
+            self._wake_r, self._wake_w = os.pipe()
+        try:
+            self._setup()
+            self.ready.set()
+            while not self._stop.is_set():
+                self._wait(self._timeout())
+                if self._due():
+                    self._apply()
+            self._apply()
+        except Exception:
+            logger.exception("Library watcher stopped by an error")
+            raise
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+            with self._wake_lock:
+                os.close(self._wake_r)
+                os.close(self._wake_w)
+                self._wake_r = self._wake_w = None
+
+    def _apply(self) -> None:
+        """:meth:`flush`, keeping the changes for another try if it fails.
+
+        A failed batch (the database locked by a scan, say) is retried once
+        the tree has been quiet for :attr:`debounce` seconds again.
+        """
+        pending = self._changes
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Library watcher: applying changes failed; will retry")
+            pending.update(self._changes)
+            pending.first = pending.last = time.monotonic()
+            self._changes = pending
+
+    def flush(self) -> None:
+        """Apply the pending changes now."""
+        changes, self._changes = self._changes, _Changes()
+        if not changes:
+            return
+        for directory in changes.dirs_added:
+            for path in self._audio_files(directory):
+                changes.files[path] = True
+        present = [p for p, exists in changes.files.items() if exists]
+        gone = [p for p, exists in changes.files.items() if not exists]
+        # Renames first: a moved file arrives as a delete and a create, and
+        # re-pointing the old row keeps its enrichment.
+        known = self.db.existing_paths(present)
+        moves, hashes = find_renames(self.db, [p for p in present if p not in known])
+        upserted = self.db.relocate_songs(moves)
+        moved = {new for _, new in moves}
+        deleted = 0
+        for directory in changes.dirs_removed:
+            deleted += self.db.delete_songs_under(directory)
+        deleted += self.db.delete_songs(gone)
+        present = [p for p in present if p not in moved]
+        for first in range(0, len(present), self.batch_size):
+            records = []
+            for path in present[first : first + self.batch_size]:
+                try:
+                    records.append(song_record(path, hashes.get(path)))
+                except FileNotFoundError:
+                    deleted += self.db.delete_songs([path])
+                except Exception as exc:
+                    logger.error(f"Watch index error: {path} -> {exc}")
+            self.db.upsert_songs(records)
+            upserted += len(records)
+        logger.info(f"Library watcher: {upserted} songs updated, {deleted} removed")
+        if self.on_batch is not None:
+            self.on_batch(upserted, deleted)
+
+    # ------------------------------------------------------------ internals --
+    def _is_audio(self, name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in self.exts
+
+    def _audio_files(self, directory: str) -> Iterable[str]:
+        return (f.path for f in walk_audio_files(directory, self.exts))
+
+    def _setup(self) -> None:
+        for root in self.roots:
+            self._track_tree(root)
+        self._next_poll = time.monotonic() + self.poll_interval
+        count = len(self._inotify.paths) if self._inotify is not None else len(self._dir_mtimes)
+        logger.info(f"Watching {count} folders with {self.backend}")
+
+    def _track_tree(self, top: str) -> None:
+        for dirpath, _, _ in os.walk(top):
+            if not self._track_dir(dirpath):
+                # Switched to polling: the roots are walked again for mtimes.
+                for root in self.roots:
+                    for d, _, _ in os.walk(root):
+                        self._track_dir(d)
+                return
+
+    def _track_dir(self, path: str) -> bool:
+        """Start following *path*; False if inotify ran out of watches."""
+        if self._inotify is not None:
+            try:
+                self._inotify.add(path)
+                return True
+            except OSError as exc:
+                if exc.errno != errno.ENOSPC:
+                    logger.warning(f"Cannot watch {path}: {exc}")
+                    return True
+                logger.warning("inotify watch limit reached; polling directories instead")
+                self._inotify.close()
+                self._inotify = None
+                self.backend = "poll"
+                return False
+        try:
+            self._dir_mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+        return True
+
+    def _timeout(self) -> Optional[float]:
+        now = time.monotonic()
+        deadlines = []
+        if self._changes:
+            changes = self._changes
+            deadlines.append(min(changes.last + self.debounce, changes.first + self.max_delay))
+        if self._inotify is None:
+            deadlines.append(self._next_poll)
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    def _due(self) -> bool:
+        changes = self._changes
+        if not changes:
+            return False
+        now = time.monotonic()
+        return now - changes.last >= self.debounce or now - changes.first >= self.max_delay
+
+    def _wait(self, timeout: Optional[float]) -> None:
+        fds = [self._wake_r]
+        if self._inotify is not None:
+            fds.append(self._inotify.fd)
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self._wake_r in ready:
+            os.read(self._wake_r, 512)
+        if self._inotify is not None:
+            if self._inotify.fd in ready:
+                self._read_events()
+        elif time.monotonic() >= self._next_poll:
+            self._poll()
+            self._next_poll = time.monotonic() + self.poll_interval
+
+    def _read_events(self) -> None:
+        changes = self._changes
+        for path, mask in self._inotify.read():
+            if mask & _IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflow; rescanning the library")
+                for root in self.roots:
+                    changes.dir_added(root)
+                continue
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._track_tree(path)
+                    changes.dir_added(path)
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    if self._inotify is not None:
+                        self._inotify.forget(path)
+                    changes.dir_removed(path)
+            elif self._is_audio(path):
+                if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    changes.file(path, True)
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    changes.file(path, False)
+
+    def _poll(self) -> None:
+        changes = self._changes
+        for directory, mtime in list(self._dir_mtimes.items()):
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                # Removed: forget it and everything below it.
+                prefix = os.path.join(directory, "")
+                for d in [d for d in self._dir_mtimes if d == directory or d.startswith(prefix)]:
+                    del self._dir_mtimes[d]
+                changes.dir_removed(directory)
+                continue
+            if current == mtime:
+                continue
+            self._dir_mtimes[directory] = current
+            known = set(self.db.song_paths_in_dir(directory))
+            present = set()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in self._dir_mtimes:
+                                self._track_tree(entry.path)
+                                changes.dir_added(entry.path)
+                        elif self._is_audio(entry.name):
+                            present.add(entry.path)
+            except OSError as exc:
+                logger.warning(f"Cannot list {directory}: {exc}")
+                continue
+            for path in present - known:
+                changes.file(path, True)
+            for path in known - present:
+                changes.file(path, False)
+
+
+# --------------------------------------------------------------- inotify --
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal ctypes binding of the Linux inotify API."""
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+        self.paths: Dict[int, str] = {}
+        self._wds: Dict[str, int] = {}
+
+    def add(self, path: str) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.paths[wd] = path
+        self._wds[path] = wd
+
+    def forget(self, path: str) -> None:
+        """Drop the watches of *path* and the directories below it."""
+        prefix = os.path.join(path, "")
+        for p in [p for p in self._wds if p == path or p.startswith(prefix)]:
+            self.paths.pop(self._wds.pop(p), None)
+
+    def read(self) -> List[tuple]:
+        """Return the pending ``(path, mask)`` events."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & _IN_IGNORED:
+                    path = self.paths.pop(wd, None)
+                    if path is not None and self._wds.get(path) == wd:
+                        del self._wds[path]
+                    continue
+                directory = self.paths.get(wd)
+                if mask & _IN_Q_OVERFLOW:
+                    events.append(("", mask))
+                elif directory is not None and name:
+                    events.append((os.path.join(directory, os.fsdecode(name)), mask))
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from songsearch.app import MainWindow
+from songsearch.ui.organizer_panel import OrganizerPanel
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_importing_app_defers_heavy_modules():
+    code = (
+        "import sys, songsearch.app; "
+        "print(','.join(m for m in ('PyQt5.QtMultimedia', 'mutagen', 'rapidfuzz', 'sqlite3') "
+        "if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+    assert out.stdout.strip() == ""
+
+
+def test_tabs_are_built_on_first_use(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    assert not window.search_tab.is_built
+    assert not window.organizer_tab.is_built
+
+    panel = window.organizer_panel
+    assert isinstance(panel, OrganizerPanel)
+    assert window.organizer_tab.is_built
+    assert window.organizer_panel is panel
+    assert panel.parent() is window.organizer_tab
+
+
+def test_search_tab_is_built_after_window_is_shown(qtbot, monkeypatch, tmp_path):
+    from songsearch.db import DatabaseManager
+    from songsearch.ui import search_panel
+
+    created = []
+    monkeypatch.setattr(
+        search_panel,
+        "DatabaseManager",
+        lambda: created.append(1) or DatabaseManager(str(tmp_path / "songs.db")),
+    )
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.show()
+    qtbot.waitUntil(lambda: window.search_tab.is_built, timeout=2000)
+    # the player and the database connection are still not created
+    assert window.search_panel.player is None
+    assert created == []
+    # the first access opens the database, later ones reuse it
+    db = window.search_panel.db
+    assert isinstance(db, DatabaseManager)
+    assert window.search_panel.db is db
+    assert created == [1]
@@ -0,0 +1,56 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "bench_suite.py")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_suite", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_writes_every_benchmark(bench, tmp_path):
+    out = tmp_path / "bench.json"
+    argv = ["run", "-o", str(out), "--sizes", "200", "--files", "10", "--songs", "10"]
+    assert bench.main(argv + ["--repeat", "1"]) == 0
+
+    report = json.loads(out.read_text())
+    assert report["params"]["seed"] == 1234
+    assert set(report["results"]) == {
+        "add_song",
+        "search_song_like@200",
+        "fuzzy_search@200",
+        "read_tags",
+        "plan_moves",
+        "build_destination",
+        "move",
+    }
+    assert all(r["value"] > 0 for r in report["results"].values())
+
+
+def test_compare_flags_slowdowns_in_either_direction(bench, tmp_path):
+    def report(rate, latency):
+        return {
+            "schema": bench.SCHEMA,
+            "results": {
+                "read_tags": {"value": rate, "unit": "files/s", "better": "higher"},
+                "fuzzy_search@10000": {"value": latency, "unit": "ms", "better": "lower"},
+            },
+        }
+
+    rows = bench.compare(report(1000, 10), report(700, 10.5), tolerance=0.2)
+    assert [r["regression"] for r in rows] == [True, False]
+    rows = bench.compare(report(1000, 10), report(1100, 20), tolerance=0.2)
+    assert [r["regression"] for r in rows] == [False, True]
+
+    base, cur = tmp_path / "base.json", tmp_path / "cur.json"
+    base.write_text(json.dumps(report(1000, 10)))
+    cur.write_text(json.dumps(report(1000, 30)))
+    assert bench.main(["compare", str(base), str(cur)]) == 1
+    assert bench.main(["compare", str(base), str(base)]) == 0
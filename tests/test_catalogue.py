@@ -0,0 +1,84 @@
+import pytest
+
+from songsearch.catalogue import SongCatalogue
+from songsearch.db import DatabaseManager
+from songsearch.search import fuzzy_search
+from songsearch.search.index import SearchIndex
+from songsearch.search.sharded import ShardedSearchEngine
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    songs = [
+        ("hey_jude.mp3", "The Beatles", "Hey Jude", 431, 1000),
+        ("hey_jude_copy.mp3", "the  beatles", "hey jude", 432, 1001),
+        ("hey_jude_live.mp3", "The Beatles", "Hey Jude", 500, 2000),
+        ("bohemian.flac", "Queen", "Bohemian Rhapsody", None, None),
+        ("untitled.mp3", None, None, 100, 5),
+    ]
+    for name, artist, title, duration, size in songs:
+        db.add_song(
+            name=name, artist=artist, title=title, path=f"/m/{name}", duration=duration, size=size
+        )
+    return db
+
+
+def test_catalogue_columns_and_rows(db):
+    cat = SongCatalogue.from_db(db)
+    assert len(cat) == 5
+    row = cat[3]
+    assert row.id == 4
+    assert row.title == "Bohemian Rhapsody"
+    assert row.artist == "Queen"
+    assert row.duration is None and row.size is None
+    assert cat[-1].artist is None and cat[-1].title is None
+    assert cat[0].as_tuple() == (1, "hey_jude.mp3", "The Beatles", "Hey Jude", "/m/hey_jude.mp3")
+    assert [r.id for r in cat[1:3]] == [2, 3]
+    with pytest.raises(IndexError):
+        cat[5]
+    with pytest.raises(AttributeError):
+        row.extra = 1  # __slots__ views
+
+
+def test_catalogue_memory_usage(db):
+    cat = SongCatalogue.from_db(db)
+    usage = cat.memory_usage()
+    assert usage["total"] == sum(v for k, v in usage.items() if k != "total")
+    assert cat.bytes_per_song() == usage["total"] / 5
+
+
+def test_catalogue_search_matches_format(db):
+    cat = SongCatalogue.from_db(db)
+    results = cat.search("bohemian", "song", 70)
+    assert results == fuzzy_search(db, "bohemian", "song", 70)
+    assert [r["id"] for r in cat.search("untitled.mp3", "song", 90)] == [5]
+    assert {r["id"] for r in cat.search("Queen", "artist", 90)} == {4}
+
+
+def test_catalogue_search_filters_like_the_index(db, tmp_path):
+    db.add_song(name="joga.mp3", artist="Björk", title="Jóga", path="/m/joga.mp3")
+    index = SearchIndex(str(tmp_path / "songs.idx"))
+    index.refresh(db)
+    cat = SongCatalogue.from_db(db)
+    for mode in ("song", "artist"):
+        for query in ("hey jude", "HEY JUD", "JÓGA", "björk", "beatles", "bohemain", ""):
+            assert cat.search(query, mode, 50) == fuzzy_search(db, query, mode, 50, index=index), (
+                query,
+                mode,
+            )
+    # "bohemain" is close to "Bohemian Rhapsody" but not part of it.
+    assert cat.search("bohemain", "song", 50) == []
+
+
+def test_catalogue_duplicates(db):
+    cat = SongCatalogue.from_db(db)
+    groups = cat.duplicates()
+    assert [[r.id for r in g] for g in groups] == [[1, 2]]
+    assert [[r.id for r in g] for g in cat.duplicates(duration_tolerance=100)] == [[1, 2, 3]]
+
+
+def test_sharded_engine_accepts_catalogue(db):
+    cat = SongCatalogue.from_db(db)
+    with ShardedSearchEngine(cat, workers=2) as engine:
+        assert engine.search("bohemian", "song", 70) == cat.search("bohemian", "song", 70)
@@ -0,0 +1,216 @@
+import io
+import json
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from songsearch import __main__ as main_module
+from songsearch import cli, indexer, metrics
+from songsearch.db import DatabaseManager
+from songsearch.synthetic import populate_songs
+
+
+def run(argv, stdin=""):
+    out = io.StringIO()
+    code = cli.main(argv, stdout=out, stdin=io.StringIO(stdin))
+    return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "songs.db")
+    db = DatabaseManager(path)
+    db.add_song(name="a", artist="The Beatles", title="Hey Jude", path="/m/a.mp3", duration=200)
+    db.add_song(name="b", artist="The Beatles", title="hey jude", path="/m/b.mp3", duration=201)
+    db.add_song(name="c", artist="Queen", title="Bohemian Rhapsody", path="/m/c.mp3")
+    return path
+
+
+def test_index_streams_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        indexer,
+        "File",
+        lambda path, easy=True: SimpleNamespace(tags={"title": ["Song"]}, info=None),
+    )
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    for i in range(3):
+        (lib / f"{i}.mp3").write_bytes(b"x")
+    db_path = str(tmp_path / "songs.db")
+
+    code, events = run(["index", "--db", db_path, "--batch-size", "2", "--workers", "2", str(lib)])
+
+    assert code == 0
+    assert events[-1] == {"event": "done", "files": 3}
+    assert events[-2]["files_done"] == events[-2]["files_total"] == 3
+    assert len(DatabaseManager(db_path).fetch_all_songs()) == 3
+
+
+def test_index_scans_roots_on_different_devices_concurrently(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        indexer,
+        "File",
+        lambda path, easy=True: SimpleNamespace(tags={"title": ["Song"]}, info=None),
+    )
+    roots = []
+    for name in ("disk1", "disk2"):
+        root = tmp_path / name
+        root.mkdir()
+        (root / "a.mp3").write_bytes(b"x")
+        roots.append(str(root))
+    both_running = threading.Barrier(2, timeout=5)
+    real_run = indexer.LibraryIndexer.run
+
+    def run_together(self, on_progress=None):
+        both_running.wait()  # deadlocks (and times out) if run one after the other
+        return real_run(self, on_progress)
+
+    monkeypatch.setattr(cli, "device_of", lambda path: roots.index(path))
+    monkeypatch.setattr(indexer.LibraryIndexer, "run", run_together)
+
+    code, events = run(["index", "--db", str(tmp_path / "songs.db"), *roots])
+
+    assert code == 0
+    assert events[-1] == {"event": "done", "files": 2}
+    assert {e["root"] for e in events[:-1]} == set(roots)
+
+
+def test_metrics_are_written_as_prometheus_text(db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+    out = tmp_path / "metrics.prom"
+
+    code, _ = run(["search", "--db", db_path, "--metrics", str(out), "hey jude"])
+
+    assert code == 0
+    text = out.read_text()
+    assert 'songsearch_stage_duration_seconds_count{stage="search.fuzzy"} 1' in text
+    metrics.reset()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_search_reads_queries_from_stdin(db_path, workers):
+    code, results = run(
+        ["search", "--db", db_path, "--workers", str(workers), "--batch-size", "1"],
+        stdin="Bohemian Rhapsody\n\nnothing at all\n",
+    )
+    assert code == 0
+    assert [r["query"] for r in results] == ["Bohemian Rhapsody", "nothing at all"]
+    assert [m["path"] for m in results[0]["matches"]] == ["/m/c.mp3"]
+    assert results[1]["matches"] == []
+
+
+def test_search_results_do_not_depend_on_workers(tmp_path):
+    path = str(tmp_path / "library.db")
+    db = DatabaseManager(path)
+    populate_songs(db, 400, seed=5)
+    db.add_songs(
+        [
+            {"name": "x", "artist": "ÉDITH PIAF", "title": "LA VIE EN ROSE", "path": "/m/x.mp3"},
+            {"name": "la vie en rose (live)", "artist": "Édith Piaf", "title": None, "path": "/m/y.mp3"},
+        ]
+    )
+    queries = "la vie en rose\nédith\nlove\nthe\nzzzz\n"
+    outputs = {}
+    for workers in (1, 3):
+        for mode in ("song", "artist"):
+            code, outputs[workers, mode] = run(
+                ["search", "--db", path, "--workers", str(workers), "--mode", mode, "--limit", "500"],
+                stdin=queries,
+            )
+            assert code == 0
+    for mode in ("song", "artist"):
+        assert outputs[1, mode] == outputs[3, mode]
+    assert any(r["matches"] for r in outputs[1, "artist"])
+
+
+def test_plan_and_apply(tmp_path, db_path, monkeypatch):
+    src = tmp_path / "in.mp3"
+    src.write_bytes(b"x")
+    dest = tmp_path / "out" / "Artist - Song.mp3"
+
+    def fake_plan(paths, base, template):
+        return [
+            {"original_path": p, "proposed_path": str(dest), "status": "ok", "reason": "planned"}
+            for p in paths
+        ]
+
+    monkeypatch.setattr(cli, "plan_moves", fake_plan)
+    DatabaseManager(db_path).add_song(name="in", path=str(src))
+    _, plan = run(["plan", "--db", db_path, "--dest", str(tmp_path / "out"), str(src)])
+    assert plan[0]["proposed_path"] == str(dest)
+
+    stdin = "".join(json.dumps(e) + "\n" for e in plan + [{"original_path": "x", "status": "error"}])
+    code, results = run(["apply", "--db", db_path, "--dry-run"], stdin=stdin)
+    assert code == 0 and src.exists()
+    assert [r["status"] for r in results] == ["pending", "skipped"]
+
+    code, results = run(["apply", "--db", db_path, "--estimate", "--sample-mb", "0"], stdin=stdin)
+    assert code == 0 and src.exists()
+    assert len(results) == 1
+    assert (results[0]["event"], results[0]["renames"], results[0]["not_planned"]) == ("estimate", 1, 1)
+
+    journal = ["--journal", str(tmp_path / "moves.journal")]
+    code, results = run(["apply", "--db", db_path, *journal], stdin=stdin)
+    assert code == 0
+    assert [r["status"] for r in results] == ["skipped", "moved"]
+    assert dest.exists() and not src.exists()
+    assert DatabaseManager(db_path).search_song_like("in", mode="song") == []
+    assert str(dest) in [r[4] for r in DatabaseManager(db_path).fetch_all_songs()]
+
+    code, results = run(["apply", "--db", db_path, "--rollback", *journal])
+    assert code == 0
+    assert results == [
+        {"original_path": str(src), "proposed_path": str(dest), "status": "rolled_back", "reason": ""}
+    ]
+    assert src.exists() and not dest.exists()
+
+
+def test_saved_plans(tmp_path, db_path, monkeypatch):
+    monkeypatch.setattr(
+        cli,
+        "plan_moves",
+        lambda paths, base, template: [
+            {"original_path": p, "proposed_path": f"{base}/{p}", "status": "ok"} for p in paths
+        ],
+    )
+    code, _ = run(["plan", "--db", db_path, "--dest", "/out", "--save", "mine"], stdin="a\nb\n")
+    assert code == 0
+
+    code, plans = run(["plans", "--db", db_path, "list"])
+    assert [(p["name"], p["entries"]) for p in plans] == [("mine", 2)]
+    plan_id = plans[0]["id"]
+
+    csv_path = str(tmp_path / "plan.csv")
+    code, result = run(["plans", "--db", db_path, "export", str(plan_id), csv_path])
+    assert result == [{"id": plan_id, "ok": 2, "errors": 0}]
+    code, result = run(["plans", "--db", db_path, "import", csv_path, "--dest", "/out"])
+    assert result[0]["entries"] == 2
+
+    code, entries = run(["plans", "--db", db_path, "show", str(result[0]["id"]), "--checked"])
+    assert [e["proposed_path"] for e in entries] == ["/out/a", "/out/b"]
+
+
+def test_invalid_template_saves_no_plan(db_path):
+    code, _ = run(
+        ["plan", "--db", db_path, "--dest", "/out", "--save", "mine", "--template", "{nosuch}"],
+        stdin="a\n",
+    )
+    assert code == 2
+    assert DatabaseManager(db_path).list_plans() == []
+
+
+def test_dupes(db_path):
+    code, groups = run(["dupes", "--db", db_path])
+    assert code == 0
+    assert [[s["id"] for s in g["songs"]] for g in groups] == [[1, 2]]
+
+
+def test_main_runs_cli_without_pyqt(db_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "PyQt5.QtWidgets", None)
+    with pytest.raises(SystemExit) as excinfo:
+        main_module.main(["dupes", "--db", db_path])
+    assert excinfo.value.code == 0
+    assert json.loads(capsys.readouterr().out)["songs"][0]["path"] == "/m/a.mp3"
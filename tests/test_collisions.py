@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from songsearch.organizer import collisions
+from songsearch.organizer.collisions import CollisionIndex, resolve_collisions
+
+
+def _entry(src, dest, status="ok"):
+    return {"original_path": src, "proposed_path": dest, "status": status, "reason": "planned"}
+
+
+def test_suffix_renames_case_insensitive_duplicates(tmp_path):
+    dest = str(tmp_path / "A - T.mp3")
+    plan = [
+        _entry("1.mp3", dest),
+        _entry("2.mp3", str(tmp_path / "a - t.MP3")),
+        _entry("3.mp3", dest),
+        _entry("4.mp3", str(tmp_path / "A - T (2).mp3")),
+        _entry("5.mp3", "", status="error"),
+    ]
+    report = resolve_collisions(plan)
+
+    assert [e["proposed_path"] for e in plan[:4]] == [
+        dest,
+        str(tmp_path / "a - t (2).MP3"),
+        str(tmp_path / "A - T (3).mp3"),
+        str(tmp_path / "A - T (2) (2).mp3"),
+    ]
+    assert (report.collisions, report.renamed) == (3, 3)
+    assert plan[4]["status"] == "error"
+
+
+def test_existing_files_are_listed_once_per_directory(tmp_path, monkeypatch):
+    (tmp_path / "Song.mp3").write_bytes(b"x")
+    (tmp_path / "Song (2).mp3").write_bytes(b"x")
+    calls = []
+    real_scandir = collisions.os.scandir
+    monkeypatch.setattr(collisions.os, "scandir", lambda d: calls.append(d) or real_scandir(d))
+
+    plan = [_entry(f"{i}.mp3", str(tmp_path / f"song{'' if i == 0 else i}.mp3")) for i in range(5)]
+    resolve_collisions(plan)
+
+    assert plan[0]["proposed_path"] == str(tmp_path / "song (3).mp3")
+    assert calls == [str(tmp_path)]
+
+
+def test_skip_marks_later_entries(tmp_path):
+    (tmp_path / "x.mp3").write_bytes(b"x")
+    plan = [
+        _entry("1.mp3", str(tmp_path / "y.mp3")),
+        _entry("2.mp3", str(tmp_path / "Y.mp3")),
+        _entry("3.mp3", str(tmp_path / "x.mp3")),
+        _entry(str(tmp_path / "z.mp3"), str(tmp_path / "z.mp3")),
+    ]
+    (tmp_path / "z.mp3").write_bytes(b"x")
+    report = resolve_collisions(plan, "skip")
+
+    assert [e["status"] for e in plan] == ["ok", "collision", "collision", "ok"]
+    assert plan[1]["reason"] == "same destination as 1.mp3"
+    assert plan[2]["reason"] == "destination exists"
+    assert report.skipped == 2
+
+
+def test_keep_best_prefers_highest_bitrate(tmp_path):
+    rates = {"low.mp3": 128000, "high.mp3": 320000, "mid.mp3": 192000}
+    dest = str(tmp_path / "song.mp3")
+    index = CollisionIndex("keep-best", bitrate=rates.__getitem__)
+    first = [_entry("low.mp3", dest)]
+    second = [_entry("high.mp3", dest), _entry("mid.mp3", dest)]
+    index.resolve(first)
+    report = index.resolve(second)
+
+    assert first[0]["status"] == "collision"
+    assert first[0]["reason"] == "lower bitrate than high.mp3"
+    assert [e["status"] for e in second] == ["ok", "collision"]
+    assert (report.replaced, report.skipped) == (1, 1)
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        CollisionIndex("overwrite")
+
+
+def test_large_plan_is_linear(tmp_path):
+    def plan(n):
+        return [_entry(f"{i}.mp3", str(tmp_path / f"d{i % 100}" / f"s{i % (n // 2)}.mp3")) for i in range(n)]
+
+    small, large = plan(10_000), plan(100_000)
+    start = time.perf_counter()
+    resolve_collisions(small)
+    t_small = time.perf_counter() - start
+    start = time.perf_counter()
+    report = resolve_collisions(large)
+    t_large = time.perf_counter() - start
+
+    assert report.renamed == 50_000
+    assert len({e["proposed_path"].casefold() for e in large}) == 100_000
+    # Ten times the entries should take about ten times as long, not 100x.
+    assert t_large < 30 * max(t_small, 0.01)
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from songsearch import concurrency
+from songsearch.concurrency import AdaptiveLimiter, adaptive_map, limited_pool, limiter_for
+
+
+class FakeDevice:
+    """Serves *capacity* requests at once; the rest queue behind them."""
+
+    def __init__(self, capacity, service=0.002):
+        self.slots = threading.Semaphore(capacity)
+        self.service = service
+
+    def read(self, _):
+        with self.slots:
+            time.sleep(self.service)
+
+
+def drive(limiter, device, ops=1500):
+    with limited_pool(limiter, "test") as pool:
+        list(adaptive_map(device.read, limiter, pool, range(ops)))
+    return limiter.limit
+
+
+def test_limit_grows_on_a_device_with_headroom():
+    limiter = AdaptiveLimiter(initial=2, maximum=16)
+    assert drive(limiter, FakeDevice(64)) > 8
+
+
+def test_limit_stays_near_capacity_of_a_saturated_device():
+    limiter = AdaptiveLimiter(initial=16, maximum=32)
+    assert drive(limiter, FakeDevice(2)) <= 8
+
+
+def test_failures_back_off():
+    limiter = AdaptiveLimiter(initial=8)
+    with pytest.raises(OSError):
+        with limiter.slot():
+            raise OSError("timeout")
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_slot_bounds_operations_in_flight():
+    limiter = AdaptiveLimiter(initial=3, maximum=3)
+    peak = 0
+    lock = threading.Lock()
+
+    def op(i):
+        nonlocal peak
+        with lock:
+            peak = max(peak, limiter.in_flight)
+        time.sleep(0.001)
+        return i * 2
+
+    with ThreadPoolExecutor(8) as pool:
+        assert list(adaptive_map(op, limiter, pool, range(50))) == [i * 2 for i in range(50)]
+    assert peak <= 3
+
+
+def test_limiters_are_shared_per_device_and_stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(concurrency, "_limiters", {})
+    (tmp_path / "a").mkdir()
+    assert limiter_for(str(tmp_path / "a"), "scan") is limiter_for(str(tmp_path), "scan")
+    assert limiter_for(str(tmp_path), "scan") is not limiter_for(str(tmp_path), "read")
+    # Paths that do not exist yet are charged to their nearest ancestor's device.
+    assert concurrency.device_of(str(tmp_path / "missing" / "x")) == concurrency.device_of(
+        str(tmp_path)
+    )
@@ -1,10 +1,14 @@
 import os
+import sqlite3
 import sys
 import tempfile
 
+import pytest
+
 # Ensure the package is importable
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from songsearch import db as db_module
 from songsearch.db import DatabaseManager
 
 
@@ -24,3 +28,167 @@ def test_search_song_like_song_and_artist():
         rows_artist = db.search_song_like("Artist", mode="artist")
         assert len(rows_artist) == 1
         assert rows_artist[0][2] == "Test Artist"
+
+
+def test_plan_entries_upsert_and_filter(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_song(name="a", path="/in/a.mp3")
+    plan_id = db.create_plan("/out", "first")
+    entries = [
+        {"original_path": "/in/a.mp3", "proposed_path": "/out/a.mp3", "status": "ok", "genre": "Rock"},
+        {"original_path": "/in/b.mp3", "proposed_path": "", "status": "error", "reason": "no tags"},
+    ]
+    assert db.save_plan_entries(plan_id, iter(entries)) == 2
+
+    # Upserting the same source updates it in place.
+    db.save_plan_entries(plan_id, [{**entries[0], "genre": "Jazz", "checked": False}])
+    rows = list(db.iter_plan_entries(plan_id))
+    assert [r["original_path"] for r in rows] == ["/in/a.mp3", "/in/b.mp3"]
+    assert (rows[0]["genre"], rows[0]["checked"]) == ("Jazz", 0)
+    assert rows[1]["checked"] == 0
+    assert [r["original_path"] for r in db.iter_plan_entries(plan_id, status="error")] == ["/in/b.mp3"]
+    assert list(db.iter_plan_entries(plan_id, checked_only=True)) == []
+
+    assert db.list_plans()[0][:3] == (plan_id, "first", "/out")
+    assert db.list_plans()[0][4] == 2
+    with db._conn() as c:
+        assert c.execute(
+            "SELECT original_path, proposed_path, move_status FROM songs"
+        ).fetchone() == ("/in/a.mp3", "/out/a.mp3", "planned")
+
+    db.delete_plan(plan_id)
+    assert db.list_plans() == [] and list(db.iter_plan_entries(plan_id)) == []
+
+
+def test_plan_tables_gain_new_columns(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as c:
+        c.execute("CREATE TABLE plans (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, dest_dir TEXT NOT NULL, created_at TEXT)")
+        c.execute("CREATE TABLE plan_entries (plan_id INTEGER NOT NULL, original_path TEXT NOT NULL, proposed_path TEXT, status TEXT, reason TEXT, title TEXT, artist TEXT, album TEXT, year TEXT, month TEXT, genre TEXT, checked INTEGER NOT NULL DEFAULT 1, UNIQUE (plan_id, original_path))")
+
+    db = DatabaseManager(path)
+    plan_id = db.create_plan("/out", template="{artist}{ext}")
+    db.save_plan_entries(plan_id, [{"original_path": "a", "status": "ok", "disc": "2"}])
+    assert db.get_plan(plan_id)[4] == "{artist}{ext}"
+    assert next(db.iter_plan_entries(plan_id))["disc"] == "2"
+
+
+def test_upsert_and_delete_songs_by_directory(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    lib = os.path.join(str(tmp_path), "lib")
+    paths = [os.path.join(lib, "a.mp3"), os.path.join(lib, "sub", "b.mp3"), lib + "2.mp3"]
+    db.upsert_songs([{"name": "x", "path": p, "size": 1, "original_path": p} for p in paths])
+    db.upsert_songs([{"name": "y", "path": paths[0], "size": 2, "original_path": "moved"}])
+
+    assert db.song_paths_in_dir(lib) == [paths[0]]
+    assert db.sizes_for_paths(paths[:1]) == {paths[0]: 2}
+    assert db.delete_songs_under(lib) == 2
+    assert db.delete_songs([paths[0], paths[2]]) == 1
+    assert db.song_paths_in_dir(str(tmp_path)) == []
+
+
+def test_unversioned_database_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as c:
+        c.execute("CREATE TABLE songs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, artist TEXT, title TEXT, path TEXT UNIQUE, size INTEGER)")
+        c.execute("CREATE INDEX idx_songs_title ON songs(title)")
+        c.execute("INSERT INTO songs (name, title, path) VALUES ('a', 'Old Song', '/m/a.mp3')")
+
+    db = DatabaseManager(path)
+    with sqlite3.connect(path) as c:
+        assert c.execute("PRAGMA user_version").fetchone()[0] == db_module.SCHEMA_VERSION
+        indexes = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {"idx_songs_search", "idx_songs_identity"} <= indexes
+    assert "idx_songs_title" not in indexes
+    assert db.search_song_like("old")[0][3] == "/m/a.mp3"
+
+    # The change triggers exist and the new column can be written.
+    _, generation = db.write_generation()
+    db.upsert_songs([{"name": "b", "path": "/m/b.mp3", "size": 3, "content_hash": "h"}])
+    assert db.write_generation()[1] == generation + 1
+    assert db.songs_by_identity([(3, "h")]) == {(3, "h"): ["/m/b.mp3"]}
+
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "songs.db")
+    DatabaseManager(path)
+
+    def broken(c):
+        c.execute("CREATE TABLE half_done (x)")
+        raise sqlite3.OperationalError("boom")
+
+    monkeypatch.setattr(db_module, "MIGRATIONS", db_module.MIGRATIONS + (broken,))
+    monkeypatch.setattr(db_module, "SCHEMA_VERSION", db_module.SCHEMA_VERSION + 1)
+    with pytest.raises(sqlite3.OperationalError):
+        DatabaseManager(path)
+
+    with sqlite3.connect(path) as c:
+        assert c.execute("PRAGMA user_version").fetchone()[0] == db_module.SCHEMA_VERSION - 1
+        assert c.execute("SELECT name FROM sqlite_master WHERE name='half_done'").fetchone() is None
+
+
+def test_newer_database_is_left_alone(tmp_path, caplog):
+    path = str(tmp_path / "songs.db")
+    DatabaseManager(path)
+    with sqlite3.connect(path) as c:
+        c.execute(f"PRAGMA user_version = {db_module.SCHEMA_VERSION + 5}")
+
+    DatabaseManager(path).add_song(name="a", path="/m/a.mp3")
+    assert "newer than this release" in caplog.text
+    with sqlite3.connect(path) as c:
+        assert c.execute("PRAGMA user_version").fetchone()[0] == db_module.SCHEMA_VERSION + 5
+
+
+def test_hot_queries_use_indexes(tmp_path, monkeypatch):
+    """Every query issued on a lookup or search path is answered from an index."""
+    path = str(tmp_path / "songs.db")
+    db = DatabaseManager(path)
+    songs = [
+        {"name": f"s{i}", "artist": "A", "title": f"T{i}", "path": f"/m/{i}.mp3", "size": i, "content_hash": f"h{i}"}
+        for i in range(20)
+    ]
+    db.add_songs(songs)
+
+    statements = []
+    connect = db._conn
+
+    def traced():
+        c = connect()
+        c.set_trace_callback(statements.append)
+        return c
+
+    monkeypatch.setattr(db, "_conn", traced)
+    db.upsert_songs(songs[:2] + [{**songs[0], "path": "/m/new.mp3"}])
+    db.existing_paths(["/m/1.mp3"])
+    db.file_states(["/m/1.mp3", "/m/2.mp3"])
+    db.set_content_hashes({"/m/3.mp3": "h"})
+    db.songs_by_identity([(1, "h1")])
+    db.sizes_for_paths(["/m/1.mp3"])
+    db.song_paths_in_dir("/m")
+    db.search_song_like("T1")
+    db.search_song_like("A", mode="artist")
+    db.fetch_all_for_fuzzy("T1", "song")
+    db.fetch_all_for_fuzzy("A", "artist")
+    db.changed_song_ids(5)
+    db.fetch_songs_by_ids([1, 2])
+    db.update_song_location(3, "/m/3b.mp3")
+    db.update_song_location("s4", "/m/4b.mp3")
+    db.relocate_songs([("/m/5.mp3", "/m/5b.mp3")])
+    db.record_moves([("/m/6.mp3", "/out/6.mp3")])
+    plan_id = db.create_plan("/out")
+    db.save_plan_entries(plan_id, [{"original_path": "/m/7.mp3", "proposed_path": "/out/7.mp3", "status": "ok"}])
+    list(db.iter_plan_entries(plan_id, status="ok"))
+    db.get_plan(plan_id)
+    db.delete_plan(plan_id)
+    db.delete_songs(["/m/8.mp3"])
+    db.delete_songs_under("/out")
+
+    queries = {s for s in statements if s.split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE")}
+    assert len(queries) > 15
+    with sqlite3.connect(path) as c:
+        for sql in queries:
+            plan = [r[3] for r in c.execute("EXPLAIN QUERY PLAN " + sql)]
+            scans = [step for step in plan if step.startswith("SCAN") and "COVERING INDEX" not in step]
+            assert not scans, (sql, plan)
@@ -0,0 +1,73 @@
+import os
+
+from songsearch.db import DatabaseManager
+from songsearch.organizer import estimate as estimate_module
+from songsearch.organizer.estimate import estimate_moves
+
+
+def _library(tmp_path, n=4, size=1000):
+    src = tmp_path / "src"
+    src.mkdir()
+    moves = []
+    for i in range(n):
+        path = src / f"{i}.mp3"
+        path.write_bytes(b"x" * size)
+        moves.append((str(path), str(tmp_path / "out" / f"a{i % 2}" / "b" / f"{i}.mp3")))
+    return moves
+
+
+def test_same_filesystem_moves_are_renames(tmp_path):
+    moves = _library(tmp_path)
+    est = estimate_moves(moves)
+
+    assert (est.moves, est.renames, est.copies, est.skipped) == (4, 4, 0, 0)
+    assert est.copy_bytes == 0 and est.devices == {}
+    # out, out/a0, out/a0/b, out/a1, out/a1/b
+    assert est.dirs_to_create == 5
+    assert est.rename_seconds is not None and est.eta is not None
+    assert est.fits
+    assert not [n for n in os.listdir(tmp_path) if n.startswith(".songsearch-estimate")]
+
+
+def test_cross_device_copies_use_db_sizes_and_check_free_space(tmp_path, monkeypatch):
+    moves = _library(tmp_path)
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": str(i), "path": src, "size": 10**6} for i, (src, _) in enumerate(moves[:3])])
+    real_stat = os.stat
+
+    class FakeStat:
+        def __init__(self, st, dev):
+            self.st_dev, self.st_size = dev, st.st_size
+
+    def fake_stat(path, *args, **kw):
+        st = real_stat(path, *args, **kw)
+        # Everything outside the source folder is another filesystem.
+        return FakeStat(st, 1 if str(path).startswith(str(tmp_path / "src")) else 2)
+
+    monkeypatch.setattr(estimate_module.os, "stat", fake_stat)
+    monkeypatch.setattr(
+        estimate_module.shutil, "disk_usage", lambda path: type("U", (), {"free": 2_500_000})()
+    )
+
+    est = estimate_moves(moves, db, sample_bytes=512)
+
+    assert (est.renames, est.copies) == (0, 4)
+    assert est.copy_bytes == 3 * 10**6 + 1000  # three sizes from the DB, one stat'ed
+    (device,) = est.devices.values()
+    assert device.free_bytes == 2_500_000 and not device.fits and not est.fits
+    assert device.throughput and device.throughput > 0
+    assert est.eta is not None and est.eta > 0
+    assert est.as_dict()["filesystems"][0]["fits"] is False
+
+
+def test_missing_sources_and_taken_destinations_are_skipped(tmp_path):
+    moves = _library(tmp_path, n=2)
+    os.remove(moves[0][0])
+    os.makedirs(os.path.dirname(moves[1][1]))
+    open(moves[1][1], "wb").close()
+    moves.append((str(tmp_path / "gone" / "x.mp3"), str(tmp_path / "out" / "x.mp3")))
+
+    est = estimate_moves(moves, sample_bytes=0)
+
+    assert est.skipped == 3 and est.renames == 0
+    assert est.rename_seconds is None
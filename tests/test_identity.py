@@ -0,0 +1,44 @@
+from songsearch.db import DatabaseManager
+from songsearch.identity import IDENTITY_BLOCK, content_hash, file_identity, find_renames
+
+
+def test_hash_covers_size_head_and_tail(tmp_path):
+    path = tmp_path / "a.mp3"
+    data = bytearray(b"a" * (3 * IDENTITY_BLOCK))
+    path.write_bytes(data)
+    original = content_hash(str(path))
+
+    data[IDENTITY_BLOCK + 10] = ord("b")  # middle block: not read
+    path.write_bytes(data)
+    assert content_hash(str(path)) == original
+    for offset in (0, len(data) - 1):
+        changed = bytearray(data)
+        changed[offset] = ord("b")
+        path.write_bytes(changed)
+        assert content_hash(str(path)) != original
+    path.write_bytes(data + b"a")
+    assert content_hash(str(path)) != original
+    assert file_identity(str(tmp_path / "missing.mp3")) is None
+
+
+def test_find_renames_only_claims_rows_whose_file_is_gone(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    for name, data in (("old.mp3", b"song"), ("still.mp3", b"dupe"), ("gone.mp3", b"dupe")):
+        path = tmp_path / name
+        path.write_bytes(data)
+        db.add_song(name=name, path=str(path), size=len(data), content_hash=content_hash(str(path)))
+    (tmp_path / "old.mp3").rename(tmp_path / "new.mp3")
+    (tmp_path / "gone.mp3").rename(tmp_path / "copy1.mp3")
+    (tmp_path / "copy2.mp3").write_bytes(b"dupe")
+    (tmp_path / "other.mp3").write_bytes(b"other")
+
+    new = [str(tmp_path / n) for n in ("new.mp3", "copy1.mp3", "copy2.mp3", "other.mp3")]
+    moves, hashes = find_renames(db, new)
+
+    assert moves == [
+        (str(tmp_path / "old.mp3"), str(tmp_path / "new.mp3")),
+        (str(tmp_path / "gone.mp3"), str(tmp_path / "copy1.mp3")),
+    ]
+    assert set(hashes) == {str(tmp_path / "copy2.mp3"), str(tmp_path / "other.mp3")}
+    assert db.relocate_songs(moves) == 2
+    assert db.existing_paths(new) == set(new[:2])
@@ -0,0 +1,172 @@
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from songsearch import indexer
+from songsearch.db import DatabaseManager
+from songsearch.indexer import LibraryIndexer, ScanControl, ScanProgress, iter_audio_files
+
+
+def fake_file(path, easy=True):
+    stem = path.rsplit("/", 1)[-1].split(".")[0]
+    return SimpleNamespace(
+        tags={"title": [f"Title {stem}"], "artist": ["Artist"], "date": ["1999-07-01"]},
+        info=SimpleNamespace(length=61.5),
+    )
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexer, "File", fake_file)
+    root = tmp_path / "lib"
+    (root / "sub").mkdir(parents=True)
+    for i in range(5):
+        (root / f"{i}.mp3").write_bytes(b"x" * 10)
+    (root / "sub" / "5.FLAC").write_bytes(b"x" * 10)
+    (root / "cover.jpg").write_bytes(b"x")
+    return root
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "songs.db"))
+
+
+def test_iter_audio_files_filters_extensions(library):
+    names = sorted(p.rsplit("/", 1)[-1] for p in iter_audio_files(str(library)))
+    assert names == ["0.mp3", "1.mp3", "2.mp3", "3.mp3", "4.mp3", "5.FLAC"]
+
+
+def test_scan_commits_in_batches(library, db, monkeypatch):
+    batches = []
+    add_songs = db.add_songs
+    monkeypatch.setattr(db, "add_songs", lambda songs: (batches.append(len(songs)), add_songs(songs)))
+    reports = []
+
+    count = LibraryIndexer(db, str(library), batch_size=4).run(reports.append)
+
+    assert count == 6
+    assert batches == [4, 2]
+    assert reports[-1].files_done == reports[-1].files_total == 6
+    assert reports[-1].bytes_done == 60
+    row = db.search_song_like("Title 5")[0]
+    assert row[1:] == ("5", "Artist", str(library / "sub" / "5.FLAC"), "Title 5")
+
+
+def test_cancel_keeps_committed_batches(library, db):
+    control = ScanControl()
+
+    def on_progress(progress):
+        control.cancel()
+
+    count = LibraryIndexer(db, str(library), batch_size=2, control=control).run(on_progress)
+    assert count == 2
+    assert len(db.fetch_all_songs()) == 2
+
+
+def test_pause_blocks_until_resumed(library, db):
+    control = ScanControl()
+    control.pause()
+    result = []
+    worker = threading.Thread(
+        target=lambda: result.append(LibraryIndexer(db, str(library), control=control).run())
+    )
+    worker.start()
+    worker.join(0.2)
+    assert worker.is_alive() and db.fetch_all_songs() == []
+    control.resume()
+    worker.join(5)
+    assert result == [6]
+
+
+def test_progress_rates_and_eta():
+    progress = ScanProgress(files_done=50, files_total=150, bytes_done=5_000_000, elapsed=10.0)
+    assert progress.files_per_sec == 5.0
+    assert progress.bytes_per_sec == 500_000.0
+    assert progress.eta == 20.0
+    assert ScanProgress(0, 10, 0, 0.0).eta is None
+
+
+def test_rescan_skips_known_files_and_follows_moved_ones(library, db, monkeypatch):
+    for i in range(5):
+        (library / f"{i}.mp3").write_bytes(str(i).encode() * 10)
+    LibraryIndexer(db, str(library)).run()
+    with db._conn() as c:
+        c.execute("UPDATE songs SET acoustid='fp' WHERE path=?", (str(library / "0.mp3"),))
+    ids = {row[4]: row[0] for row in db.fetch_all_songs()}
+    (library / "moved").mkdir()
+    (library / "0.mp3").rename(library / "moved" / "zero.mp3")
+    (library / "6.mp3").write_bytes(b"6" * 10)
+    parsed = []
+    monkeypatch.setattr(indexer, "File", lambda path, easy=True: parsed.append(path) or fake_file(path))
+
+    count = LibraryIndexer(db, str(library), workers=2).run()
+
+    assert count == 7
+    assert parsed == [str(library / "6.mp3")]
+    rows = db._conn().execute(
+        "SELECT id, acoustid FROM songs WHERE path=?", (str(library / "moved" / "zero.mp3"),)
+    ).fetchall()
+    assert rows == [(ids[str(library / "0.mp3")], "fp")]
+    assert len(db.fetch_all_songs()) == 7
+
+
+def test_rescan_refreshes_files_changed_in_place(library, db, monkeypatch):
+    LibraryIndexer(db, str(library)).run()
+    edited = library / "1.mp3"
+    edited.write_bytes(b"y" * 12)  # new size
+    retouched = library / "2.mp3"
+    stat = retouched.stat()
+    os.utime(retouched, (stat.st_atime, stat.st_mtime + 60))  # same size, new mtime
+    parsed = []
+
+    def retagged(path, easy=True):
+        parsed.append(path)
+        return SimpleNamespace(tags={"title": ["New title"]}, info=None)
+
+    monkeypatch.setattr(indexer, "File", retagged)
+
+    assert LibraryIndexer(db, str(library)).run() == 6
+
+    assert sorted(parsed) == [str(edited), str(retouched)]
+    rows = {row[4]: row[3] for row in db.fetch_all_songs()}
+    assert len(rows) == 6
+    assert rows[str(edited)] == rows[str(retouched)] == "New title"
+    assert rows[str(library / "0.mp3")] == "Title 0"
+    with db._conn() as c:
+        size, original = c.execute(
+            "SELECT size, original_path FROM songs WHERE path=?", (str(edited),)
+        ).fetchone()
+    assert (size, original) == (12, str(edited))
+
+
+def test_rows_without_content_hash_are_backfilled(library, db, monkeypatch):
+    song = library / "0.mp3"
+    song.write_bytes(b"legacy" * 10)
+    st = song.stat()
+    # A row written before content hashes were stored.
+    db.add_song(
+        name="0",
+        path=str(song),
+        size=st.st_size,
+        modified_date=indexer.modified_date(st.st_mtime),
+        acoustid="fp",
+    )
+    song_id = db.fetch_all_songs()[0][0]
+    parsed = []
+    monkeypatch.setattr(indexer, "File", lambda path, easy=True: parsed.append(path) or fake_file(path))
+
+    LibraryIndexer(db, str(library)).run()
+    assert str(song) not in parsed
+
+    song.rename(library / "sub" / "renamed.mp3")
+    LibraryIndexer(db, str(library)).run()
+
+    with db._conn() as c:
+        rows = c.execute(
+            "SELECT id, acoustid FROM songs WHERE path=?", (str(library / "sub" / "renamed.mp3"),)
+        ).fetchall()
+    assert rows == [(song_id, "fp")]
+    assert str(song) not in {row[4] for row in db.fetch_all_songs()}
@@ -1,13 +1,33 @@
+import os
+import subprocess
+import sys
+
 import pytest
 from songsearch import __main__ as main_module
 
 
 def test_main_missing_pyqt_exits_with_message(monkeypatch, capsys):
     """main() should exit gracefully when PyQt is unavailable."""
-    monkeypatch.setattr(main_module, 'QApplication', None)
-    main_module._IMPORT_ERROR = RuntimeError('boom')
+    monkeypatch.setitem(sys.modules, 'PyQt5.QtWidgets', None)
     with pytest.raises(SystemExit) as excinfo:
-        main_module.main()
+        main_module.main([])
     assert excinfo.value.code == 1
     captured = capsys.readouterr()
     assert 'PyQt5 is required to run the GUI' in captured.err
+
+
+def test_commands_do_not_import_qt(tmp_path):
+    code = (
+        "import sys\n"
+        "from songsearch.__main__ import main\n"
+        "try:\n"
+        f"    main(['search', '--db', {str(tmp_path / 'songs.db')!r}, 'x'])\n"
+        "except SystemExit as exc:\n"
+        "    assert exc.code == 0, exc.code\n"
+        "print(sorted(m for m in sys.modules if m.startswith('PyQt5')))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+    assert out.splitlines()[-1] == "[]"
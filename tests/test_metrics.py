@@ -0,0 +1,89 @@
+import logging
+import re
+
+import pytest
+
+from songsearch import metrics
+from songsearch.db import DatabaseManager
+from songsearch.synthetic import write_flac
+from songsearch.tags import read_tags
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    yield metrics
+    metrics.reset()
+
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+
+    @metrics.timed("stage")
+    def work(x):
+        return x + 1
+
+    assert work(1) == 2
+    with metrics.timer("block"):
+        pass
+    metrics.count("events")
+    metrics.observe("sizes", 10)
+    assert metrics.snapshot() == {"counters": {}, "timers_ms": {}, "histograms": {}}
+    # No allocation per call: the same no-op context manager every time.
+    assert metrics.timer("a") is metrics.timer("b")
+
+
+def test_snapshot(enabled):
+    for seconds in [0.0002] * 98 + [0.02, 2.0]:
+        metrics.REGISTRY.record_time("db.add_songs", seconds)
+    metrics.count("tags.probe", 3)
+    metrics.observe("db.batch_rows", 500)
+
+    snap = metrics.snapshot()
+    timer = snap["timers_ms"]["db.add_songs"]
+    assert timer["count"] == 100
+    assert timer["p50"] == pytest.approx(0.25)  # upper bound of the 0.25 ms bucket
+    assert timer["p99"] == pytest.approx(25)
+    assert timer["max"] == pytest.approx(2000)
+    assert snap["counters"] == {"tags.probe": 3}
+    assert snap["histograms"]["db.batch_rows"]["count"] == 1
+
+
+def test_prometheus_text(enabled):
+    metrics.REGISTRY.record_time('odd"name', 0.003)
+    metrics.REGISTRY.record_time('odd"name', 7.0)
+    metrics.count("remote.acoustid.errors")
+
+    text = metrics.prometheus_text()
+    assert "# TYPE songsearch_stage_duration_seconds histogram" in text
+    assert 'songsearch_events_total{event="remote.acoustid.errors"} 1' in text
+    buckets = re.findall(r'_bucket\{stage="odd\\"name",le="([^"]+)"\} (\d+)', text)
+    counts = [int(n) for _, n in buckets]
+    assert counts == sorted(counts)  # cumulative
+    assert buckets[-1] == ("+Inf", "2")
+    assert dict(buckets)["0.005"] == "1"
+    assert 'songsearch_stage_duration_seconds_count{stage="odd\\"name"} 2' in text
+
+
+def test_stages_report_when_enabled(enabled, tmp_path):
+    path = write_flac(str(tmp_path / "a.flac"), {"title": "Song"})
+    assert read_tags(path)["title"] == "Song"
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": "a", "path": path}])
+    db.search_song_like("song")
+
+    snap = metrics.snapshot()
+    assert {"tags.read", "db.add_songs", "db.search_song_like"} <= set(snap["timers_ms"])
+    assert snap["counters"]["tags.probe"] == 1
+
+
+def test_log_summary(enabled, caplog):
+    metrics.REGISTRY.record_time("search.fuzzy", 0.01)
+    metrics.count("organizer.move.failed")
+    reporter = metrics.LogSummary(interval=3600).start()
+    with caplog.at_level(logging.INFO, logger="songsearch"):
+        reporter.stop()
+    assert "search.fuzzy: n=1" in caplog.text
+    assert "organizer.move.failed=1" in caplog.text
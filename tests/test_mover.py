@@ -0,0 +1,205 @@
+import json
+import os
+
+import pytest
+
+from songsearch.db import DatabaseManager
+from songsearch.organizer.mover import MoveExecutor, MoveJournal
+
+
+def _files(tmp_path, n):
+    src = tmp_path / "src"
+    src.mkdir()
+    moves = []
+    for i in range(n):
+        path = src / f"{i}.mp3"
+        path.write_bytes(b"x" * (i + 1))
+        moves.append((str(path), str(tmp_path / "dest" / f"d{i % 2}" / f"{i}.mp3")))
+    return moves
+
+
+def _executor(tmp_path, **kw):
+    return MoveExecutor(MoveJournal(str(tmp_path / "moves.journal")), **kw)
+
+
+def _songs(db):
+    with db._conn() as c:
+        return c.execute("SELECT path, final_path, move_status FROM songs ORDER BY id").fetchall()
+
+
+def test_same_device_moves_are_renames(tmp_path):
+    moves = _files(tmp_path, 4)
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": str(i), "path": src} for i, (src, _) in enumerate(moves)])
+    results = []
+
+    summary = _executor(tmp_path, db=db).run(moves, results.append)
+
+    assert (summary.moved, summary.renamed, summary.copied, summary.failed) == (4, 4, 0, 0)
+    assert [r.status for r in results] == ["moved"] * 4
+    assert all(os.path.exists(dest) and not os.path.exists(src) for src, dest in moves)
+    assert _songs(db) == [(dest, dest, "moved") for _, dest in moves]
+
+
+def test_cross_device_moves_are_copied(tmp_path, monkeypatch):
+    moves = _files(tmp_path, 5)
+    executor = _executor(tmp_path, copy_workers=2)
+    # Pretend every destination is on another filesystem.
+    monkeypatch.setattr(executor, "_device", lambda path: -1)
+
+    summary = executor.run(moves)
+
+    assert (summary.moved, summary.copied) == (5, 5)
+    assert summary.bytes_copied == sum(range(1, 6))
+    for i, (src, dest) in enumerate(moves):
+        assert not os.path.exists(src)
+        assert os.path.getsize(dest) == i + 1
+        assert not os.path.exists(dest + ".part")
+
+
+def test_existing_destination_is_not_overwritten(tmp_path):
+    (src, dest), = _files(tmp_path, 1)
+    os.makedirs(os.path.dirname(dest))
+    with open(dest, "wb") as fh:
+        fh.write(b"keep")
+
+    summary = _executor(tmp_path).run([(src, dest)])
+
+    assert summary.failed == 1 and "destination exists" in summary.failures[0].error
+    assert os.path.exists(src)
+    assert open(dest, "rb").read() == b"keep"
+
+
+@pytest.mark.parametrize("cross_device", [False, True])
+def test_moves_sharing_a_destination(tmp_path, monkeypatch, cross_device):
+    (a, _), (b, _) = _files(tmp_path, 2)
+    dest = str(tmp_path / "dest" / "x.mp3")
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": "a", "path": a}, {"name": "b", "path": b}])
+    executor = _executor(tmp_path, db=db)
+    if cross_device:
+        monkeypatch.setattr(executor, "_device", lambda path: -1)
+
+    summary = executor.run([(a, dest), (b, dest)])
+
+    assert (summary.moved, summary.failed) == (1, 1)
+    assert summary.failures[0].src == b
+    assert "another move" in summary.failures[0].error
+    assert open(dest, "rb").read() == b"x" and open(b, "rb").read() == b"xx"
+    assert [row[0] for row in _songs(db)] == [dest, b]
+    assert executor.rollback().undone == 1
+    assert open(a, "rb").read() == b"x"
+
+
+@pytest.mark.parametrize("cross_device", [False, True])
+def test_destination_created_during_the_run_is_kept(tmp_path, monkeypatch, cross_device):
+    (src, dest), = _files(tmp_path, 1)
+    executor = _executor(tmp_path)
+    device = executor._device
+
+    def racing_device(path):
+        # Another program creates the file after the existence check.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(b"late")
+        return -1 if cross_device else device(path)
+
+    monkeypatch.setattr(executor, "_device", racing_device)
+    summary = executor.run([(src, dest)])
+
+    assert summary.failed == 1
+    assert open(dest, "rb").read() == b"late"
+    assert os.path.exists(src) and not os.path.exists(dest + ".part")
+
+
+@pytest.mark.parametrize("cross_device", [False, True])
+def test_destination_folder_that_cannot_be_created(tmp_path, monkeypatch, cross_device):
+    moves = _files(tmp_path, 3)
+    blocker = tmp_path / "dest" / "d0"
+    blocker.parent.mkdir()
+    blocker.write_bytes(b"")  # a file where a folder is needed
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": str(i), "path": src} for i, (src, _) in enumerate(moves)])
+    executor = _executor(tmp_path, db=db)
+    if cross_device:
+        monkeypatch.setattr(executor, "_device", lambda path: -1)
+
+    summary = executor.run(moves)
+
+    # Moves 0 and 2 go below d0, move 1 below d1.
+    assert (summary.moved, summary.failed) == (1, 2)
+    assert {r.src for r in summary.failures} == {moves[0][0], moves[2][0]}
+    assert os.path.exists(moves[1][1]) and not os.path.exists(moves[1][0])
+    assert executor.pending() == 0
+    assert [row[0] for row in _songs(db)] == [moves[0][0], moves[1][1], moves[2][0]]
+
+
+def test_stale_row_at_destination_is_replaced(tmp_path):
+    (src, dest), = _files(tmp_path, 1)
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": "new", "path": src}, {"name": "gone", "path": dest}])
+
+    summary = _executor(tmp_path, db=db).run([(src, dest)])
+
+    assert summary.moved == 1
+    with db._conn() as c:
+        assert c.execute("SELECT name, path FROM songs").fetchall() == [("new", dest)]
+
+
+def test_resume_after_crash_between_link_and_unlink(tmp_path):
+    (src, dest), = _files(tmp_path, 1)
+    executor = _executor(tmp_path)
+    executor.journal.start([(src, dest)])
+    os.makedirs(os.path.dirname(dest))
+    os.link(src, dest)
+
+    summary = executor.resume()
+
+    assert (summary.moved, summary.failed) == (1, 0)
+    assert os.path.exists(dest) and not os.path.exists(src)
+
+
+def test_resume_after_crash(tmp_path):
+    moves = _files(tmp_path, 4)
+    journal = MoveJournal(str(tmp_path / "moves.journal"))
+    # Simulate a crash: the plan was journaled, move 0 was recorded, move 1
+    # happened without its journal line and move 2 left a partial copy.
+    journal.start(moves)
+    journal.record("done", 0, "rename")
+    journal.close()
+    for src, dest in moves[:2]:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(src, dest)
+    with open(moves[2][1] + ".part", "wb") as fh:
+        fh.write(b"partial")
+    with open(journal.path, "a") as fh:
+        fh.write('{"event": "do')  # torn line
+
+    executor = MoveExecutor(journal)
+    assert executor.pending() == 3
+    with pytest.raises(RuntimeError):
+        executor.run(moves)
+
+    summary = executor.resume()
+
+    assert (summary.moved, summary.failed) == (3, 0)
+    assert all(os.path.exists(dest) and not os.path.exists(src) for src, dest in moves)
+    assert not os.path.exists(moves[2][1] + ".part")
+    assert executor.pending() == 0
+
+
+def test_rollback_restores_sources(tmp_path):
+    moves = _files(tmp_path, 3)
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": str(i), "path": src} for i, (src, _) in enumerate(moves)])
+    executor = _executor(tmp_path, db=db)
+    executor.run(moves)
+
+    summary = executor.rollback()
+
+    assert summary.undone == 3
+    assert all(os.path.exists(src) and not os.path.exists(dest) for src, dest in moves)
+    assert [row[0] for row in _songs(db)] == [src for src, _ in moves]
+    assert {row[2] for row in _songs(db)} == {"rolled_back"}
+    events = [json.loads(line)["event"] for line in open(executor.journal.path)]
+    assert events.count("undone") == 3
@@ -3,7 +3,10 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import pytest
+
 from songsearch.organizer import build_destination
+from songsearch.organizer.destination import TemplateError, compile_template
 
 
 def test_build_destination_basic(tmp_path):
@@ -48,3 +51,38 @@ def test_safe_truncation_and_ext(tmp_path):
     assert filename == f"{truncated} - {truncated}.mp3"
     artist_dir = os.path.basename(os.path.dirname(dest))
     assert artist_dir == truncated
+
+
+def test_template_fallbacks_and_sections(tmp_path):
+    template = compile_template("{albumartist|artist}/{album}/[Disc {disc}/][{track} - ]{title}{ext}")
+    assert template.fields == {"albumartist", "artist", "album", "disc", "track", "title", "ext"}
+
+    dests = template.render_many(
+        str(tmp_path),
+        [
+            ({"artist": "A", "album": "X", "title": "T", "track": "3/12"}, ".MP3"),
+            ({"artist": "A", "albumartist": "V/A", "title": "T", "disc": "2/2"}, ".flac"),
+        ],
+    )
+    assert dests == [
+        str(tmp_path / "A" / "X" / "03 - T.mp3"),
+        str(tmp_path / "V_A" / "Unknown" / "Disc 2" / "T.flac"),
+    ]
+
+
+def test_template_escapes():
+    assert compile_template("[[{year}]] {{x}}").render_relative({"year": "1999"}, "") == "[1999] {x}"
+
+
+@pytest.mark.parametrize("template", ["{nope}", "{year", "[{year}", "{year}]", "x}", "{artist|}"])
+def test_invalid_templates_are_rejected(template):
+    with pytest.raises(TemplateError):
+        compile_template(template)
+
+
+def test_default_template_matches_format(tmp_path):
+    meta = {"year": "2001", "month": "02", "genre": "Pop", "artist": "B:C", "title": "D?"}
+    expected = os.path.normpath(
+        os.path.join(str(tmp_path), "2001/02/Pop/B_C/B_C - D_.ogg")
+    )
+    assert build_destination(str(tmp_path), meta, ".OGG") == expected
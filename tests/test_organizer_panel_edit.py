@@ -1,42 +1,150 @@
+from PyQt5.QtCore import QItemSelectionModel, Qt
+
+from songsearch.db import DatabaseManager
 from songsearch.ui.organizer_panel import OrganizerPanel
 
 
-def test_edit_updates_plan_and_destination(monkeypatch, qtbot):
-    def fake_plan_moves(paths, base):
-        return [
-            {
-                "original_path": "song.mp3",
-                "proposed_path": "/dest/OldGenre/2000.mp3",
-                "status": "ok",
-                "reason": "planned",
-                "title": "Title",
-                "artist": "Artist",
-                "album": "",
-                "year": "2000",
-                "month": "",
-                "genre": "OldGenre",
-            }
-        ]
-
-    def fake_build(base, meta, ext):
-        return f"{base}/{meta['genre']}/{meta['year']}{ext}"
-
-    monkeypatch.setattr("songsearch.ui.organizer_panel.plan_moves", fake_plan_moves)
-    monkeypatch.setattr("songsearch.ui.organizer_panel.build_destination", fake_build)
+def _entry(path, genre="OldGenre", year="2000", status="ok"):
+    return {
+        "original_path": path,
+        "proposed_path": f"/dest/{genre}/{year}.mp3" if status == "ok" else "",
+        "status": status,
+        "reason": "planned" if status == "ok" else "no metadata",
+        "title": "Title",
+        "artist": "Artist",
+        "album": "",
+        "year": year,
+        "month": "",
+        "genre": genre,
+    }
+
+
+def _make_panel(monkeypatch, qtbot, plan, tmp_path):
+    monkeypatch.setattr(
+        "songsearch.ui.organizer_panel.plan_moves", lambda paths, base, template: plan
+    )
 
     panel = OrganizerPanel()
     qtbot.addWidget(panel)
-    panel.file_paths = ["song.mp3"]
+    panel.template_edit.setText("{genre}/{year}{ext}")
+    panel._db = DatabaseManager(str(tmp_path / "songs.db"))
+    panel.file_paths = [e["original_path"] for e in plan]
     panel.dest_dir = "/dest"
     panel.plan_files()
+    return panel
+
+
+def test_edit_updates_plan_and_destination(monkeypatch, qtbot, tmp_path):
+    panel = _make_panel(monkeypatch, qtbot, [_entry("song.mp3")], tmp_path)
+    model = panel.plan_model
+
+    assert model.setData(model.index(0, 3), "NewGenre")
+    assert model.row(0)["genre"] == "NewGenre"
+    assert model.row(0)["proposed_path"] == "/dest/NewGenre/2000.mp3"
+
+    assert model.setData(model.index(0, 4), "2020")
+    assert model.row(0)["year"] == "2020"
+    assert model.row(0)["proposed_path"] == "/dest/NewGenre/2020.mp3"
+    assert model.index(0, 2).data() == "/dest/NewGenre/2020.mp3"
+
+
+def test_bulk_edit_selected_rows(monkeypatch, qtbot, tmp_path):
+    plan = [_entry(f"{i}.mp3") for i in range(4)] + [_entry("bad.mp3", status="error")]
+    panel = _make_panel(monkeypatch, qtbot, plan, tmp_path)
+    model = panel.plan_model
+    changed = []
+    model.dataChanged.connect(lambda top, bottom, roles: changed.append((top.row(), bottom.row())))
+
+    selection = panel.plan_table.selectionModel()
+    for row in (1, 3, 4):
+        selection.select(
+            model.index(row, 0), QItemSelectionModel.Select | QItemSelectionModel.Rows
+        )
+    panel.bulk_field.setCurrentIndex(panel.bulk_field.findData("year"))
+    panel.bulk_value.setText("1999")
+    panel.apply_to_selection()
+
+    assert changed == [(1, 4)]
+    assert [model.row(i)["year"] for i in range(5)] == ["2000", "1999", "2000", "1999", "1999"]
+    assert model.row(1)["proposed_path"] == "/dest/OldGenre/1999.mp3"
+    assert model.row(3)["proposed_path"] == "/dest/OldGenre/1999 (2).mp3"
+    # rows that could not be planned keep an empty destination
+    assert model.row(4)["proposed_path"] == ""
+    assert list(model.checked_rows()) == [0, 1, 2, 3]
+
+
+def test_edit_that_makes_destinations_collide(monkeypatch, qtbot, tmp_path):
+    plan = [_entry("a.mp3", genre="Rock"), _entry("b.mp3", genre="Pop"), _entry("c.mp3", genre="Jazz")]
+    panel = _make_panel(monkeypatch, qtbot, plan, tmp_path)
+    model = panel.plan_model
+
+    assert model.setData(model.index(2, 3), "Rock")
+    assert [r["proposed_path"] for r in model.rows()] == [
+        "/dest/Rock/2000.mp3",
+        "/dest/Pop/2000.mp3",
+        "/dest/Rock/2000 (2).mp3",
+    ]
+
+    panel.collision_strategy.setCurrentIndex(panel.collision_strategy.findData("skip"))
+    selection = panel.plan_table.selectionModel()
+    selection.select(model.index(1, 0), QItemSelectionModel.Select | QItemSelectionModel.Rows)
+    panel.bulk_field.setCurrentIndex(panel.bulk_field.findData("genre"))
+    panel.bulk_value.setText("Rock")
+    panel.apply_to_selection()
+
+    assert model.row(1)["status"] == "collision"
+    assert model.row(1)["reason"] == "same destination as a.mp3"
+    assert list(model.checked_rows()) == [0, 2]
+    assert panel._checked_moves(report=False) == [
+        ("a.mp3", "/dest/Rock/2000.mp3"),
+        ("c.mp3", "/dest/Rock/2000 (2).mp3"),
+    ]
+
+
+def test_unchecked_rows_are_not_moved(monkeypatch, qtbot, tmp_path):
+    src = tmp_path / "a.mp3"
+    src.write_bytes(b"x")
+    entry = _entry(str(src))
+    entry["proposed_path"] = str(tmp_path / "out" / "a.mp3")
+    panel = _make_panel(monkeypatch, qtbot, [entry], tmp_path)
+    panel.journal_path = str(tmp_path / "moves.journal")
+    model = panel.plan_model
+
+    model.setData(model.index(0, 0), Qt.Unchecked, Qt.CheckStateRole)
+    panel.organize_files()
+    panel.wait_for_moves()
+    assert src.exists()
+
+    model.setData(model.index(0, 0), Qt.Checked, Qt.CheckStateRole)
+    panel.estimate_files()
+    assert "Estimación: 1 renombrados, 0 copias" in panel.log.toPlainText()
+    assert src.exists()
+    panel.organize_files()
+    qtbot.waitUntil(lambda: all(b.isEnabled() for b in panel.move_buttons))
+    assert (tmp_path / "out" / "a.mp3").exists()
+    assert not src.exists()
+
+    panel.rollback_moves()
+    qtbot.waitUntil(lambda: all(b.isEnabled() for b in panel.move_buttons))
+    assert src.exists()
+    assert "restaurados: 1" in panel.log.toPlainText()
+
 
-    genre_item = panel.plan_table.item(0, 3)
-    genre_item.setText("NewGenre")
-    assert panel.plan[0]["genre"] == "NewGenre"
-    assert panel.plan[0]["proposed_path"] == "/dest/NewGenre/2000.mp3"
+def test_saved_plan_reopens_with_edits(monkeypatch, qtbot, tmp_path):
+    plan = [_entry(f"{i}.mp3") for i in range(3)]
+    panel = _make_panel(monkeypatch, qtbot, plan, tmp_path)
+    model = panel.plan_model
+    model.setData(model.index(1, 3), "Jazz")
+    model.setData(model.index(2, 0), Qt.Unchecked, Qt.CheckStateRole)
+    panel.save_plan()
 
-    year_item = panel.plan_table.item(0, 4)
-    year_item.setText("2020")
-    assert panel.plan[0]["year"] == "2020"
-    assert panel.plan[0]["proposed_path"] == "/dest/NewGenre/2020.mp3"
+    other = OrganizerPanel()
+    qtbot.addWidget(other)
+    other._db = panel.db
+    other.open_last_plan()
 
+    assert other.plan_id == panel.plan_id
+    assert other.dest_dir == "/dest"
+    assert [r["genre"] for r in other.plan_model.rows()] == ["OldGenre", "Jazz", "OldGenre"]
+    assert other.plan_model.row(1)["proposed_path"] == "/dest/Jazz/2000.mp3"
+    assert list(other.plan_model.checked_rows()) == [0, 1]
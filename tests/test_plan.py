@@ -1,6 +1,9 @@
 import csv
 
-from songsearch.organizer import plan_moves, export_plan_csv
+import pytest
+
+from songsearch.organizer import plan_moves, export_plan_csv, import_plan_csv
+from songsearch.organizer.destination import TemplateError
 
 
 def test_plan_moves_success(monkeypatch):
@@ -12,7 +15,7 @@ def test_plan_moves_success(monkeypatch):
         assert path == "input/song.MP3"
         return {"title": "MBTitle", "artist": "MBArtist", "year": "2021"}
 
-    def fake_build(base, meta, ext):
+    def fake_build(base, meta, ext, template):
         assert base == "/base"
         assert ext == ".MP3"
         assert meta["title"] == "MBTitle"
@@ -40,6 +43,9 @@ def test_plan_moves_success(monkeypatch):
             "year": "2021",
             "month": "",
             "genre": "LocalGenre",
+            "albumartist": "",
+            "track": "",
+            "disc": "",
         }
     ]
 
@@ -63,10 +69,18 @@ def test_plan_moves_error(monkeypatch):
             "year": "",
             "month": "",
             "genre": "",
+            "albumartist": "",
+            "track": "",
+            "disc": "",
         }
     ]
 
 
+def test_plan_moves_rejects_invalid_template():
+    with pytest.raises(TemplateError):
+        plan_moves(["a.mp3"], "/base", "{artist}/{nope}{ext}")
+
+
 def test_export_plan_csv(tmp_path):
     plan = [
         {
@@ -106,3 +120,18 @@ def test_export_plan_csv(tmp_path):
     assert len(rows) == 2
     assert rows[0]["original_path"] == "a"
     assert rows[1]["status"] == "error"
+
+
+def test_csv_round_trip_streams(tmp_path):
+    def entries():
+        for i in range(1000):
+            yield {"original_path": f"{i}.mp3", "proposed_path": f"/d/{i}.mp3", "status": "ok", "extra": 1}
+
+    csv_path = str(tmp_path / "plan.csv")
+    assert export_plan_csv(entries(), csv_path) == (1000, 0)
+
+    rows = import_plan_csv(csv_path)
+    first = next(rows)
+    assert first["original_path"] == "0.mp3" and first["genre"] == ""
+    assert "extra" not in first
+    assert sum(1 for _ in rows) == 999
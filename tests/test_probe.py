@@ -0,0 +1,74 @@
+import pytest
+from mutagen import File
+
+from songsearch import indexer, probe as probe_module
+from songsearch import synthetic
+from songsearch.probe import probe
+from songsearch.tags import read_tags
+
+TAGS = {
+    "title": "Tïtle",
+    "artist": "Ártist",
+    "album": "Album",
+    "genre": "Rock",
+    "date": "1999-07",
+    "albumartist": "Various",
+    "tracknumber": "3/12",
+    "discnumber": "1",
+}
+
+
+@pytest.fixture(
+    params=[
+        ("a.mp3", synthetic.write_mp3, {}),
+        ("b.mp3", synthetic.write_mp3, {"v2_version": 3}),
+        ("c.mp3", synthetic.write_mp3, {"xing": True}),
+        ("d.flac", synthetic.write_flac, {"picture": b"j" * 200_000}),
+        ("e.ogg", synthetic.write_ogg, {}),
+        ("f.m4a", synthetic.write_m4a, {}),
+    ],
+    ids=lambda p: p[0],
+)
+def sample(request, tmp_path):
+    name, build, kw = request.param
+    return build(str(tmp_path / name), TAGS, **kw)
+
+
+def test_probe_matches_mutagen(sample):
+    expected = File(sample, easy=True)
+    result = probe(sample)
+
+    assert result is not None
+    assert result.tags == {k: list(v) for k, v in expected.tags.items()}
+    assert result.length == pytest.approx(expected.info.length)
+    # Only the metadata is read: not the embedded picture, not the audio.
+    assert result.bytes_read < 8192
+
+
+def test_unusual_files_are_left_to_mutagen(tmp_path):
+    numeric_genre = synthetic.write_mp3(str(tmp_path / "g.mp3"), {"genre": "(17)"})
+    no_id3 = tmp_path / "raw.mp3"
+    no_id3.write_bytes(synthetic.MP3_FRAME * 10)
+    garbage = tmp_path / "x.flac"
+    garbage.write_bytes(b"fLaC\x00\xff")
+
+    for path in (numeric_genre, str(no_id3), str(garbage), str(tmp_path / "missing.mp3")):
+        assert probe(path) is None
+    assert read_tags(numeric_genre)["genre"] == "Rock"
+
+
+def test_song_record_skips_mutagen(tmp_path, monkeypatch):
+    path = synthetic.write_flac(str(tmp_path / "s.flac"), TAGS, seconds=61.5)
+    monkeypatch.setattr(indexer, "File", lambda *a, **kw: pytest.fail("mutagen used"))
+    record = indexer.song_record(path)
+    assert (record["title"], record["year"], record["month"], record["duration"]) == (
+        "Tïtle",
+        "1999",
+        "07",
+        61,
+    )
+    assert read_tags(path)["track"] == "3/12"
+
+    monkeypatch.setattr(probe_module, "FAST_PROBE", False)
+    with pytest.raises(pytest.fail.Exception):
+        indexer.song_record(path)
@@ -0,0 +1,114 @@
+import io
+import os
+import pstats
+import threading
+
+import pytest
+
+from songsearch import cli, config, profiling
+from songsearch.db import DatabaseManager
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    path = tmp_path / "profiles"
+    monkeypatch.setattr(config, "PROFILE_DIR", str(path))
+    monkeypatch.setattr(profiling, "ACTIVE_MODES", frozenset())
+    monkeypatch.setattr(profiling, "TOP", profiling.DEFAULT_TOP)
+    return path
+
+
+def files(path, ext):
+    return sorted(str(p) for p in path.glob(f"*{ext}")) if path.exists() else []
+
+
+def busy(n=20000):
+    return sum(i * i for i in range(n))
+
+
+def test_parse_modes(profile_dir, caplog):
+    assert profiling.configure("all") == frozenset(profiling.MODES)
+    assert profiling.configure("CPU, memory,gpu") == {"cpu", "memory"}
+    assert "gpu" in caplog.text
+    assert profiling.configure("") == frozenset()
+
+
+def test_cpu_and_memory(profile_dir):
+    with profiling.profile("scan", modes={"cpu", "memory"}):
+        busy()
+        blob = [bytearray(1024) for _ in range(2048)]  # noqa: F841 - ~2 MiB peak
+        del blob
+
+    (txt,) = files(profile_dir, ".txt")
+    assert os.path.basename(txt).startswith("scan-")
+    report = open(txt, encoding="utf-8").read()
+    assert "== cpu: top 30 by cumulative ==" in report
+    assert "busy" in report
+    peak = float(report.split("== memory: peak ")[1].split(" MiB")[0])
+    assert peak >= 2.0
+    (prof,) = files(profile_dir, ".prof")
+    assert any(name == "busy" for _, _, name in pstats.Stats(prof).stats)
+    assert files(profile_dir, ".folded") == []
+
+
+def test_sample_sees_worker_threads(profile_dir):
+    done = threading.Event()
+
+    def spin():
+        while not done.is_set():
+            busy(1000)
+
+    with profiling.profile("search", modes={"sample"}):
+        worker = threading.Thread(target=spin)
+        worker.start()
+        done.wait(0.2)
+        done.set()
+        worker.join()
+
+    (folded,) = files(profile_dir, ".folded")
+    stacks = open(folded, encoding="utf-8").read()
+    assert "test_profiling.py:spin;test_profiling.py:busy" in stacks
+    # The profiled thread was idle, waiting on the event: not sampled.
+    assert "test_sample_sees_worker_threads;threading.py:wait" not in stacks
+    assert "== sample:" in open(files(profile_dir, ".txt")[0], encoding="utf-8").read()
+
+
+def test_nested_operations_share_one_profile(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "ACTIVE_MODES", frozenset({"cpu"}))
+
+    @profiling.profiled("plan")
+    def plan():
+        return busy()
+
+    with profiling.profile("organize"):
+        plan()
+        plan()
+    plan()
+
+    names = sorted(os.path.basename(p).split("-")[0] for p in files(profile_dir, ".txt"))
+    assert names == ["organize", "plan"]
+
+
+def test_off_by_default(profile_dir):
+    @profiling.profiled("scan")
+    def scan(x):
+        return x * 2
+
+    assert scan(21) == 42
+    with profiling.profile("search"):
+        pass
+    assert not profile_dir.exists()
+
+
+def test_cli_profile_option(profile_dir, tmp_path):
+    db_path = str(tmp_path / "songs.db")
+    DatabaseManager(db_path).add_song(name="a", title="Hey Jude", path="/m/a.mp3")
+    code = cli.main(
+        ["search", "--db", db_path, "--profile", "cpu", "--profile-top", "5", "hey jude"],
+        stdout=io.StringIO(),
+    )
+
+    assert code == 0
+    (txt,) = files(profile_dir, ".txt")
+    assert os.path.basename(txt).startswith("search-")
+    assert "== cpu: top 5 by tottime ==" in open(txt, encoding="utf-8").read()
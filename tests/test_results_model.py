@@ -0,0 +1,46 @@
+import time
+
+from PyQt5.QtCore import QModelIndex, Qt
+
+from songsearch.ui.results_model import (
+    FOUND,
+    NOT_FOUND,
+    IdRole,
+    PathRole,
+    SearchResultsModel,
+    StatusRole,
+)
+
+
+def test_roles(qtbot):
+    model = SearchResultsModel()
+    model.append("Hey Jude", FOUND, "/m/1.mp3", 1)
+    model.append("missing", NOT_FOUND, identifier="missing")
+    found, missing = model.index(0), model.index(1)
+    assert found.data() == "Hey Jude"
+    assert found.data(StatusRole) == FOUND
+    assert found.data(PathRole) == "/m/1.mp3"
+    assert found.data(IdRole) == 1
+    assert found.data(Qt.ToolTipRole) == "/m/1.mp3"
+    assert missing.data(Qt.ToolTipRole) == "No encontrado."
+    assert found.data(Qt.ForegroundRole) != missing.data(Qt.ForegroundRole)
+
+    model.mark_found(1, "/m/assigned.mp3")
+    assert missing.data(StatusRole) == FOUND
+    assert missing.data(PathRole) == "/m/assigned.mp3"
+
+
+def test_lazy_fetch_and_clear(qtbot):
+    model = SearchResultsModel()
+    start = time.perf_counter()
+    model.extend((f"song {i}", FOUND, f"/m/{i}.mp3", i) for i in range(100_000))
+    assert time.perf_counter() - start < 2
+    assert len(model) == 100_000
+    assert model.rowCount() == SearchResultsModel.FETCH_BATCH
+    assert model.canFetchMore(QModelIndex())
+    model.fetchMore(QModelIndex())
+    assert model.rowCount() == 2 * SearchResultsModel.FETCH_BATCH
+
+    model.clear()
+    assert model.rowCount() == 0 and len(model) == 0
+    assert not model.canFetchMore(QModelIndex())
@@ -0,0 +1,88 @@
+import pytest
+
+from songsearch.db import DatabaseManager
+from songsearch.search import fuzzy_search
+from songsearch.search.index import SearchIndex
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_song(name="song1.mp3", artist="The Beatles", title="Hey Jude", path="1.mp3")
+    db.add_song(name="song2.mp3", artist="Queen", title="Bohemian Rhapsody", path="2.mp3")
+    db.add_song(name="bohemian_live.mp3", artist="Queen", title=None, path="3.mp3")
+    return db
+
+
+def test_write_generation_tracks_changes(db):
+    instance, gen = db.write_generation()
+    db.add_song(name="x", path="x.mp3")
+    db.add_song(name="x", path="x.mp3")  # ignored duplicate
+    assert db.write_generation() == (instance, gen + 1)
+    db.update_song_location(1, "moved.mp3")
+    assert db.write_generation()[1] == gen + 2
+    assert db.changed_song_ids(gen) == [1, 4]
+
+
+def test_build_and_candidates(db, tmp_path):
+    index = SearchIndex(str(tmp_path / "search.idx"))
+    assert not index.is_fresh(db)
+    assert index.refresh(db) == "rebuilt"
+    assert index.is_fresh(db)
+    assert len(index) == 3
+    assert index.candidate_ids("BOHEMIAN", "song") == [2, 3]
+    assert index.candidate_ids("queen", "artist") == [2, 3]
+    assert index.candidate_ids("", "artist") == [1, 2, 3]
+    # keys never match across row boundaries
+    assert index.candidate_ids("judebohemian", "song") == []
+
+    reopened = SearchIndex(index.path)
+    assert reopened.is_fresh(db)
+    assert reopened.refresh(db) == "fresh"
+
+
+def test_incremental_refresh(db, tmp_path):
+    index = SearchIndex(str(tmp_path / "search.idx"))
+    index.refresh(db)
+    db.add_song(name="new.mp3", artist="Björk", title="Jóga", path="4.mp3")
+    with db._conn() as c:
+        c.execute("UPDATE songs SET title='Let It Be' WHERE id=1")
+        c.execute("DELETE FROM songs WHERE id=2")
+    assert not index.is_fresh(db)
+    assert index.refresh(db) == "incremental"
+    assert index.candidate_ids("", "song") == [1, 3, 4]
+    assert index.candidate_ids("let it", "song") == [1]
+    assert index.candidate_ids("JÓGA", "song") == [4]
+    assert index.candidate_ids("bohemian", "song") == [3]
+
+
+def test_new_database_forces_rebuild(db, tmp_path):
+    index = SearchIndex(str(tmp_path / "search.idx"))
+    index.refresh(db)
+    other = DatabaseManager(str(tmp_path / "other.db"))
+    assert not index.is_fresh(other)
+    assert index.refresh(other) == "rebuilt"
+    assert len(index) == 0
+
+
+def test_invalid_file_is_ignored(db, tmp_path):
+    path = tmp_path / "search.idx"
+    path.write_bytes(b"garbage" * 20)
+    index = SearchIndex(str(path))
+    assert len(index) == 0
+    assert index.refresh(db) == "rebuilt"
+
+
+def test_fuzzy_search_uses_fresh_index(db, tmp_path, monkeypatch):
+    for i in range(10):
+        db.add_song(name=f"filler{i}", artist="Other", title=f"Filler {i}", path=f"f{i}.mp3")
+    index = SearchIndex(str(tmp_path / "search.idx"))
+    expected = fuzzy_search(db, "bohemian", "song", 50)
+    index.refresh(db)
+    with monkeypatch.context() as m:
+        m.setattr(db, "fetch_all_for_fuzzy", lambda *a: pytest.fail("LIKE scan used"))
+        assert fuzzy_search(db, "bohemian", "song", 50, index=index) == expected
+    # a stale index falls back to the LIKE scan
+    db.add_song(name="b", artist="X", title="Bohemian Grove", path="b.mp3")
+    stale = fuzzy_search(db, "bohemian", "song", 50, index=index)
+    assert {r["title"] for r in stale} == {"Bohemian Rhapsody", "Bohemian Grove", None}
@@ -0,0 +1,126 @@
+import pytest
+
+from songsearch.db import DatabaseManager
+from songsearch.search.index import SearchIndex
+from songsearch.ui import search_panel
+from songsearch.ui.search_worker import CancelToken, SearchSignals, SearchTask
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_song(name="song1.mp3", artist="The Beatles", title="Hey Jude", path="1.mp3")
+    db.add_song(name="song2.mp3", artist="Queen", title="Bohemian Rhapsody", path="2.mp3")
+    return db
+
+
+def _run_task(db, queries, token, tmp_path):
+    signals = SearchSignals()
+    partial, finished = [], []
+    signals.partial.connect(lambda rid, q, m: partial.append((rid, q, [r["id"] for r in m])))
+    signals.finished.connect(lambda rid, found: finished.append((rid, found)))
+    index = SearchIndex(str(tmp_path / "search.idx"))
+    SearchTask(7, queries, "song", 70, db, index, signals, token).run()
+    return partial, finished
+
+
+def test_search_task_reports_each_query(db, tmp_path, qtbot):
+    partial, finished = _run_task(db, ["Hey Jude", "nothing here"], CancelToken(), tmp_path)
+    assert partial == [(7, "Hey Jude", [1]), (7, "nothing here", [])]
+    assert finished == [(7, True)]
+
+
+def test_cancelled_task_reports_nothing(db, tmp_path, qtbot):
+    token = CancelToken()
+    token.cancel()
+    assert _run_task(db, ["Hey Jude"], token, tmp_path) == ([], [])
+
+
+@pytest.fixture
+def panel(db, tmp_path, monkeypatch, qtbot):
+    monkeypatch.setattr(search_panel, "DatabaseManager", lambda: db)
+    monkeypatch.setattr(
+        search_panel, "SearchIndex", lambda: SearchIndex(str(tmp_path / "search.idx"))
+    )
+    panel = search_panel.SearchPanel()
+    qtbot.addWidget(panel)
+    return panel
+
+
+def _texts(panel):
+    model = panel.results_model
+    return [model.index(i).data() for i in range(model.rowCount())]
+
+
+def test_search_as_you_type(panel, qtbot):
+    panel.input_text.setPlainText("bohem")
+    qtbot.waitUntil(lambda: _texts(panel) == ["Bohemian Rhapsody"], timeout=2000)
+    # results of a live search do not spam the log
+    assert panel.log.toPlainText() == ""
+
+    panel.input_text.setPlainText("he")  # below the live-search minimum
+    qtbot.waitUntil(lambda: panel.results_model.rowCount() == 0, timeout=2000)
+
+
+def test_newer_search_supersedes_older(panel, qtbot):
+    panel.input_text.setPlainText("Hey Jude")
+    panel._perform_search()
+    panel.input_text.setPlainText("Bohemian Rhapsody")
+    panel._perform_search()
+    qtbot.waitUntil(lambda: "completada" in panel.log.toPlainText(), timeout=2000)
+    assert _texts(panel) == ["Bohemian Rhapsody"]
+
+
+def test_double_click_assigns_location(panel, db, qtbot, monkeypatch):
+    monkeypatch.setattr(
+        search_panel.QFileDialog, "getOpenFileName", lambda *a, **k: ("/new/1.mp3", "")
+    )
+    panel._add_result("song1.mp3", "not_found", identifier="song1.mp3")
+    panel._handle_double_click(panel.results_model.index(0))
+    assert panel.results_model.index(0).data(search_panel.StatusRole) == "found"
+    assert db.fetch_songs_by_ids([1])[0][4] == "/new/1.mp3"
+
+
+def test_update_database_runs_in_background(panel, tmp_path, qtbot, monkeypatch):
+    from songsearch import indexer
+
+    monkeypatch.setattr(
+        indexer,
+        "File",
+        lambda path, easy=True: type("A", (), {"tags": {"title": ["Yesterday"]}, "info": None})(),
+    )
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "yesterday.mp3").write_bytes(b"x")
+    panel.selected_folder = str(tmp_path / "lib")
+
+    panel._update_database()
+    assert not panel.update_button.isEnabled()
+    qtbot.waitUntil(lambda: "actualizada con 1" in panel.log.toPlainText(), timeout=5000)
+    assert panel.update_button.isEnabled()
+    assert panel.index_box.isHidden()
+
+    panel.input_text.setPlainText("Yesterday")
+    panel._perform_search()
+    qtbot.waitUntil(lambda: _texts(panel) == ["Yesterday"], timeout=2000)
+
+
+def test_watch_keeps_folder_in_sync(panel, tmp_path, monkeypatch, qtbot):
+    from songsearch import indexer
+
+    monkeypatch.setattr(
+        indexer,
+        "File",
+        lambda path, easy=True: type("A", (), {"tags": {"title": ["Yesterday"]}, "info": None})(),
+    )
+    (tmp_path / "lib").mkdir()
+    panel.selected_folder = str(tmp_path / "lib")
+    panel.watch_checkbox.setChecked(True)
+    assert panel._watcher.ready.wait(5)
+    (tmp_path / "lib" / "yesterday.mp3").write_bytes(b"x")
+    qtbot.waitUntil(lambda: "1 canciones actualizadas" in panel.log.toPlainText(), timeout=10000)
+
+    panel.watch_checkbox.setChecked(False)
+    assert panel._watcher is None
+    panel.input_text.setPlainText("Yesterday")
+    panel._perform_search()
+    qtbot.waitUntil(lambda: _texts(panel) == ["Yesterday"], timeout=2000)
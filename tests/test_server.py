@@ -0,0 +1,151 @@
+import http.client
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from songsearch import indexer, metrics
+from songsearch.db import DatabaseManager
+from songsearch.search.index import SearchIndex
+from songsearch.server import LatencyStats, SearchServer, SearchService, percentile
+
+
+@pytest.fixture
+def server(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_song(name="song1", artist="The Beatles", title="Hey Jude", path="/m/1.mp3")
+    db.add_song(name="song2", artist="Queen", title="Bohemian Rhapsody", path="/m/2.mp3")
+    service = SearchService(db, SearchIndex(str(tmp_path / "search.idx")))
+    server = SearchServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def call(server, method, path, body=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    payload = None if body is None else json.dumps(body)
+    conn.request(method, path, payload, {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = json.loads(response.read())
+    assert float(response.getheader("X-Elapsed-Ms")) >= 0
+    conn.close()
+    return response.status, data
+
+
+def test_batch_search(server):
+    status, data = call(server, "POST", "/search", {"queries": ["hey jude", "queen"], "mode": "song"})
+    assert status == 200
+    results = data["results"]
+    assert [r["query"] for r in results] == ["hey jude", "queen"]
+    assert [m["id"] for m in results[0]["matches"]] == [1]
+    assert results[1]["matches"] == []
+
+    status, data = call(server, "POST", "/search", {"queries": ["queen"], "mode": "artist"})
+    assert [m["path"] for m in data["results"][0]["matches"]] == ["/m/2.mp3"]
+
+
+def test_lookup_by_id(server):
+    assert call(server, "GET", "/songs/2") == (
+        200,
+        {"id": 2, "name": "song2", "artist": "Queen", "title": "Bohemian Rhapsody", "path": "/m/2.mp3"},
+    )
+    assert call(server, "GET", "/songs/99")[0] == 404
+    status, data = call(server, "POST", "/songs", {"ids": [2, 1, 99]})
+    assert [s["id"] for s in data["songs"]] == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/search", {"queries": "x", "mode": "album"}),
+        ("/search", {"queries": [1]}),
+        ("/search", {"queries": ["x"], "threshold": "high"}),
+        ("/songs", {"ids": ["1"]}),
+        ("/rescan", {"roots": []}),
+    ],
+)
+def test_bad_requests(server, path, body):
+    status, data = call(server, "POST", path, body)
+    assert status == 400 and data["error"]
+
+
+def test_unknown_route(server):
+    assert call(server, "GET", "/nope")[0] == 404
+    assert "GET /nope" not in call(server, "GET", "/metrics")[1]
+
+
+def test_rescan_makes_new_songs_searchable(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        indexer,
+        "File",
+        lambda path, easy=True: SimpleNamespace(tags={"title": ["Yesterday"]}, info=None),
+    )
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    (lib / "yesterday.mp3").write_bytes(b"x")
+
+    status, data = call(server, "POST", "/rescan", {"roots": [str(lib)]})
+    assert status == 202 and data["state"] == "running"
+    deadline = time.monotonic() + 5
+    while call(server, "GET", "/rescan")[1]["state"] == "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    state = call(server, "GET", "/rescan")[1]
+    assert (state["state"], state["roots"], state["files_done"]) == ("done", [str(lib)], 1)
+    status, data = call(server, "POST", "/search", {"queries": ["yesterday"]})
+    assert [m["title"] for m in data["results"][0]["matches"]] == ["Yesterday"]
+
+
+def test_concurrent_requests_and_metrics(server):
+    statuses = []
+
+    def worker():
+        for _ in range(5):
+            statuses.append(call(server, "POST", "/search", {"queries": ["bohemian"]})[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses == [200] * 20
+
+    metrics = call(server, "GET", "/metrics")[1]["POST /search"]
+    assert metrics["count"] == 20 and metrics["errors"] == 0
+    assert 0 <= metrics["p50_ms"] <= metrics["p99_ms"] <= metrics["max_ms"]
+
+
+def test_percentiles():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+    stats = LatencyStats(window=3)
+    for ms in (5.0, 1.0, 3.0, 2.0):
+        stats.record("GET /x", ms)
+    snap = stats.snapshot()["GET /x"]
+    assert snap["count"] == 4 and snap["max_ms"] == 3.0
+
+
+def test_stage_metrics(server, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    call(server, "POST", "/search", {"queries": ["hey jude"]})
+
+    status, data = call(server, "GET", "/metrics/stages")
+    assert status == 200
+    assert data["timers_ms"]["search.fuzzy"]["count"] == 1
+
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    conn.request("GET", "/metrics/prometheus")
+    response = conn.getresponse()
+    assert response.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+    assert 'songsearch_stage_duration_seconds_count{stage="search.fuzzy"} 1' in response.read().decode()
+    conn.close()
+    metrics.reset()
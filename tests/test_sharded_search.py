@@ -0,0 +1,76 @@
+import pytest
+from rapidfuzz import fuzz, process
+
+from songsearch.db import DatabaseManager
+from songsearch.search import fuzzy_search
+from songsearch.search.index import SearchIndex
+from songsearch.search.packed import PackedStrings
+from songsearch.search.sharded import ShardedSearchEngine
+
+
+ROWS = [
+    (1, "song1", "The Beatles", "Hey Jude", "/m/1.mp3"),
+    (2, "song2", "The Rolling Stones", "Paint It Black", "/m/2.mp3"),
+    (3, "song3", "Queen", "Bohemian Rhapsody", "/m/3.mp3"),
+    (4, "hey_jude_live", "The Beatles", None, "/m/4.mp3"),
+    (5, "song5", "Beatles Tribute", "Hey Judy", "/m/5.mp3"),
+    (6, "song6", "Björk", "Jóga", "/m/6.mp3"),
+]
+
+
+def test_packed_strings_roundtrip():
+    packed = PackedStrings.from_strings(["a", None, "Jóga", ""])
+    assert list(packed) == ["a", "", "Jóga", ""]
+    view = PackedStrings.from_buffer(packed.to_bytes(), len(packed))
+    assert view[2] == "Jóga"
+    assert view[-1] == ""
+    with pytest.raises(IndexError):
+        view[4]
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_sharded_matches_single_process(workers):
+    keys = [r[3] or r[1] for r in ROWS]
+    expected = process.extract("hey jude", keys, scorer=fuzz.WRatio, score_cutoff=50, limit=50)
+    with ShardedSearchEngine(ROWS, workers=workers, prefilter=False) as engine:
+        results = engine.search("hey jude", "song", 50)
+    assert [(r["id"], r["score"]) for r in results] == [
+        (ROWS[idx][0], score) for _text, score, idx in expected
+    ]
+    assert set(results[0]) == {"id", "name", "artist", "title", "path", "score"}
+
+
+def test_sharded_batch_and_limit():
+    with ShardedSearchEngine(ROWS, workers=3, limit=2) as engine:
+        song = engine.search_batch(["Jóga", "beatles"], "song", 80)
+        artist = engine.search_batch(["beatles"], "artist", 75)[0]
+    assert [r["title"] for r in song[0]] == ["Jóga"]
+    assert song[1] == []
+    assert [r["id"] for r in artist] == [1, 4]
+
+
+def test_sharded_from_db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_song(name="a", artist="Queen", title="Bohemian Rhapsody", path="a.mp3")
+    db.add_song(name="b", artist="Queen", title="Radio Ga Ga", path="b.mp3")
+    with ShardedSearchEngine.from_db(db, workers=2) as engine:
+        results = engine.search("bohemian", "song", 70)
+    assert [r["path"] for r in results] == ["a.mp3"]
+    with pytest.raises(RuntimeError):
+        engine.search("x", "song", 0)
+
+
+def test_sharded_prefilter_matches_fuzzy_search(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    db.add_songs([{"name": r[1], "artist": r[2], "title": r[3], "path": r[4]} for r in ROWS])
+    index = SearchIndex(str(tmp_path / "songs.idx"))
+    index.refresh(db)
+    queries = ["hey jude", "JÓGA", "beatles", "song", ""]
+    with ShardedSearchEngine.from_db(db, workers=2) as engine:
+        for mode in ("song", "artist"):
+            sharded = engine.search_batch(queries, mode, 50)
+            for q, results in zip(queries, sharded):
+                assert results == fuzzy_search(db, q, mode, 50, index=index), (q, mode)
+    # Only "Hey Jude" contains the query; "Hey Judy" is not scored.
+    with ShardedSearchEngine.from_db(db, workers=2) as engine:
+        assert [r["id"] for r in engine.search("hey jude", "song", 50)] == [1]
@@ -0,0 +1,76 @@
+import itertools
+import os
+from collections import Counter
+
+import pytest
+from mutagen import File
+
+from songsearch import synthetic
+from songsearch.db import DatabaseManager
+from songsearch.probe import probe
+from songsearch.synthetic import TagGenerator, generate_library, populate_songs
+
+
+def test_generated_files_are_valid_and_tagged(tmp_path):
+    paths = generate_library(str(tmp_path), 40, seed=3)
+
+    assert len(set(paths)) == 40
+    assert Counter(os.path.splitext(p)[1] for p in paths) == {
+        ".mp3": 10,
+        ".flac": 10,
+        ".ogg": 10,
+        ".m4a": 10,
+    }
+    for path in paths:
+        audio = File(path, easy=True)
+        assert audio is not None and audio.tags.get("title"), path
+        assert os.path.getsize(path) < 16_384
+        assert probe(path) is not None
+    # Default layout: albumartist/album/NN title.ext
+    first = os.path.relpath(paths[0], tmp_path).split(os.sep)
+    assert len(first) == 3 and first[2][:2].isdigit()
+
+
+def test_same_seed_same_library(tmp_path):
+    a = generate_library(str(tmp_path / "a"), 20, seed=7, layout="flat")
+    b = generate_library(str(tmp_path / "b"), 20, seed=7, layout="flat")
+    assert [os.path.relpath(p, tmp_path / "a") for p in a] == [
+        os.path.relpath(p, tmp_path / "b") for p in b
+    ]
+
+
+def test_tag_distributions():
+    tags = list(itertools.islice(TagGenerator(seed=1, artists=200), 5000))
+
+    # Zipf: the most frequent artist and genre dominate the tail.
+    artists = Counter(t.get("artist") for t in tags if "artist" in t)
+    counts = [n for _, n in artists.most_common()]
+    assert counts[0] > 10 * counts[len(counts) // 2]
+    genres = Counter(t.get("genre") for t in tags)
+    assert genres.most_common(1)[0][1] > 5 * len(tags) / len(synthetic.GENRES) / 2
+
+    titles = [t["title"] for t in tags]
+    assert any("(Live)" in t or "(Remastered" in t for t in titles)
+    assert any(t == t.upper() and t != t.lower() for t in titles)
+    assert 0.02 < sum("album" not in t for t in tags) / len(tags) < 0.1
+    assert any(not (t.get("artist") or "").isascii() for t in tags)
+    assert any(not t["title"].isascii() for t in tags)
+
+
+def test_custom_layout_and_unknown_formats(tmp_path):
+    paths = generate_library(str(tmp_path), 5, layout="{genre}/{index:03d}{ext}", formats=["ogg"])
+    assert [os.path.basename(p) for p in paths] == [f"{i:03d}.ogg" for i in range(5)]
+    with pytest.raises(ValueError):
+        generate_library(str(tmp_path), 1, formats=["wav"])
+
+
+def test_populate_songs(tmp_path):
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    assert populate_songs(db, 2500, seed=2, batch_size=1000) == 2500
+
+    rows = db.fetch_all_songs()
+    assert len(rows) == 2500
+    assert all(r[4].startswith("/music/") for r in rows)
+    # Titles are shared between rows, so LIKE search has work to do.
+    title = next(itertools.islice(TagGenerator(seed=2), 1))["title"]
+    assert len(db.search_song_like(title.split()[0])) > 1
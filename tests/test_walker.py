@@ -0,0 +1,69 @@
+import os
+
+from songsearch import walker
+from songsearch.walker import walk_audio_files
+
+
+def _tree(root, depth=3, fanout=3):
+    expected = set()
+
+    def build(directory, level):
+        directory.mkdir(exist_ok=True)
+        for name in ("a.mp3", "b.FLAC", "cover.jpg", "notes.txt"):
+            (directory / name).write_bytes(b"x" * len(name))
+            if name.lower().endswith((".mp3", ".flac")):
+                expected.add(str(directory / name))
+        if level < depth:
+            for i in range(fanout):
+                build(directory / f"d{i}", level + 1)
+
+    build(root, 0)
+    return expected
+
+
+def test_walk_matches_os_walk_in_parallel_and_serially(tmp_path):
+    expected = _tree(tmp_path / "lib")
+    (tmp_path / "lib" / "link").symlink_to(tmp_path / "lib" / "d0")
+    for workers in (1, 4):
+        files = list(walk_audio_files(str(tmp_path / "lib"), workers=workers))
+        assert {f.path for f in files} == expected
+        f = next(f for f in files if f.path.endswith("b.FLAC"))
+        st = os.stat(f.path)
+        assert (f.size, f.mtime) == (st.st_size, st.st_mtime)
+
+
+def test_only_audio_entries_are_stated(tmp_path, monkeypatch):
+    _tree(tmp_path / "lib", depth=1)
+    stated = []
+    real_scandir = os.scandir
+
+    class Entry:
+        def __init__(self, entry):
+            self._entry = entry
+            self.name, self.path = entry.name, entry.path
+
+        def is_dir(self, follow_symlinks=True):
+            return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+        def stat(self):
+            stated.append(self.name)
+            return self._entry.stat()
+
+    class Scandir:
+        def __init__(self, path):
+            self._it = real_scandir(path)
+
+        def __enter__(self):
+            return (Entry(e) for e in self._it)
+
+        def __exit__(self, *exc):
+            self._it.close()
+
+    monkeypatch.setattr(walker.os, "scandir", Scandir)
+    files = list(walk_audio_files(str(tmp_path / "lib")))
+    assert len(files) == 8
+    assert sorted(set(stated)) == ["a.mp3", "b.FLAC"]
+
+
+def test_unreadable_directories_are_skipped(tmp_path):
+    assert list(walk_audio_files(str(tmp_path / "missing"))) == []
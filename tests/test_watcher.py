@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from songsearch import indexer
+from songsearch.db import DatabaseManager
+from songsearch.watcher import LibraryWatcher
+
+
+def fake_file(path, easy=True):
+    return SimpleNamespace(tags={"title": [os.path.basename(path)]}, info=SimpleNamespace(length=1))
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexer, "File", fake_file)
+    root = tmp_path / "lib"
+    (root / "old").mkdir(parents=True)
+    db = DatabaseManager(str(tmp_path / "songs.db"))
+    for name in ("old/1.mp3", "old/2.mp3", "keep.mp3"):
+        (root / name).write_bytes(name.encode())
+        db.upsert_songs([indexer.song_record(str(root / name))])
+    return root, db
+
+
+def _paths(db, root):
+    return sorted(os.path.relpath(r[0], root) for r in db._conn().execute("SELECT path FROM songs"))
+
+
+def _watch(root, db, **kw):
+    batches = []
+    watcher = LibraryWatcher(db, [str(root)], debounce=0.1, on_batch=lambda *b: batches.append(b), **kw)
+    watcher.start()
+    assert watcher.ready.wait(5)
+    return watcher, batches
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def _change(root):
+    (root / "new").mkdir()
+    (root / "new" / "3.mp3").write_bytes(b"3")
+    (root / "4.flac").write_bytes(b"4")
+    (root / "note.txt").write_bytes(b"x")
+    (root / "keep.mp3").rename(root / "kept.mp3")
+    for name in ("1.mp3", "2.mp3"):
+        (root / "old" / name).unlink()
+    (root / "old").rmdir()
+
+
+def test_poll_backend_applies_changed_directories(library):
+    root, db = library
+    watcher, batches = _watch(root, db, backend="poll", poll_interval=0.1)
+    _change(root)
+    _wait_for(lambda: _paths(db, root) == ["4.flac", "kept.mp3", "new/3.mp3"])
+    watcher.stop(5)
+
+    assert sum(b[0] for b in batches) == 3 and sum(b[1] for b in batches) == 2
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/sys/fs/inotify"), reason="needs inotify")
+def test_inotify_backend_coalesces_events(library):
+    root, db = library
+    watcher, batches = _watch(root, db, backend="inotify")
+    assert watcher.backend == "inotify"
+    _change(root)
+    for _ in range(3):
+        (root / "4.flac").write_bytes(b"xx")
+    (root / "gone.mp3").write_bytes(b"x")
+    (root / "gone.mp3").unlink()
+    _wait_for(lambda: batches)
+    watcher.stop(5)
+
+    # Writes to the same file, and a file created then deleted, coalesce.
+    assert _paths(db, root) == ["4.flac", "kept.mp3", "new/3.mp3"]
+    assert batches == [(3, 2)]
+
+
+def test_moved_files_keep_their_row(library):
+    root, db = library
+    with db._conn() as c:
+        c.execute("UPDATE songs SET mb_recording_id='mbid' WHERE path=?", (str(root / "keep.mp3"),))
+    (root / "kept").mkdir()
+    (root / "keep.mp3").rename(root / "kept" / "song.mp3")
+    watcher = LibraryWatcher(db, [str(root)], backend="poll")
+    watcher._changes.file(str(root / "keep.mp3"), False)
+    watcher._changes.dir_added(str(root / "kept"))
+    watcher.flush()
+
+    rows = db._conn().execute("SELECT id, path, mb_recording_id FROM songs ORDER BY id").fetchall()
+    assert rows[-1] == (3, str(root / "kept" / "song.mp3"), "mbid")
+    assert len(rows) == 3
+
+
+def test_pending_changes_are_flushed_on_stop(library):
+    root, db = library
+    watcher = LibraryWatcher(db, [str(root)], backend="poll", debounce=60, poll_interval=0.05)
+    watcher.start()
+    assert watcher.ready.wait(5)
+    time.sleep(0.1)
+    (root / "5.mp3").write_bytes(b"x")
+    time.sleep(0.3)
+    watcher.stop(5)
+
+    assert "5.mp3" in _paths(db, root)
+
+
+def test_unknown_backend(library):
+    with pytest.raises(ValueError):
+        LibraryWatcher(library[1], [], backend="fsevents")
+
+
+def test_failed_batch_is_logged_and_retried(library, monkeypatch, caplog):
+    root, db = library
+    upsert = db.upsert_songs
+    calls = []
+
+    def locked_once(records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        upsert(records)
+
+    monkeypatch.setattr(db, "upsert_songs", locked_once)
+    watcher, batches = _watch(root, db, backend="poll", poll_interval=0.05)
+    (root / "5.mp3").write_bytes(b"x")
+    _wait_for(lambda: batches)
+    watcher.stop(5)
+
+    assert "5.mp3" in _paths(db, root)
+    assert len(calls) == 2
+    assert "database is locked" in caplog.text
+
+
+def test_stop_is_safe_when_not_running(library):
+    root, db = library
+    LibraryWatcher(db, [str(root)], backend="poll").stop(1)  # never started
+    watcher, _ = _watch(root, db, backend="poll")
+    watcher.stop(5)
+    watcher.stop(5)  # thread already gone, its pipe closed
+    assert not watcher._thread.is_alive()